@@ -1,16 +1,217 @@
-from flask import Flask, jsonify, request
+import logging
+import time
+import click
+from flask import Flask, g, jsonify, request
 from flask_cors import CORS
+from sqlalchemy import delete, select
+from archive import SaveArchived, archive_cutoff, archive_inactive, rehydrate, stale_users, touch_last_seen
+from auth import init_auth, request_token, require_auth
+from catalog import get_catalog, init_catalog
 from database import db, init_db
-from models import User, UserData, Pet, HomeObject, Item, InventoryItem
+from json_codec import init_json
+from metrics import init_metrics, phase, record_reconciled
+from passwords import PoolSaturated, init_passwords
+from push import STREAM_HEADERS, ThreadSubscriber, authorize_stream, init_push, publish_changes, thread_stream
+from models import User, UserData, HomeObject
+from request_logging import init_logging
+from save_cache import init_save_cache
+from save_codec import init_save_codecs
+from save_reader import read_save
+from seed import DEFAULT_PASSWORD, DEFAULT_PREFIX, seed_users
+from reconcile import (CHILD_MODELS, UnknownRows, apply_userdata, bump_version, delete_rows, payload_error,
+                       plan_userdata)
+from home_object_selection import parse_selection, selection_where
+from shop import ShopError, parse_item_request, purchase, use_item
+from validation import is_int
+from sharding import (assign_shard, each_shard, init_shards, plan_rebalance, rebalance, route_to_user,
+                      shard_counts, use_shard)
+from simulation import catch_up_user, now_ms, simulate_pets, start_live_simulation, start_simulation_worker
+from write_behind import init_write_behind, is_hot_stat_patch
 
 app = Flask(__name__)
 CORS(app)  # Enable CORS
 
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///data.db'
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+app.config.from_object('config')
+init_logging(app)
+encode_json = init_json(app)
+
+# JSON or compact columnar save bodies, by Accept/Content-Type
+save_codecs = init_save_codecs(app, encode_json)
+
+# Signed session tokens for the save endpoints
+auth = init_auth(app)
+
+# scrypt hashing on a bounded pool; a full pool answers 429
+passwords = init_passwords(app)
+
+@app.errorhandler(PoolSaturated)
+def password_pool_saturated(error):
+    response = jsonify(error="Too many login attempts in progress, retry shortly")
+    response.headers['Retry-After'] = '1'
+    return response, 429
+
+@app.errorhandler(ShopError)
+def shop_error(error):
+    db.session.rollback()
+    return jsonify(error=error.message, **error.extra), error.status
 
 # Initialize database
 init_db(app)
+init_catalog(app)
+
+# Optionally spread saves over several database files, with this one as the directory
+shards = init_shards(app)
+
+# Request/query metrics at /metrics
+with app.app_context():
+    init_metrics(app, *db.engines.values())
+
+# Optionally buffer pet stat ticks in memory and commit them in batches
+write_behind = init_write_behind(app)
+
+def flush_pending(user_id):
+    """Commit any buffered stat ticks for user_id before their save is read or written."""
+    if write_behind is not None:
+        write_behind.flush_user(user_id)
+
+# Serialized saves for GET /userdata, keyed by save version
+save_cache = init_save_cache(app)
+
+def invalidate_save(user_id):
+    """Drop user_id's cached save after a write."""
+    if save_cache is not None:
+        save_cache.invalidate(user_id)
+
+def restore_save(user_id):
+    """Bring user_id's archived save back to the hot tables, then simulate the time its pets were away."""
+    if rehydrate(user_id):
+        db.session.commit()
+        invalidate_save(user_id)
+        catch_up_user(user_id)
+
+def save_etag(user_id, version, codec):
+    # The body embeds catalog entries, so a catalog change must change the tag too
+    etag = f"{user_id}-{version}-{get_catalog().response_body()[1][:8]}"
+    return etag if codec is save_codecs.json else f"{etag}-{codec.name}"
+
+def save_body(user_id, version, codec):
+    """
+    Body of the user + save as GET /userdata returns it, in codec's encoding,
+    from the cache when `version` is still current. Returns (version, body);
+    the version is the one actually serialized, which can be newer than the one
+    passed in.
+    """
+    body = save_cache.get(user_id, version, codec.name) if save_cache is not None else None
+    if body is not None:
+        return version, body
+    with phase("load"):
+        save = read_save(db.session, user_id)
+    with phase("serialize"):
+        body = codec.encode(save)
+    version = save["data"]["version"]
+    if save_cache is not None:
+        save_cache.put(user_id, version, body, codec.name)
+    return version, body
+
+def save_response(payload, status=200):
+    """A save reply in the encoding the request's Accept header prefers."""
+    codec = save_codecs.for_response(request)
+    with phase("serialize"):
+        body = codec.encode(payload)
+    response = app.response_class(body, status=status, mimetype=codec.media_type)
+    response.vary.add('Accept')
+    return response
+
+# Periodically catch up away pets across all users
+if app.config['SIMULATION_INTERVAL'] > 0:
+    start_simulation_worker(app, app.config['SIMULATION_INTERVAL'])
+
+# Per-user event streams of save changes
+push_hub = init_push(app, encode_json)
+
+# Keep streamed users' pets live, so their clients can stop uploading the ticks
+if push_hub is not None and app.config['PUSH_SIMULATION_INTERVAL'] > 0:
+    start_live_simulation(app, push_hub, app.config['PUSH_SIMULATION_INTERVAL'])
+
+@app.cli.command('simulate')
+def simulate_command():
+    """Bring every away pet up to now in one bulk pass."""
+    start = time.perf_counter()
+    if write_behind is not None:
+        write_behind.flush()
+    result = {"pets": 0, "poops": 0}
+    for _ in each_shard():
+        for key, count in simulate_pets().items():
+            result[key] += count
+    db.session.commit()
+    print(f"Caught up {result['pets']} pets, spawned {result['poops']} poops "
+          f"in {time.perf_counter() - start:.2f}s")
+
+@app.cli.command('seed')
+@click.option('--users', default=1000, show_default=True, help="Number of users to add.")
+@click.option('--seed', 'random_seed', default=0, show_default=True, help="Random seed for the population.")
+@click.option('--batch-size', default=2000, show_default=True, help="Users per transaction.")
+def seed_command(users, random_seed, batch_size):
+    """Add synthetic users with realistic saves (see seed.py)."""
+    start = time.perf_counter()
+    totals = seed_users(db.engine, users, passwords.hash(DEFAULT_PASSWORD), seed=random_seed,
+                        batch_size=batch_size, router=shards,
+                        progress=lambda done: print(f"\r{done}/{users} users", end="", flush=True))
+    elapsed = time.perf_counter() - start
+    print(f"\nSeeded {', '.join(f'{rows} {table}' for table, rows in totals.items())} "
+          f"in {elapsed:.1f}s ({users / elapsed * 60:,.0f} users/min)")
+    print(f"Log in as {DEFAULT_PREFIX}<id> with password '{DEFAULT_PASSWORD}'")
+
+@app.cli.command('archive')
+@click.option('--days', type=float, default=None,
+              help="Inactivity before a save is archived. [default: ARCHIVE_AFTER_DAYS]")
+@click.option('--batch-size', default=500, show_default=True, help="Users archived per transaction.")
+@click.option('--dry-run', is_flag=True, help="Only count the saves that would be archived.")
+def archive_command(days, batch_size, dry_run):
+    """Archive the saves of inactive users (see archive.py)."""
+    days = app.config['ARCHIVE_AFTER_DAYS'] if days is None else days
+    if dry_run:
+        print(f"{len(stale_users(archive_cutoff(days, now_ms())))} users not seen for {days:g} days")
+        return
+    start = time.perf_counter()
+    archived, blob_bytes = archive_inactive(days, batch_size,
+                                            progress=lambda done, saves: print(f"\r{done} users checked", end="",
+                                                                               flush=True))
+    print(f"\nArchived {archived} saves into {blob_bytes / 1024:,.0f} KB in {time.perf_counter() - start:.1f}s")
+
+def placement_name(shard):
+    return "directory" if shard is None else f"shard {shard}"
+
+@app.cli.group('shards')
+def shards_command():
+    """Inspect and rebalance sharded saves (see sharding.py)."""
+    if shards is None:
+        raise click.ClickException("Saves aren't sharded; set WEBPETS_DB_SHARDS")
+
+@shards_command.command('status')
+def shards_status_command():
+    """Users per shard."""
+    counts = shard_counts(shards)
+    for shard in sorted(counts, key=lambda shard: -1 if shard is None else shard):
+        print(f"{placement_name(shard)}: {counts[shard]} users")
+
+@shards_command.command('rebalance')
+@click.option('--batch-size', default=500, show_default=True, help="Users moved per transaction.")
+@click.option('--dry-run', is_flag=True, help="Only print the moves.")
+def shards_rebalance_command(batch_size, dry_run):
+    """Spread users evenly over DB_SHARDS. Stop the server first."""
+    try:
+        moves = plan_rebalance(shards)
+    except ValueError as error:
+        raise click.ClickException(str(error))
+    for source, target, user_ids in moves:
+        print(f"{placement_name(source)} -> {placement_name(target)}: {len(user_ids)} users")
+    if dry_run:
+        return
+    start = time.perf_counter()
+    moved, orphans = rebalance(shards, batch_size,
+                               progress=lambda source, target, done: print(f"\r{done} users moved", end="", flush=True))
+    print(f"\nMoved {moved} users and removed {orphans} orphaned saves in {time.perf_counter() - start:.1f}s")
 
 # ---------------------------
 # Routes
@@ -20,147 +221,447 @@ init_db(app)
 def index():
     return jsonify(message="Flask API is running.")
 
+# Item catalog, served from memory with an ETag so clients can cache it
+@app.route('/items', methods=['GET'])
+def get_items():
+    encoded = get_catalog().response_body(request.args.get('category'))
+    if encoded is None:
+        return jsonify(error="Unknown category"), 404
+    body, etag = encoded
+    response = app.response_class(body, mimetype='application/json')
+    response.set_etag(etag)
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
+
+def valid_credentials(data):
+    """A username and a non-empty password string, checked before any hashing work is queued."""
+    return (isinstance(data, dict) and isinstance(data.get('username'), str)
+            and isinstance(data.get('password'), str) and data['password'] != "")
+
 # Registration endpoint (now returns complete user data)
 @app.route('/register', methods=['POST'])
 def register():
     data = request.get_json()
-    if not data or 'username' not in data or 'password' not in data:
+    if not valid_credentials(data):
         return jsonify(error="Invalid payload"), 400
     existing_user = User.query.filter_by(username=data['username']).first()
 
     if existing_user:
         return jsonify(error="Username already exists"), 400
     
-    new_user = User(username=data['username'], password=data['password'])
+    new_user = User(username=data['username'], password=passwords.hash(data['password']),
+                    shard=assign_shard(data['username']), last_seen=now_ms())
     db.session.add(new_user)
     db.session.flush()  # Get new_user.id without committing yet
 
-    # Create associated UserData for this new user
+    # Create associated UserData for this new user, on its shard if saves are sharded
+    use_shard(new_user.shard)
     new_user_data = UserData(id=new_user.id, completed_tutorial=False, money=0)
     db.session.add(new_user_data)
     db.session.commit()
 
-    # Return full user data including UserData and nested pets
-    result = new_user.to_dict()
-    result["data"] = new_user.data.to_dict() if new_user.data else {}
-    return jsonify(result), 201
+    # Return full user data including UserData and nested pets, plus a session token
+    result = read_save(db.session, new_user.id)
+    result["token"] = auth.issue(new_user.id)
+    return save_response(result, 201)
 
 
 # Login endpoint (now returns complete user data)
 @app.route('/login', methods=['POST'])
 def login():
     data = request.get_json()
-    if not data or 'username' not in data or 'password' not in data:
+    if not valid_credentials(data):
         return jsonify(error="Invalid payload"), 400
 
     user = User.query.filter_by(username=data['username']).first()
     if not user:
         return jsonify(error="User not found"), 404
 
-    if user.password != data['password']:
+    matches, needs_rehash = passwords.verify(data['password'], user.password)
+    if not matches:
         return jsonify(error="Incorrect password"), 401
+    if needs_rehash:
+        # Plaintext from before hashing, or an older cost setting
+        user.password = passwords.hash(data['password'])
+    if touch_last_seen(user) or needs_rehash:
+        db.session.commit()
 
-    # Return full user data including UserData and nested pets
-    result = user.to_dict()
-    result["data"] = user.data.to_dict() if user.data else {}
-    return jsonify(result), 200
+    # Simulate the time the user's pets spent alone, then load the save
+    route_to_user(user.id)
+    flush_pending(user.id)
+    catch_up_user(user.id)
+
+    # Return full user data including UserData and nested pets, plus a session token
+    try:
+        result = read_save(db.session, user.id)
+    except SaveArchived:
+        restore_save(user.id)
+        result = read_save(db.session, user.id)
+    result = result or {**user.to_dict(), "data": {}}
+    result["token"] = auth.issue(user.id)
+    return save_response(result)
+
+@app.route('/logout', methods=['POST'])
+@require_auth
+def logout():
+    """Revoke the token the request was made with."""
+    auth.revoke(request_token())
+    return jsonify(message="Logged out"), 200
 
 # Endpoint to get a user's full data (user + userdata + nested pets)
 @app.route('/userdata/<int:user_id>', methods=['GET'])
+@require_auth
 def get_userdata(user_id):
-    user = db.session.get(User, user_id)
-    if not user:
-        return jsonify(error="User not found"), 404
-    if not user.data:
+    """
+    The user's full save, with a strong ETag derived from the save version.
+    A matching If-None-Match is answered 304 without loading the save.
+    """
+    flush_pending(user_id)
+    with phase("simulate"):
+        catch_up_user(user_id)
+    stored = db.session.execute(select(UserData.version, UserData.archived_at).where(UserData.id == user_id)).first()
+    if stored is None:
+        if not db.session.get(User, user_id):
+            return jsonify(error="User not found"), 404
         return jsonify(error="UserData not found"), 404
+    version, archived_at = stored
+    if archived_at is not None:
+        restore_save(user_id)
+        version = db.session.scalar(select(UserData.version).where(UserData.id == user_id))
 
-    result = user.to_dict()
-    result['data'] = user.data.to_dict()
-    return jsonify(result), 200
+    codec = save_codecs.for_response(request)
+    etag = save_etag(user_id, version, codec)
+    if etag in request.if_none_match:
+        response = app.response_class(status=304)
+    else:
+        version, body = save_body(user_id, version, codec)
+        etag = save_etag(user_id, version, codec)
+        response = app.response_class(body, mimetype=codec.media_type)
+    response.set_etag(etag)
+    response.cache_control.no_cache = True
+    response.vary.add('Accept')
+    return response
 
 @app.route('/userdata/<int:user_id>', methods=['PUT'])
+@require_auth
 def update_userdata(user_id):
-    user = db.session.get(User, user_id)
-    if not user:
-        return jsonify(error="User not found"), 404
-    if not user.data:
+    """
+    Replace a save with the one sent, in the shape GET returns (or columnar).
+
+    The save's "version" is the one the client last read: the write is a
+    compare-and-swap on it, and a stale version is rejected with 409 and the
+    current version, so two tabs can't silently overwrite each other. The
+    version is required (428 without it); a body with "force": true instead
+    is written unconditionally, last writer wins.
+    """
+    flush_pending(user_id)
+    user_data = db.session.get(UserData, user_id)
+    if not user_data:
         return jsonify(error="UserData not found"), 404
+    if user_data.archived_at is not None:
+        # The client's row ids are from before archiving; it has to reload the restored save
+        restore_save(user_id)
+        return jsonify(error="Version conflict", version=user_data.version), 409
 
-    data = request.get_json()
-    print(f"PUT /userdata/{user_id} received data:", data)
-
-    # Update the tutorial status if provided
-    if 'completed_tutorial' in data:
-        user.data.completed_tutorial = data['completed_tutorial']
-        print(f"Updated completed_tutorial to: {data['completed_tutorial']}")
-
-    # Update money if provided
-    if 'money' in data:
-        user.data.money = data['money']
-        print(f"Updated money to: {data['money']}")
-
-    # Process pets if provided using our helper function
-    if 'pets' in data:
-        print(f"Processing {len(data['pets'])} pets")
-        for pet_data in data['pets']:
-            print(f"Processing pet data: {pet_data}")
-            Pet.process_json(pet_data, user.data.id)
-
-    # Process home objects if provided
-    if 'home_objects' in data:
-        print(f"Processing {len(data['home_objects'])} home objects")
-        for home_obj_data in data['home_objects']:
-            print(f"Processing home object data: {home_obj_data}")
-            HomeObject.process_json(home_obj_data, user.data.id)
-
-    # Process inventory if provided
-    if 'inventory' in data:
-        print(f"Processing {len(data['inventory'])} inventory items")
-        for inv_data in data['inventory']:
-            print(f"Processing inventory data: {inv_data}")
-            InventoryItem.process_json(inv_data, user.data.id)
+    with phase("parse"):
+        data = save_codecs.read_body(request)
+    if not isinstance(data, dict) or not is_int(data.get('version', 0)):
+        return jsonify(error="Invalid payload"), 400
+    force = data.get('force') is True
+    if not force and 'version' not in data:
+        return jsonify(error="Missing version", version=user_data.version), 428
+    error = payload_error(data)
+    if error:
+        return jsonify(error=error), 400
+    base_version = None if force else data['version']
+    if app.config['LOG_PAYLOADS']:
+        app.logger.debug("PUT /userdata/%s payload: %s", user_id, data)
 
-    db.session.commit()
-    
-    # Return complete user data like login/register endpoints do
-    result = user.to_dict()
-    result["data"] = user.data.to_dict()
-    
-    # Transform to match frontend expectations  
-    response_data = {
-        "id": result["id"],
-        "username": result["username"], 
-        "completed_tutorial": result["data"]["completed_tutorial"],
-        "money": result["data"]["money"],
-        "pets": result["data"]["pets"],
-        "home_objects": result["data"]["home_objects"],
-        "inventory": result["data"]["inventory"]
-    }
-    
-    return jsonify(response_data), 200
+    # A save already known to be stale is refused without queueing for the write lock
+    if base_version is not None and base_version != user_data.version:
+        return jsonify(error="Version conflict", version=user_data.version), 409
+
+    # Diff the whole save against the stored rows before taking the write lock (see plan_userdata)
+    with phase("reconcile"):
+        plans = plan_userdata(user_id, data)
+    # Compare-and-swap the version, then write the diff in a few set-based statements
+    version = bump_version(user_id, base_version)
+    if version is None:
+        db.session.rollback()
+        return jsonify(error="Version conflict", version=db.session.get(UserData, user_id).version), 409
+    with phase("reconcile"):
+        changes = apply_userdata(user_data, data, plans)
+    record_reconciled(changes)
+    if app.logger.isEnabledFor(logging.INFO):
+        app.logger.info("Reconciled save %s", user_id, extra={
+            "user_id": user_id,
+            "rows": {key: {"inserted": len(ins), "updated": len(upd)} for key, (ins, upd) in changes.items()},
+        })
+    publish_changes(user_id, {"version": version, "reload": True})
+
+    # Return complete user data like login/register endpoints do, read before the
+    # commit so it's the save as written here and not a later writer's
+    with phase("load"):
+        result = read_save(db.session, user_id)
+    with phase("commit"):
+        db.session.commit()
+    invalidate_save(user_id)
+    # Transform to match frontend expectations: the save's fields next to id/username
+    return save_response({"id": result["id"], "username": result["username"], **result["data"]})
+
+@app.route('/userdata/<int:user_id>', methods=['PATCH'])
+@require_auth
+def patch_userdata(user_id):
+    """
+    Apply only the changed parts of a save.
+
+    Body: {"base_version": int, "completed_tutorial"?, "money"?,
+           "pets"?: [...], "home_objects"?: [...], "inventory"?: [...],
+           "deleted"?: {"pets": [ids], "home_objects": [ids], "inventory": [ids]}}
+    Rows with a known id are updated, rows without one are created. The reply
+    holds the new version plus only the rows that were written or deleted.
+    Body and reply may use a columnar encoding (see save_codec.py).
+    A stale base_version is rejected with 409 and the current version.
+    With write-behind on, patches that only carry pet stat ticks are staged
+    in memory and answered without touching the database.
+    """
+    with phase("parse"):
+        data = save_codecs.read_body(request)
+    if not isinstance(data, dict) or not is_int(data.get('base_version')):
+        return jsonify(error="Invalid payload"), 400
+    error = payload_error(data)
+    if error:
+        return jsonify(error=error), 400
+
+    if write_behind is not None and is_hot_stat_patch(data):
+        stored_version = write_behind.pending_version(user_id)
+        if stored_version is None:
+            stored_version = db.session.scalar(select(UserData.version).where(UserData.id == user_id))
+            if stored_version is None:
+                return jsonify(error="UserData not found"), 404
+        version = write_behind.stage(user_id, data['base_version'], stored_version, data['pets'])
+        if version is None:
+            current = write_behind.pending_version(user_id)
+            return jsonify(error="Version conflict", version=stored_version if current is None else current), 409
+        invalidate_save(user_id)
+        publish_changes(user_id, {"version": version, "pets": data['pets']}, on_commit=False)
+        return save_response({"version": version, "pets": data['pets']})
+
+    flush_pending(user_id)
+    user_data = db.session.get(UserData, user_id)
+    if not user_data:
+        return jsonify(error="UserData not found"), 404
+    # A patch already known to be stale is refused without queueing for the write lock
+    if user_data.version != data['base_version']:
+        return jsonify(error="Version conflict", version=user_data.version), 409
+
+    with phase("reconcile"):
+        try:
+            plans = plan_userdata(user_id, data, listed_only=True)
+        except UnknownRows as error:
+            # Rows removed by a newer write are a conflict; ids never in the save are an error
+            current = db.session.scalar(select(UserData.version).where(UserData.id == user_id))
+            db.session.rollback()
+            if current != data['base_version']:
+                return jsonify(error="Version conflict", version=current), 409
+            return jsonify(error=str(error)), 400
+    # Compare-and-swap the version so conflicting patches never touch rows
+    version = bump_version(user_id, data['base_version'])
+    if version is None:
+        db.session.rollback()
+        return jsonify(error="Version conflict", version=db.session.get(UserData, user_id).version), 409
+
+    with phase("reconcile"):
+        changes = apply_userdata(user_data, data, plans)
+        deleted = {}
+        for key, model in CHILD_MODELS:
+            ids = data.get('deleted', {}).get(key)
+            if ids:
+                deleted[key] = delete_rows(model, ids, user_id)
+    record_reconciled(changes, deleted)
+    with phase("commit"):
+        db.session.commit()
+    invalidate_save(user_id)
+
+    with phase("load"):
+        response_data = {"version": version}
+        for key in ('completed_tutorial', 'money'):
+            if key in data:
+                response_data[key] = getattr(user_data, key)
+        for key, model in CHILD_MODELS:
+            if key in changes:
+                written_ids = changes[key][0] + changes[key][1]
+                rows = model.query.filter(model.id.in_(written_ids)).all() if written_ids else []
+                response_data[key] = [row.to_dict() for row in rows]
+        if deleted:
+            response_data["deleted"] = deleted
+    publish_changes(user_id, response_data, on_commit=False)
+    return save_response(response_data)
+
+@app.route('/userdata/<int:user_id>/events', methods=['GET'])
+def userdata_events(user_id):
+    """
+    Server-sent events for the user's save (see push.py). Under asgi.py the
+    stream never reaches this route; here, for the werkzeug server, it holds
+    a thread for as long as it stays open. The token may come as ?token=
+    since EventSource can't set headers.
+    """
+    if push_hub is None:
+        return jsonify(error="Event streams are disabled"), 404
+    refused = authorize_stream(auth, user_id, request_token() or request.args.get('token'))
+    if refused is not None:
+        status, error = refused
+        return jsonify(error=error), status
+    subscriber = ThreadSubscriber(user_id)
+    if not push_hub.open(subscriber):
+        return jsonify(error="Too many open event streams"), 503
+    response = app.response_class(thread_stream(push_hub, subscriber))
+    response.headers.update(STREAM_HEADERS)
+    return response
 
 # Delete a specific home object
 @app.route('/homeobject/<int:home_object_id>', methods=['DELETE'])
+@require_auth
 def delete_home_object(home_object_id):
     """Delete a specific home object by ID."""
     home_obj = db.session.get(HomeObject, home_object_id)
-    if not home_obj:
+    # Other users' objects are reported missing rather than forbidden
+    if not home_obj or home_obj.user_data_id != g.user_id:
         return jsonify(error="Home object not found"), 404
     
-    print(f"🗑️ Deleting home object {home_object_id} (type: {home_obj.type}, object_id: {home_obj.object_id})")
+    app.logger.info("Deleting home object %s (type: %s, object_id: %s)",
+                    home_object_id, home_obj.type, home_obj.object_id)
     
     # Store user_data_id before deletion for response
     user_data_id = home_obj.user_data_id
+    if user_data_id is not None:
+        flush_pending(user_data_id)
     
     # Delete the object
     db.session.delete(home_obj)
+    version = None
+    if user_data_id is not None:
+        version = bump_version(user_data_id)
+        publish_changes(user_data_id, {"version": version, "deleted": {"home_objects": [home_object_id]}})
     db.session.commit()
+    if user_data_id is not None:
+        invalidate_save(user_data_id)
     
     return jsonify({
         "message": "Home object deleted successfully",
         "deleted_id": home_object_id,
-        "user_data_id": user_data_id
+        "user_data_id": user_data_id,
+        "version": version
     }), 200
 
+def request_selection(data):
+    """parse_selection for a request, or a 400 response for a malformed one."""
+    try:
+        return parse_selection(data or {}), None
+    except ValueError as error:
+        return None, (jsonify(error=str(error)), 400)
+
+@app.route('/userdata/<int:user_id>/homeobjects', methods=['GET'])
+@require_auth
+def find_home_objects(user_id):
+    """
+    The user's home objects matching a selection given as query arguments,
+    e.g. ?type=decor&rect=-2,-2,2,2 to check a placement for collisions.
+    See home_object_selection.parse_selection for the criteria.
+    """
+    selection, error = request_selection(request.args.to_dict())
+    if error:
+        return error
+    flush_pending(user_id)
+    table = HomeObject.__table__
+    rows = db.session.execute(
+        select(table).where(*selection_where(user_id, selection)).order_by(table.c.id)
+    ).mappings()
+    return jsonify(home_objects=[dict(row) for row in rows]), 200
+
+@app.route('/userdata/<int:user_id>/homeobjects/delete', methods=['POST'])
+@require_auth
+def delete_home_objects(user_id):
+    """
+    Delete every home object of the user matching a selection in one
+    transaction: a list of ids, or e.g. {"type": "temporary", "object_id": [1, 2, 3]}
+    for all poops, optionally limited to a rect or circle.
+    Replies with the deleted ids and the save version.
+    """
+    selection, error = request_selection(request.get_json(silent=True))
+    if error:
+        return error
+    flush_pending(user_id)
+    table = HomeObject.__table__
+    deleted = list(db.session.scalars(
+        delete(table).where(*selection_where(user_id, selection)).returning(table.c.id)
+    ))
+    if deleted:
+        version = bump_version(user_id)
+        publish_changes(user_id, {"version": version, "deleted": {"home_objects": deleted}})
+        db.session.commit()
+        invalidate_save(user_id)
+        record_reconciled({}, {"home_objects": deleted})
+    else:
+        version = db.session.scalar(select(UserData.version).where(UserData.id == user_id))
+        db.session.rollback()
+        if version is None:
+            return jsonify(error="UserData not found"), 404
+    app.logger.info("Deleted %s home objects of user %s", len(deleted), user_id)
+    return jsonify(deleted=sorted(deleted), version=version), 200
+
+
+# Shop and item operations (see shop.py); each replies with only the rows it changed
+@app.route('/userdata/<int:user_id>/purchase', methods=['POST'])
+@require_auth
+def purchase_item(user_id):
+    """Body: {"item_id": int, "quantity"?: int}. 409 with the current money if it isn't enough."""
+    item_id, quantity, _ = parse_item_request(request.get_json(silent=True))
+    # Staged ticks version the save too; the purchase has to bump on top of them
+    flush_pending(user_id)
+    result = purchase(user_id, item_id, quantity)
+    publish_changes(user_id, result)
+    with phase("commit"):
+        db.session.commit()
+    invalidate_save(user_id)
+    app.logger.info("User %s bought %s x item %s", user_id, quantity, item_id)
+    return jsonify(result), 200
+
+@app.route('/userdata/<int:user_id>/use', methods=['POST'])
+@require_auth
+def use_inventory_item(user_id):
+    """
+    Body: {"item_id": int, "quantity"?: int, "pet_id"?: int}. Takes the items
+    out of the inventory, applying their effects to the pet if one is given.
+    409 if the inventory doesn't hold enough.
+    """
+    item_id, quantity, pet_id = parse_item_request(request.get_json(silent=True))
+    # Staged stat ticks, or a later catch-up of time spent away, would otherwise undo the effect
+    # (and staged ticks version the save, so they go first even without a pet)
+    flush_pending(user_id)
+    if pet_id is not None:
+        catch_up_user(user_id)
+    result = use_item(user_id, item_id, quantity, pet_id)
+    publish_changes(user_id, result)
+    with phase("commit"):
+        db.session.commit()
+    invalidate_save(user_id)
+    return jsonify(result), 200
+
+@app.route('/userdata/<int:user_id>/feed', methods=['POST'])
+@require_auth
+def feed_pet(user_id):
+    """Body: {"pet_id": int, "item_id": int, "quantity"?: int}. Like /use, for food only."""
+    item_id, quantity, pet_id = parse_item_request(request.get_json(silent=True), needs_pet=True)
+    flush_pending(user_id)
+    catch_up_user(user_id)
+    result = use_item(user_id, item_id, quantity, pet_id, food_only=True)
+    publish_changes(user_id, result)
+    with phase("commit"):
+        db.session.commit()
+    invalidate_save(user_id)
+    return jsonify(result), 200
+
+
 if __name__ == '__main__':
     app.run(host='0.0.0.0', port=5000, debug=False)
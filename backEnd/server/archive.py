@@ -0,0 +1,178 @@
+"""
+Cold-save archival: saves of long-inactive users leave the hot tables.
+
+Most registered players stop playing, but their pets, home objects and
+inventory rows stay in the tables every read and write path indexes. The
+archive job (`flask archive`, safe to run while the server is up) finds users
+whose last_seen is older than ARCHIVE_AFTER_DAYS and, for each save, packs its
+child rows into one zlib-compressed JSON blob kept in the user_data row
+(user_data.archive, with archived_at set), then deletes the rows. The hot
+tables then grow with the active players rather than with every player ever
+registered.
+
+Archived saves come back on their own: /login and GET /userdata call
+rehydrate(), which reads the blob, claims it with an UPDATE conditioned on the
+archived_at it read (so concurrent requests restore it once) and inserts the
+rows again. Rows get new ids and both archiving and restoring bump the save
+version, so a client still holding the old ids reloads rather than patching
+them.
+
+user.last_seen is set at registration and refreshed by logins, at most once
+per LAST_SEEN_RESOLUTION_MS so a burst of logins doesn't turn into a burst of
+directory writes. The job never archives anyone seen within AUTH_TOKEN_TTL
+(plus that resolution), so every archived user has to log in, and so restore
+their save, before they can use it again. Users from before last_seen existed
+are stamped with the time of the first run: their clock starts then.
+"""
+import json
+import zlib
+from flask import current_app
+from sqlalchemy import bindparam, delete, insert, select, update
+from database import db
+from metrics import SAVES_ARCHIVED, SAVES_REHYDRATED
+from models import User, UserData, Pet, HomeObject, InventoryItem
+from sharding import each_shard
+from simulation import MS_PER_HOUR, now_ms
+
+_users = User.__table__
+_saves = UserData.__table__
+_CHILD_TABLES = (Pet.__table__, HomeObject.__table__, InventoryItem.__table__)
+
+MS_PER_DAY = 24 * MS_PER_HOUR
+LAST_SEEN_RESOLUTION_MS = MS_PER_HOUR
+COMPRESSION_LEVEL = 6
+
+
+class SaveArchived(Exception):
+    """The save is in the archive; rehydrate() it before reading."""
+
+    def __init__(self, user_id):
+        super().__init__(f"Save {user_id} is archived")
+        self.user_id = user_id
+
+
+def touch_last_seen(user, now=None):
+    """Record a login on the User; returns True if last_seen changed and needs committing."""
+    now = now_ms() if now is None else now
+    if user.last_seen is not None and now - user.last_seen < LAST_SEEN_RESOLUTION_MS:
+        return False
+    user.last_seen = now
+    return True
+
+
+def archive_cutoff(days, now):
+    """last_seen below which a user's save is archived: `days` ago, but never within a token's lifetime."""
+    token_ms = current_app.config['AUTH_TOKEN_TTL'] * 1000 + LAST_SEEN_RESOLUTION_MS
+    return now - max(int(days * MS_PER_DAY), token_ms)
+
+
+def pack(tables):
+    return zlib.compress(json.dumps(tables, separators=(",", ":")).encode("utf-8"), COMPRESSION_LEVEL)
+
+
+def unpack(blob):
+    return json.loads(zlib.decompress(blob))
+
+
+def archive_saves(user_ids, now=None):
+    """
+    Move the child rows of user_ids' hot saves into their archive blobs, in
+    db.session (routed to the saves' shard); the caller commits. Saves that
+    are already archived are skipped. Returns [(user id, blob size)].
+    """
+    now = now_ms() if now is None else now
+    hot = list(db.session.scalars(
+        select(_saves.c.id).where(_saves.c.id.in_(user_ids), _saves.c.archived_at.is_(None))
+    ))
+    if not hot:
+        return []
+    # Per table: the column names once, then one value list per row
+    tables = {user_id: {} for user_id in hot}
+    for table in _CHILD_TABLES:
+        columns = [column for column in table.c if column.name not in ("id", "user_data_id")]
+        for save in tables.values():
+            save[table.name] = {"columns": [column.name for column in columns], "rows": []}
+        for owner_id, *values in db.session.execute(
+            select(table.c.user_data_id, *columns).where(table.c.user_data_id.in_(hot)).order_by(table.c.id)
+        ):
+            tables[owner_id][table.name]["rows"].append(values)
+
+    blobs = [{"save_id": user_id, "blob": pack(save)} for user_id, save in tables.items()]
+    db.session.execute(
+        update(_saves).where(_saves.c.id == bindparam("save_id"))
+        .values(archive=bindparam("blob"), archived_at=now, version=_saves.c.version + 1),
+        blobs,
+    )
+    for table in _CHILD_TABLES:
+        db.session.execute(delete(table).where(table.c.user_data_id.in_(hot)))
+    SAVES_ARCHIVED.inc(amount=len(hot))
+    return [(row["save_id"], len(row["blob"])) for row in blobs]
+
+
+def rehydrate(user_id):
+    """
+    Restore user_id's archived save to the hot tables in db.session (routed
+    to its shard); the caller commits. Returns False if it wasn't archived,
+    or another request restored it first.
+    """
+    stored = db.session.execute(
+        select(_saves.c.archive, _saves.c.archived_at).where(_saves.c.id == user_id)
+    ).first()
+    if stored is None or stored.archived_at is None:
+        return False
+    claimed = db.session.execute(
+        update(_saves).where(_saves.c.id == user_id, _saves.c.archived_at == stored.archived_at)
+        .values(archive=None, archived_at=None, version=_saves.c.version + 1)
+    ).rowcount
+    if not claimed:
+        return False
+    tables = unpack(stored.archive) if stored.archive else {}
+    for table in _CHILD_TABLES:
+        packed = tables.get(table.name) or {"columns": [], "rows": []}
+        # Columns dropped since the save was archived are left out; added ones take their defaults
+        known = [(index, name) for index, name in enumerate(packed["columns"]) if name in table.c]
+        rows = [{"user_data_id": user_id, **{name: values[index] for index, name in known}}
+                for values in packed["rows"]]
+        if rows:
+            db.session.execute(insert(table), rows)
+    SAVES_REHYDRATED.inc()
+    return True
+
+
+def stale_users(cutoff):
+    """Ids of users last seen before cutoff, oldest id first."""
+    return list(db.session.scalars(
+        select(_users.c.id).where(_users.c.last_seen < cutoff).order_by(_users.c.id)
+    ))
+
+
+def archive_inactive(days=None, batch_size=500, now=None, progress=None):
+    """
+    Archive the saves of users not seen for `days` (ARCHIVE_AFTER_DAYS by
+    default), batch_size users per transaction on each shard. Each batch is
+    checked against last_seen again just before it's archived, so users who
+    logged in since the scan keep their save. progress, if given, is called
+    with (users scanned, saves archived) after each batch. Returns
+    (saves archived, total blob bytes).
+    """
+    days = current_app.config['ARCHIVE_AFTER_DAYS'] if days is None else days
+    now = now_ms() if now is None else now
+    cutoff = archive_cutoff(days, now)
+    db.session.execute(update(_users).where(_users.c.last_seen.is_(None)).values(last_seen=now))
+    db.session.commit()
+
+    user_ids = stale_users(cutoff)
+    archived, blob_bytes = 0, 0
+    for start in range(0, len(user_ids), batch_size):
+        batch = user_ids[start:start + batch_size]
+        still_stale = list(db.session.scalars(
+            select(_users.c.id).where(_users.c.id.in_(batch), _users.c.last_seen < cutoff)
+        ))
+        for _, ids in each_shard(still_stale):
+            sizes = archive_saves(ids, now)
+            db.session.commit()
+            archived += len(sizes)
+            blob_bytes += sum(size for _, size in sizes)
+        if progress is not None:
+            progress(start + len(batch), archived)
+    return archived, blob_bytes
@@ -0,0 +1,16 @@
+"""
+ASGI entry point for the Flask API.
+
+uvicorn's event loop holds client connections (including idle keep-alives)
+and hands each request to the unchanged Flask routes on a thread pool sized to
+the database connection pool, so a request never waits on a pooled connection
+another thread of this process is holding. Event streams (push.py) are the
+exception: they are served on the event loop itself, so thousands of idle
+ones don't occupy the pool.
+Run it through serve.py, or directly: uvicorn asgi:asgi_app
+"""
+from a2wsgi import WSGIMiddleware
+from app import app
+from push import asgi_app as with_event_streams
+
+asgi_app = with_event_streams(app, WSGIMiddleware(app, workers=app.config['DB_POOL_SIZE']))
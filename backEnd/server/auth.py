@@ -0,0 +1,111 @@
+"""
+Stateless signed session tokens.
+
+/login and /register issue a token "<user id>.<expiry>.<nonce>.<signature>",
+where the signature is an HMAC-SHA256 over the first three fields with
+AUTH_SECRET. Verifying one is a few microseconds of CPU and never touches the
+database. Logged-out tokens go on an in-memory revocation list until they
+expire; like the other per-process state here, that list is not shared
+between uvicorn workers.
+
+Requests send the token as "Authorization: Bearer <token>". Routes wrapped in
+require_auth get 401 without a valid token, and 403 when their user_id URL
+argument names someone else; the token's user id is in g.user_id.
+"""
+import base64
+import functools
+import hashlib
+import hmac
+import secrets
+import threading
+import time
+from flask import current_app, g, jsonify, request
+
+_DIGEST_BYTES = 16  # truncated HMAC-SHA256; 128 bits is plenty against forgery
+
+
+def _b64(data):
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+
+class TokenSigner:
+    def __init__(self, secret, ttl_seconds):
+        self._key = secret.encode("utf-8") if isinstance(secret, str) else secret
+        self.ttl = ttl_seconds
+        self._revoked = {}  # nonce -> expiry, kept until the token would have expired anyway
+        self._lock = threading.Lock()
+
+    def _sign(self, message):
+        return _b64(hmac.new(self._key, message.encode("ascii"), hashlib.sha256).digest()[:_DIGEST_BYTES])
+
+    def issue(self, user_id, now=None):
+        expires = int((time.time() if now is None else now) + self.ttl)
+        message = f"{user_id}.{expires}.{_b64(secrets.token_bytes(6))}"
+        return f"{message}.{self._sign(message)}"
+
+    def _parse(self, token, now=None):
+        """(user_id, expiry, nonce) for a well-signed, unexpired token, else None."""
+        try:
+            if not token.isascii():  # issued tokens are; anything else can't be signed or compared
+                return None
+            message, signature = token.rsplit(".", 1)
+            user_id, expires, nonce = message.split(".")
+            user_id, expires = int(user_id), int(expires)
+        except (AttributeError, ValueError):
+            return None
+        if not hmac.compare_digest(signature, self._sign(message)):
+            return None
+        if expires <= (time.time() if now is None else now):
+            return None
+        return user_id, expires, nonce
+
+    def verify(self, token, now=None):
+        """The user id a valid, unrevoked token was issued to, or None."""
+        parsed = self._parse(token, now)
+        if parsed is None or parsed[2] in self._revoked:
+            return None
+        return parsed[0]
+
+    def revoke(self, token, now=None):
+        """Reject token from now on. Returns False if it wasn't valid to begin with."""
+        now = time.time() if now is None else now
+        parsed = self._parse(token, now)
+        if parsed is None:
+            return False
+        with self._lock:
+            self._revoked = {nonce: expires for nonce, expires in self._revoked.items() if expires > now}
+            self._revoked[parsed[2]] = parsed[1]
+        return True
+
+
+def request_token():
+    """The bearer token sent with the current request, or None."""
+    header = request.headers.get("Authorization", "")
+    scheme, _, token = header.partition(" ")
+    return token.strip() if scheme.lower() == "bearer" and token else None
+
+
+def require_auth(view):
+    """Reject requests without a valid token for the user_id they address."""
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        token = request_token()
+        user_id = current_app.extensions["auth"].verify(token) if token else None
+        if user_id is None:
+            return jsonify(error="Authentication required"), 401
+        if "user_id" in kwargs and kwargs["user_id"] != user_id:
+            return jsonify(error="Forbidden"), 403
+        g.user_id = user_id
+        return view(*args, **kwargs)
+    return wrapper
+
+
+def init_auth(app):
+    """Create the token signer from AUTH_SECRET (or a per-process random key, with a warning)."""
+    secret = app.config['AUTH_SECRET']
+    if not secret:
+        app.logger.warning("AUTH_SECRET is not set; tokens won't survive a restart or work across workers")
+        secret = secrets.token_bytes(32)
+    signer = TokenSigner(secret, app.config['AUTH_TOKEN_TTL'])
+    app.extensions['auth'] = signer
+    return signer
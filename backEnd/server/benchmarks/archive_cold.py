@@ -0,0 +1,118 @@
+"""
+Cold-save archival: hot table size before/after, job time and login cost.
+
+Seeds --users synthetic players (seed.py: 30% last active one week to three
+months ago) and runs the archive job (archive.py) for saves idle longer than
+--days. Reports the rows left in the child tables and the database size
+(vacuumed) before and after, the job's time and blob bytes, and checks that a sample
+of archived saves comes back row for row. Then logs in --logins archived
+users (the first login restores the save) and as many hot ones, and compares
+their login latency.
+
+    python -m benchmarks.archive_cold [--users 5000] [--days 14] [--logins 50]
+"""
+import argparse
+import os
+import time
+
+from sqlalchemy import func, select
+
+os.environ.setdefault("WEBPETS_PASSWORD_SCRYPT_N", "1024")  # hashing isn't what's measured
+os.environ.setdefault("WEBPETS_LOG_LEVEL", "WARNING")
+
+from benchmarks.common import load_app, percentile, print_table
+
+VERIFY_SAMPLE = 20
+
+
+def table_rows(db, tables):
+    return {table.name: db.session.scalar(select(func.count()).select_from(table)) for table in tables}
+
+
+def vacuumed_bytes(db):
+    """The database's size once VACUUM has dropped its free pages."""
+    db.session.commit()
+    with db.engine.connect() as conn:
+        conn = conn.execution_options(isolation_level="AUTOCOMMIT")
+        conn.exec_driver_sql("VACUUM")
+        return conn.exec_driver_sql("PRAGMA page_count").scalar() * conn.exec_driver_sql("PRAGMA page_size").scalar()
+
+
+def child_rows(db, tables, user_id):
+    """A save's child rows without their ids, in a comparable form."""
+    return {table.name: sorted(tuple(row) for row in db.session.execute(
+                table.select().with_only_columns(*(c for c in table.c if c.name != "id"))
+                .where(table.c.user_data_id == user_id)))
+            for table in tables}
+
+
+def login_ms(client, username, password):
+    start = time.perf_counter()
+    response = client.post("/login", json={"username": username, "password": password})
+    elapsed = (time.perf_counter() - start) * 1000.0
+    assert response.status_code == 200, response.get_json()
+    return elapsed, response.get_json()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--users", type=int, default=5000)
+    parser.add_argument("--days", type=float, default=14)
+    parser.add_argument("--logins", type=int, default=50)
+    args = parser.parse_args()
+
+    app_module = load_app()
+    app, db = app_module.app, app_module.db
+    from archive import archive_cutoff, archive_inactive, rehydrate, stale_users
+    from models import User, UserData
+    from seed import DEFAULT_PASSWORD, seed_users
+    from sharding import SAVE_TABLES
+    from simulation import now_ms
+    children = SAVE_TABLES[1:]
+
+    with app.app_context():
+        seed_users(db.engine, args.users, app_module.passwords.hash(DEFAULT_PASSWORD))
+        stale = stale_users(archive_cutoff(args.days, now_ms()))
+        hot = sorted(set(range(1, args.users + 1)) - set(stale))
+        verify = stale[:VERIFY_SAMPLE]
+        expected = {user_id: child_rows(db, children, user_id) for user_id in verify}
+        rows_before, bytes_before = table_rows(db, children), vacuumed_bytes(db)
+        db.session.commit()
+
+        start = time.perf_counter()
+        archived, blob_bytes = archive_inactive(args.days)
+        job_seconds = time.perf_counter() - start
+        rows_after, bytes_after = table_rows(db, children), vacuumed_bytes(db)
+
+        # Round trip: restore a sample straight away and compare the rows
+        restored_ok = 0
+        for user_id in verify:
+            rehydrate(user_id)
+            db.session.commit()
+            restored_ok += child_rows(db, children, user_id) == expected[user_id]
+        usernames = dict(db.session.execute(select(User.id, User.username)).all())
+        still_archived = [user_id for user_id in stale[VERIFY_SAMPLE:]
+                          if db.session.get(UserData, user_id).archived_at is not None]
+
+    print(f"{args.users} users, {archived} saves archived (idle > {args.days:g} days) in {job_seconds:.2f}s, "
+          f"{blob_bytes / 1024:,.0f} KB of blobs ({blob_bytes / max(1, archived):.0f} B/save), "
+          f"{restored_ok}/{len(verify)} sampled saves restored intact")
+    print_table(("table", "rows before", "rows after", "kept"),
+                [(name, rows_before[name], rows_after[name], f"{rows_after[name] / max(1, rows_before[name]):.0%}")
+                 for name in rows_before]
+                + [("(db bytes, vacuumed)", bytes_before, bytes_after, f"{bytes_after / bytes_before:.0%}")])
+
+    client = app.test_client()
+    samples = {}
+    for label, user_ids in (("hot", hot[:args.logins]), ("archived (restores)", still_archived[:args.logins])):
+        samples[label] = [login_ms(client, usernames[user_id], DEFAULT_PASSWORD)[0] for user_id in user_ids]
+    samples["archived, again"] = [login_ms(client, usernames[user_id], DEFAULT_PASSWORD)[0]
+                                  for user_id in still_archived[:args.logins]]
+    print()
+    print_table(("login", "n", "p50 ms", "p99 ms"),
+                [(label, len(ms), f"{percentile(ms, 50):.1f}", f"{percentile(ms, 99):.1f}")
+                 for label, ms in samples.items()])
+
+
+if __name__ == "__main__":
+    main()
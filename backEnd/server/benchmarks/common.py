@@ -0,0 +1,78 @@
+"""
+Shared helpers for the backend benchmarks.
+
+Benchmarks are run as modules from backEnd/server, e.g.:
+    python -m benchmarks.userdata_put
+"""
+import os
+import tempfile
+import time
+from contextlib import contextmanager
+
+from sqlalchemy import event
+
+
+def load_app(db_path=None):
+    """
+    Import the Flask app against a throwaway SQLite file so benchmarks never
+    touch instance/data.db. Must be called before anything imports app.
+    """
+    if db_path is None:
+        db_path = os.path.join(tempfile.mkdtemp(prefix="webpets-bench-"), "bench.db")
+    os.environ["WEBPETS_DATABASE_URL"] = f"sqlite:///{db_path}"
+    import app as app_module
+    return app_module
+
+
+@contextmanager
+def count_queries(engine):
+    """Count the SQL statements executed on engine inside the block (BEGIN excluded)."""
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if not statement.startswith("BEGIN"):
+            statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+
+def percentile(samples, pct):
+    """Nearest-rank percentile of a list of numbers."""
+    ordered = sorted(samples)
+    if not ordered:
+        return 0.0
+    rank = max(0, min(len(ordered) - 1, int(round(pct / 100.0 * len(ordered) + 0.5)) - 1))
+    return ordered[rank]
+
+
+def timed(fn, *args, **kwargs):
+    """Run fn and return (result, elapsed milliseconds)."""
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, (time.perf_counter() - start) * 1000.0
+
+
+def print_table(headers, rows):
+    """Print rows as a fixed-width table."""
+    widths = [max(len(str(h)), *(len(str(r[i])) for r in rows)) for i, h in enumerate(headers)]
+    line = "  ".join(str(h).rjust(w) for h, w in zip(headers, widths))
+    print(line)
+    print("-" * len(line))
+    for row in rows:
+        print("  ".join(str(c).rjust(w) for c, w in zip(row, widths)))
+
+
+def register_user(client, username, password="bench"):
+    """Register a user through the API and return the response JSON (including its token)."""
+    response = client.post("/register", json={"username": username, "password": password})
+    assert response.status_code == 201, response.get_json()
+    return response.get_json()
+
+
+def auth_headers(user):
+    """Authorization header for requests made as a registered or logged-in user."""
+    return {"Authorization": f"Bearer {user['token']}"}
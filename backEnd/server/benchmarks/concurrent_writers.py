@@ -0,0 +1,113 @@
+"""
+Concurrent writer load test: many processes saving to one SQLite file at once.
+
+Runs the same workload twice against a fresh database file: once with
+WEBPETS_SQLITE_TUNING=0 (rollback journal, no pragmas) and once with the
+default tuning (WAL, synchronous, cache and mmap pragmas). Each worker process
+stands in for a server worker: its threads each own a user and alternate GET
+and PUT of their save. Failed requests are "database is locked" errors
+surfacing as 500s.
+
+    python -m benchmarks.concurrent_writers [--processes 4] [--threads 4] [--requests 100]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from benchmarks.common import auth_headers, load_app, percentile, print_table, register_user
+from benchmarks.userdata_put import build_save
+
+
+def worker(client, user, requests, latencies, statuses):
+    url = f"/userdata/{user['id']}"
+    headers = auth_headers(user)
+    save = client.put(url, json={**build_save(20), "version": user["data"]["version"]}, headers=headers).get_json()
+    for i in range(requests):
+        start = time.perf_counter()
+        if i % 2:
+            response = client.get(url, headers=headers)
+            if response.status_code == 200:
+                # The read catches the pets up, so the next PUT has to start from it
+                read = response.get_json()
+                save = {"id": read["id"], "username": read["username"], **read["data"]}
+        else:
+            save["pets"][0]["hunger"] = (i % 100) / 100.0
+            response = client.put(url, json=save, headers=headers)
+            if response.status_code == 200:
+                save = response.get_json()
+        latencies.append((time.perf_counter() - start) * 1000.0)
+        statuses.append(response.status_code)
+
+
+def run_worker_process(db_path, process_index, threads, requests):
+    """Run one worker process's threads and write their raw results next to the database."""
+    app = load_app(db_path).app
+    setup_client = app.test_client()
+    users = [register_user(setup_client, f"writer-{process_index}-{i}") for i in range(threads)]
+
+    latencies, statuses = [], []
+    pool = [
+        threading.Thread(target=worker, args=(app.test_client(), user, requests, latencies, statuses))
+        for user in users
+    ]
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    with open(f"{db_path}.worker{process_index}.json", "w") as f:
+        json.dump({"latencies": latencies, "statuses": statuses}, f)
+
+
+def run_mode(tuning, processes, threads, requests):
+    db_path = os.path.join(tempfile.mkdtemp(prefix="webpets-writers-"), "writers.db")
+    env = dict(os.environ, WEBPETS_SQLITE_TUNING=tuning)
+    # Create the schema once so workers don't race on CREATE TABLE
+    subprocess.run([sys.executable, "-c", f"from benchmarks.common import load_app; load_app({db_path!r})"],
+                   env=env, check=True)
+    start = time.perf_counter()
+    children = [
+        subprocess.Popen(
+            [sys.executable, "-m", "benchmarks.concurrent_writers", "--worker", str(index), "--db", db_path,
+             "--threads", str(threads), "--requests", str(requests)],
+            env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        for index in range(processes)
+    ]
+    latencies, statuses = [], []
+    for index, child in enumerate(children):
+        child.wait()
+        with open(f"{db_path}.worker{index}.json") as f:
+            result = json.load(f)
+        latencies += result["latencies"]
+        statuses += result["statuses"]
+    elapsed = time.perf_counter() - start
+    return (len(statuses), sum(1 for status in statuses if status >= 500), f"{len(statuses) / elapsed:.0f}",
+            f"{percentile(latencies, 50):.1f}", f"{percentile(latencies, 99):.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--processes", type=int, default=4)
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--worker", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--db", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.worker is not None:
+        run_worker_process(args.db, args.worker, args.threads, args.requests)
+        return
+
+    rows = [
+        (label,) + run_mode(tuning, args.processes, args.threads, args.requests)
+        for label, tuning in (("untuned", "0"), ("tuned", "1"))
+    ]
+    print_table(("mode", "requests", "5xx", "req/s", "p50 ms", "p99 ms"), rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""
+Home object cleanup benchmark: per-object DELETEs vs one batch/area call.
+
+On a seeded population (--users), for yards of 10, 100 and 500 poops:
+    loop     DELETE /homeobject/<id> once per poop, as the client did
+    batch    one POST /userdata/<id>/homeobjects/delete selecting all poops
+and, for a 500-object yard, the latency of an area query (a collision check
+around one spot), end to end and as SQL alone. Runs once with the
+(user_data_id, x) area index and once with it dropped, each in a fresh
+process, and also reports what maintaining the index costs bulk seeding.
+
+    python -m benchmarks.home_object_cleanup [--users 20000] [--queries 200]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+from sqlalchemy import select
+
+from benchmarks.common import auth_headers, count_queries, load_app, percentile, print_table, register_user
+
+YARD_SIZES = (10, 100, 500)
+POOP = {"type": "temporary", "object_id": 1}
+
+
+def build_yard(size):
+    # Away pets would drop more poops on the next GET, so the yard has none
+    return {"home_objects": [{**POOP, "x": -8 + 16.0 * (i % 25) / 25, "y": -6 + 12.0 * (i // 25) / 25}
+                             for i in range(size)]}
+
+
+def run_child(users, queries, area_index):
+    app_module = load_app()
+    app, db = app_module.app, app_module.db
+    from seed import seed_users
+
+    if not area_index:
+        with app.app_context(), db.engine.begin() as conn:
+            conn.exec_driver_sql("DROP INDEX ix_home_object_user_data_id_x")
+
+    start = time.perf_counter()
+    with app.app_context():
+        seed_users(db.engine, users, "unused")
+        engine = db.engine
+    seed_seconds = time.perf_counter() - start
+
+    client = app.test_client()
+    result = {"seed_users_per_min": users / seed_seconds * 60, "cleanup": {}}
+    for size in YARD_SIZES:
+        for mode in ("loop", "batch"):
+            user = register_user(client, f"cleanup-{mode}-{size}")
+            headers = auth_headers(user)
+            save = client.put(f"/userdata/{user['id']}", json={**build_yard(size), "version": user["data"]["version"]},
+                              headers=headers).get_json()
+            ids = [obj["id"] for obj in save["home_objects"]]
+            with count_queries(engine) as statements:
+                start = time.perf_counter()
+                if mode == "loop":
+                    for object_id in ids:
+                        assert client.delete(f"/homeobject/{object_id}", headers=headers).status_code == 200
+                else:
+                    response = client.post(f"/userdata/{user['id']}/homeobjects/delete",
+                                           json={**POOP}, headers=headers)
+                    assert len(response.get_json()["deleted"]) == size
+                elapsed = (time.perf_counter() - start) * 1000.0
+            result["cleanup"][f"{size}/{mode}"] = {
+                "requests": size if mode == "loop" else 1, "queries": len(statements), "ms": elapsed,
+            }
+
+    user = register_user(client, "cleanup-query")
+    headers = auth_headers(user)
+    client.put(f"/userdata/{user['id']}", json={**build_yard(500), "version": user["data"]["version"]},
+               headers=headers)
+    latencies = []
+    for i in range(queries):
+        x, y = -7 + (i % 15), -5 + (i % 11)
+        start = time.perf_counter()
+        response = client.get(f"/userdata/{user['id']}/homeobjects?circle={x},{y},0.75", headers=headers)
+        latencies.append((time.perf_counter() - start) * 1000.0)
+        assert response.status_code == 200
+    result["query_p50"] = percentile(latencies, 50)
+    result["query_p99"] = percentile(latencies, 99)
+
+    # The selection's SQL alone, compiled up front and run on the driver connection
+    from home_object_selection import selection_where
+    from models import HomeObject
+    table = HomeObject.__table__
+    with app.app_context():
+        statements = []
+        for i in range(queries):
+            x, y = -7 + (i % 15), -5 + (i % 11)
+            compiled = select(table).where(*selection_where(user["id"], {"circle": (x, y, 0.75)})).compile(engine)
+            statements.append((str(compiled), tuple(compiled.params[name] for name in compiled.positiontup)))
+        connection = engine.raw_connection()
+        start = time.perf_counter()
+        for sql, params in statements:
+            connection.execute(sql, params).fetchall()
+        result["query_sql_us"] = (time.perf_counter() - start) * 1e6 / queries
+        connection.close()
+    print(json.dumps(result))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--users", type=int, default=20000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--no-area-index", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        run_child(args.users, args.queries, not args.no_area_index)
+        return
+
+    results = {}
+    for label, flags in (("user_data_id, x", []), ("none", ["--no-area-index"])):
+        env = dict(os.environ, WEBPETS_LOG_LEVEL="WARNING")
+        output = subprocess.run(
+            [sys.executable, "-m", "benchmarks.home_object_cleanup", "--child",
+             "--users", str(args.users), "--queries", str(args.queries), *flags],
+            env=env, capture_output=True, text=True, check=True,
+        ).stdout
+        results[label] = json.loads(output.strip().splitlines()[-1])
+
+    cleanup = results["user_data_id, x"]["cleanup"]
+    rows = []
+    for size in YARD_SIZES:
+        loop, batch = cleanup[f"{size}/loop"], cleanup[f"{size}/batch"]
+        rows.append((size, loop["requests"], loop["queries"], f"{loop['ms']:.1f}",
+                     batch["queries"], f"{batch['ms']:.1f}", f"{loop['ms'] / batch['ms']:.0f}x"))
+    print_table(("poops", "loop reqs", "loop queries", "loop ms", "batch queries", "batch ms", "speedup"), rows)
+    print()
+    print_table(
+        ("area index", "seed users/min", "area query p50 ms", "p99 ms", "SQL only us"),
+        [(label, f"{result['seed_users_per_min']:,.0f}", f"{result['query_p50']:.2f}", f"{result['query_p99']:.2f}",
+          f"{result['query_sql_us']:.0f}")
+         for label, result in results.items()],
+    )
+
+
+if __name__ == "__main__":
+    main()
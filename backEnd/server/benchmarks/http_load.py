@@ -0,0 +1,151 @@
+"""
+HTTP load generator for a running API server, or a side-by-side comparison.
+
+Each virtual player registers, then loops like an open client: GET its save,
+then PATCH a pet stat tick, over one keep-alive connection.
+
+    python -m benchmarks.http_load --url http://127.0.0.1:5000 --players 32 --duration 20
+    python -m benchmarks.http_load --compare --workers 4
+        # starts serve.py --server werkzeug, then serve.py (uvicorn), on scratch databases
+"""
+import argparse
+import http.client
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from urllib.parse import urlsplit
+
+from benchmarks.common import percentile, print_table
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class Player(threading.Thread):
+    def __init__(self, url, name, deadline, results):
+        super().__init__(daemon=True)
+        parts = urlsplit(url)
+        self.connection = http.client.HTTPConnection(parts.hostname, parts.port, timeout=30)
+        self.name_ = name
+        self.deadline = deadline
+        self.results = results
+        self.token = None
+
+    def request(self, method, path, body=None):
+        payload = json.dumps(body) if body is not None else None
+        headers = {"Content-Type": "application/json"} if payload else {}
+        if self.token:
+            headers["Authorization"] = f"Bearer {self.token}"
+        start = time.perf_counter()
+        try:
+            self.connection.request(method, path, body=payload, headers=headers)
+            response = self.connection.getresponse()
+            data = response.read()
+            status = response.status
+        except (OSError, http.client.HTTPException):
+            self.connection.close()
+            data, status = b"", 599
+        self.results.append((status, (time.perf_counter() - start) * 1000.0))
+        return status, (json.loads(data) if data and status < 500 else None)
+
+    def run(self):
+        status, user = self.request("POST", "/register", {"username": self.name_, "password": "load"})
+        if status != 201:
+            return
+        self.token = user["token"]
+        path = f"/userdata/{user['id']}"
+        _, save = self.request("PUT", path, {"version": user["data"]["version"],
+                                             "pets": [{"name": "load", "lastUpdate": int(time.time() * 1000)}]})
+        if not save:
+            return
+        version, pet_id = save["version"], save["pets"][0]["id"]
+        tick = 0
+        while time.time() < self.deadline:
+            status, body = self.request("GET", path)
+            if body:
+                version = body["data"]["version"]
+            tick += 1
+            status, body = self.request("PATCH", path, {
+                "base_version": version,
+                "pets": [{"id": pet_id, "hunger": (tick % 100) / 100.0, "lastUpdate": int(time.time() * 1000)}],
+            })
+            if body:
+                version = body["version"]
+
+
+def run_load(url, players, duration):
+    """Drive `players` concurrent clients for `duration` seconds; returns a summary row."""
+    results = []
+    deadline = time.time() + duration
+    run_id = uuid.uuid4().hex[:8]
+    threads = [Player(url, f"load-{run_id}-{i}", deadline, results) for i in range(players)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    latencies = [latency for _, latency in results]
+    errors = sum(1 for status, _ in results if status >= 500)
+    return (len(results), errors, f"{len(results) / elapsed:.0f}",
+            f"{percentile(latencies, 50):.1f}", f"{percentile(latencies, 99):.1f}")
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(server_args):
+    """Start serve.py on a scratch database and wait until it answers."""
+    port = free_port()
+    db_path = os.path.join(tempfile.mkdtemp(prefix="webpets-load-"), "load.db")
+    env = dict(os.environ, WEBPETS_DATABASE_URL=f"sqlite:///{db_path}")
+    process = subprocess.Popen(
+        [sys.executable, "serve.py", "--host", "127.0.0.1", "--port", str(port), *server_args],
+        cwd=SERVER_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    for _ in range(300):
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.1):
+                return process, f"http://127.0.0.1:{port}"
+        except OSError:
+            time.sleep(0.1)
+    process.kill()
+    raise RuntimeError(f"server {server_args} did not start")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--url", default="http://127.0.0.1:5000")
+    parser.add_argument("--players", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=20)
+    parser.add_argument("--compare", action="store_true")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    if not args.compare:
+        print_table(("server", "requests", "5xx", "req/s", "p50 ms", "p99 ms"),
+                    [(args.url,) + run_load(args.url, args.players, args.duration)])
+        return
+
+    rows = []
+    for label, server_args in (("werkzeug", ["--server", "werkzeug"]),
+                               (f"uvicorn x{args.workers}", ["--workers", str(args.workers)])):
+        process, url = start_server(server_args)
+        try:
+            rows.append((label,) + run_load(url, args.players, args.duration))
+        finally:
+            process.terminate()
+            process.wait()
+    print_table(("server", "requests", "5xx", "req/s", "p50 ms", "p99 ms"), rows)
+
+
+if __name__ == "__main__":
+    main()
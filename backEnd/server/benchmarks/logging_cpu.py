@@ -0,0 +1,142 @@
+"""
+Logging benchmark: CPU cost per PUT of a 100-object save under each logging setup.
+
+Each mode runs in a fresh process and database with stdout and stderr sent to
+a file, or with --sink slow-pipe to a pipe drained at about 1 MB/s, like a busy
+terminal or log shipper. "print" reproduces the synchronous prints the PUT route used to
+make (the whole payload, then one line per pet, home object and inventory
+entry); the other modes use request_logging as configured by the environment.
+CPU time covers every thread, including the log listener; modes are run
+--rounds times, interleaved, and the best round is reported.
+
+    python -m benchmarks.logging_cpu [--requests 300] [--objects 100] [--rounds 3] [--sink slow-pipe]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from benchmarks.common import auth_headers, load_app, percentile, print_table, register_user
+from benchmarks.userdata_put import build_save
+
+MODES = (
+    ("print (before)", {"WEBPETS_LOG_LEVEL": "WARNING"}, True),
+    ("default", {}, False),
+    ("sampled 5%", {"WEBPETS_LOG_SAMPLE_RATES": "update_userdata=0.05"}, False),
+    ("DEBUG + payloads", {"WEBPETS_LOG_LEVEL": "DEBUG", "WEBPETS_LOG_PAYLOADS": "1"}, False),
+)
+
+
+def add_legacy_prints(app):
+    from flask import request
+
+    @app.before_request
+    def print_payload():
+        if request.method == "PUT":
+            data = request.get_json()
+            print(f"PUT {request.path} received data:", data)
+            for key in ("pets", "home_objects", "inventory"):
+                for entry in data.get(key, []):
+                    print(f"unpacking {key} entry...", entry)
+
+
+def run_child(requests, objects, legacy):
+    app_module = load_app()
+    app = app_module.app
+    if legacy:
+        add_legacy_prints(app)
+    client = app.test_client()
+    user = register_user(client, "logger")
+    url = f"/userdata/{user['id']}"
+    headers = auth_headers(user)
+    save = client.put(url, json={**build_save(objects), "version": user["data"]["version"]}, headers=headers).get_json()
+
+    latencies = []
+    cpu_start, wall_start = time.process_time(), time.perf_counter()
+    for i in range(requests):
+        save["money"] = i
+        request_start = time.perf_counter()
+        response = client.put(url, json=save, headers=headers)
+        latencies.append((time.perf_counter() - request_start) * 1000.0)
+        assert response.status_code == 200
+        save = response.get_json()
+    cpu = time.process_time() - cpu_start
+    wall = time.perf_counter() - wall_start
+    return {
+        "cpu_ms": cpu * 1000.0 / requests,
+        "rps": requests / wall,
+        "p50": percentile(latencies, 50),
+        "p99": percentile(latencies, 99),
+    }
+
+
+def drain_slowly(stream, received, chunk=64 * 1024, pause=0.05):
+    while True:
+        data = stream.read(chunk)
+        if not data:
+            return
+        received.append(len(data))
+        time.sleep(pause)
+
+
+def run_mode(command, env, sink, log_path):
+    """Run one child with its output sent to sink; returns the bytes it logged."""
+    if sink == "file":
+        with open(log_path, "w") as log:
+            subprocess.run(command, env=env, stdout=log, stderr=log, check=True)
+        return os.path.getsize(log_path)
+    process = subprocess.Popen(command, env=env, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+    received = []
+    reader = threading.Thread(target=drain_slowly, args=(process.stdout, received))
+    reader.start()
+    if process.wait() != 0:
+        raise subprocess.CalledProcessError(process.returncode, command)
+    reader.join()
+    return sum(received)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--objects", type=int, default=100)
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--sink", choices=("file", "slow-pipe"), default="file")
+    parser.add_argument("--child", choices=[label for label, _, _ in MODES], help=argparse.SUPPRESS)
+    parser.add_argument("--result", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        legacy = dict((label, legacy) for label, _, legacy in MODES)[args.child]
+        result = run_child(args.requests, args.objects, legacy)
+        with open(args.result, "w") as f:
+            json.dump(result, f)
+        return
+
+    best = {}
+    scratch = tempfile.mkdtemp(prefix="webpets-logging-")
+    for _ in range(args.rounds):
+        for index, (label, env, _) in enumerate(MODES):
+            result_path = os.path.join(scratch, f"mode{index}.json")
+            log_path = os.path.join(scratch, f"mode{index}.log")
+            command = [sys.executable, "-m", "benchmarks.logging_cpu", "--child", label, "--result", result_path,
+                       "--requests", str(args.requests), "--objects", str(args.objects)]
+            logged = run_mode(command, {**os.environ, **env}, args.sink, log_path)
+            with open(result_path) as f:
+                result = json.load(f)
+            result["log_kib"] = logged / 1024
+            if label not in best or result["cpu_ms"] < best[label]["cpu_ms"]:
+                best[label] = result
+
+    rows = [
+        (label, f"{result['cpu_ms']:.2f}", f"{result['rps']:.0f}", f"{result['p50']:.2f}",
+         f"{result['p99']:.2f}", f"{result['log_kib']:.0f}")
+        for label, result in best.items()
+    ]
+    print_table(("mode", "CPU ms/req", "req/s", "p50 ms", "p99 ms", "log KiB"), rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+Login storm benchmark: login throughput vs hashing pool size and scrypt cost.
+
+Each (workers, N) combination runs in a fresh process and database. Users are
+registered first, then --clients threads log in back to back for --duration
+seconds, as after a deploy. 429s are logins the pool turned away; a client
+that gets one waits its Retry-After (shortened to 50 ms here) before retrying.
+
+    python -m benchmarks.login_throughput [--clients 32] [--duration 5]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+
+from benchmarks.common import load_app, percentile, print_table, register_user
+
+POOL_SIZES = (1, 2, 4)
+SCRYPT_COSTS = (2 ** 12, 2 ** 14)
+
+
+def run_child(clients, duration):
+    app = load_app().app
+    setup_client = app.test_client()
+    for i in range(clients):
+        register_user(setup_client, f"storm-{i}")
+
+    latencies, statuses = [], []
+    deadline = time.perf_counter() + duration
+
+    def client_loop(index):
+        client = app.test_client()
+        credentials = {"username": f"storm-{index}", "password": "bench"}
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            response = client.post("/login", json=credentials)
+            latencies.append((time.perf_counter() - start) * 1000.0)
+            statuses.append(response.status_code)
+            if response.status_code == 429:
+                time.sleep(0.05)
+
+    threads = [threading.Thread(target=client_loop, args=(i,)) for i in range(clients)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    ok = [latency for latency, status in zip(latencies, statuses) if status == 200]
+    print(json.dumps({
+        "logins": len(ok),
+        "rejected": statuses.count(429),
+        "errors": sum(1 for status in statuses if status not in (200, 429)),
+        "rps": len(ok) / elapsed,
+        "p50": percentile(ok, 50),
+        "p99": percentile(ok, 99),
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--clients", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=5)
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        run_child(args.clients, args.duration)
+        return
+
+    rows = []
+    for cost in SCRYPT_COSTS:
+        for workers in POOL_SIZES:
+            env = dict(os.environ, WEBPETS_PASSWORD_SCRYPT_N=str(cost), WEBPETS_PASSWORD_HASH_WORKERS=str(workers),
+                       WEBPETS_LOG_LEVEL="WARNING")
+            output = subprocess.run(
+                [sys.executable, "-m", "benchmarks.login_throughput", "--child",
+                 "--clients", str(args.clients), "--duration", str(args.duration)],
+                env=env, capture_output=True, text=True, check=True,
+            ).stdout
+            result = json.loads(output.strip().splitlines()[-1])
+            rows.append((f"2^{cost.bit_length() - 1}", workers, result["logins"], result["rejected"],
+                         result["errors"], f"{result['rps']:.1f}", f"{result['p50']:.0f}", f"{result['p99']:.0f}"))
+    print_table(("scrypt N", "pool", "logins", "429s", "errors", "logins/s", "p50 ms", "p99 ms"), rows)
+
+
+if __name__ == "__main__":
+    main()
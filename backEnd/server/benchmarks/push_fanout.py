@@ -0,0 +1,211 @@
+"""
+Event stream fan-out: idle stream cost, delivery latency and burst coalescing.
+
+Starts serve.py (uvicorn, one worker) on a scratch database, registers
+--connections / 4 users and opens four event streams for each (the per-user
+cap), then reports the server's resident memory per open stream. Then, for
+--writers of those users at once, sends --burst back-to-back PATCHes of a pet
+stat and reports how long each write took to show up on the user's streams
+(from its reply to the first message carrying its version) and how many
+messages a burst turned into, for PUSH_COALESCE_MS 0 and --coalesce-ms.
+
+    python -m benchmarks.push_fanout [--connections 2000] [--writers 20] [--burst 20] [--coalesce-ms 250]
+"""
+import argparse
+import asyncio
+import http.client
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.common import percentile, print_table
+from benchmarks.http_load import SERVER_DIR, free_port
+
+STREAMS_PER_USER = 4
+
+
+def start_server(coalesce_ms):
+    port = free_port()
+    db_path = os.path.join(tempfile.mkdtemp(prefix="webpets-push-"), "push.db")
+    env = dict(
+        os.environ,
+        WEBPETS_DATABASE_URL=f"sqlite:///{db_path}",
+        WEBPETS_LOG_LEVEL="WARNING",
+        WEBPETS_PASSWORD_SCRYPT_N="1024",  # registration isn't what's measured
+        WEBPETS_PUSH_COALESCE_MS=str(coalesce_ms),
+        WEBPETS_PUSH_MAX_STREAMS_PER_USER=str(STREAMS_PER_USER),
+        WEBPETS_PUSH_SIMULATION_INTERVAL="0",
+    )
+    process = subprocess.Popen(
+        [sys.executable, "serve.py", "--host", "127.0.0.1", "--port", str(port), "--workers", "1"],
+        cwd=SERVER_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    for _ in range(300):
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.1):
+                return process, port
+        except OSError:
+            time.sleep(0.1)
+    process.kill()
+    raise RuntimeError("server did not start")
+
+
+def rss_kb(pid):
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1])
+    return 0
+
+
+def call(port, method, path, body=None, token=None):
+    connection = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+    headers = {"Content-Type": "application/json"}
+    if token:
+        headers["Authorization"] = f"Bearer {token}"
+    connection.request(method, path, body=json.dumps(body) if body is not None else None, headers=headers)
+    response = connection.getresponse()
+    data = json.loads(response.read() or b"null")
+    connection.close()
+    return response.status, data
+
+
+def register(port, index):
+    status, user = call(port, "POST", "/register", {"username": f"push-{index}", "password": "bench"})
+    assert status == 201, user
+    return user
+
+
+class Stream:
+    """One open event stream; records when each message (by SSE id) arrived."""
+
+    def __init__(self, user):
+        self.user = user
+        self.arrivals = []  # (monotonic time, version)
+        self.writer = None
+
+    async def open(self, port):
+        reader, self.writer = await asyncio.open_connection("127.0.0.1", port)
+        self.writer.write(f"GET /userdata/{self.user['id']}/events?token={self.user['token']} HTTP/1.1\r\n"
+                          f"Host: 127.0.0.1\r\nAccept: text/event-stream\r\n\r\n".encode("ascii"))
+        await self.writer.drain()
+        status = await reader.readline()
+        if b" 200 " not in status:
+            raise RuntimeError(f"stream refused: {status!r}")
+        while await reader.readline() not in (b"\r\n", b""):
+            pass
+        return reader
+
+    async def listen(self, reader):
+        # Chunked transfer framing lines are skipped along with everything but "id:"
+        while True:
+            line = await reader.readline()
+            if not line:
+                return
+            if line.startswith(b"id: "):
+                self.arrivals.append((time.monotonic(), int(line[4:])))
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+
+
+def write_burst(port, user, pet_id, version, burst):
+    """PATCH a pet's hunger `burst` times in a row; returns [(reply time, version)]."""
+    replies = []
+    for i in range(burst):
+        status, reply = call(port, "PATCH", f"/userdata/{user['id']}",
+                             {"base_version": version, "pets": [{"id": pet_id, "hunger": (i % 100) / 100.0}]},
+                             user["token"])
+        assert status == 200, reply
+        version = reply["version"]
+        replies.append((time.monotonic(), version))
+    return replies
+
+
+async def run(coalesce_ms, connections, writers, burst):
+    process, port = start_server(coalesce_ms)
+    loop = asyncio.get_running_loop()
+    pool = ThreadPoolExecutor(max_workers=max(writers, 8))
+    streams, tasks = [], []
+    try:
+        users = await asyncio.gather(*(
+            loop.run_in_executor(pool, register, port, i) for i in range(max(writers, connections // STREAMS_PER_USER))
+        ))
+        base_kb = rss_kb(process.pid)
+        for user in users:
+            for _ in range(STREAMS_PER_USER):
+                if len(streams) < connections:
+                    streams.append(Stream(user))
+        for start in range(0, len(streams), 200):
+            batch = streams[start:start + 200]
+            readers = await asyncio.gather(*(stream.open(port) for stream in batch))
+            tasks += [asyncio.ensure_future(stream.listen(reader)) for stream, reader in zip(batch, readers)]
+        await asyncio.sleep(1)
+        per_stream_kb = (rss_kb(process.pid) - base_kb) / max(1, len(streams))
+
+        # One pet per writer, then let the resulting events drain
+        saves = await asyncio.gather(*(
+            loop.run_in_executor(pool, lambda user=user: call(
+                port, "PUT", f"/userdata/{user['id']}",
+                {"version": user["data"]["version"], "pets": [{"name": "bench", "evolution_id": [1, 0]}]},
+                user["token"])[1])
+            for user in users[:writers]
+        ))
+        await asyncio.sleep(coalesce_ms / 1000.0 + 0.5)
+        for stream in streams:
+            stream.arrivals.clear()
+
+        results = await asyncio.gather(*(
+            loop.run_in_executor(pool, write_burst, port, user, save["pets"][0]["id"], save["version"], burst)
+            for user, save in zip(users, saves)
+        ))
+        await asyncio.sleep(coalesce_ms / 1000.0 + 1.0)
+
+        latencies, messages, missed = [], [], 0
+        for user, replies in zip(users, results):
+            watching = [stream for stream in streams if stream.user is user]
+            for stream in watching:
+                messages.append(len(stream.arrivals))
+                for replied_at, version in replies:
+                    delivered = [at for at, seen in stream.arrivals if seen >= version]
+                    if delivered:
+                        latencies.append(max(0.0, delivered[0] - replied_at) * 1000.0)
+                    else:
+                        missed += 1
+        return (coalesce_ms, len(streams), f"{per_stream_kb:.1f}", writers * burst,
+                f"{sum(messages) / max(1, len(messages)):.1f}", missed,
+                f"{percentile(latencies, 50):.1f}", f"{percentile(latencies, 99):.1f}")
+    finally:
+        for stream in streams:
+            stream.close()
+        for task in tasks:
+            task.cancel()
+        await asyncio.sleep(0.5)  # let the closes reach the server before it's stopped
+        pool.shutdown(wait=False)
+        process.terminate()
+        process.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--connections", type=int, default=2000)
+    parser.add_argument("--writers", type=int, default=20)
+    parser.add_argument("--burst", type=int, default=20)
+    parser.add_argument("--coalesce-ms", type=int, default=250)
+    args = parser.parse_args()
+
+    rows = [asyncio.run(run(coalesce_ms, args.connections, args.writers, args.burst))
+            for coalesce_ms in (0, args.coalesce_ms)]
+    print(f"{args.burst} writes per burst, {STREAMS_PER_USER} streams per user")
+    print_table(("coalesce ms", "streams", "server KB/stream", "writes", "messages/stream", "missed",
+                 "p50 delivery ms", "p99 delivery ms"), rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""
+Query-count regression check for the save endpoints.
+
+Every endpoint that returns or writes a save is exercised with a small and a
+large save. The number of SQL statements must not grow with the save and must
+stay within the budget below, otherwise the script exits non-zero.
+tests/test_query_counts.py runs the same requests with fixed budgets as part
+of the test suite.
+
+    python -m benchmarks.query_counts
+"""
+import sys
+
+from benchmarks.common import auth_headers, count_queries, load_app, print_table, register_user
+from benchmarks.userdata_put import build_save
+
+SMALL_SAVE, LARGE_SAVE = 10, 200
+
+# Maximum statements per request, independent of save size
+QUERY_BUDGETS = {
+    "POST /register": 8,
+    "POST /login": 10,
+    "GET /userdata": 6,
+    "GET /userdata (cached)": 2,
+    "PUT /userdata": 11,
+    "PATCH /userdata": 9,
+    "GET /userdata (after write)": 10,  # the PUT above rewinds lastUpdate, so this includes a catch-up
+}
+
+
+def measure(client, engine, size):
+    """Return {endpoint: statement count} for a user whose save has `size` home objects."""
+    username = f"query-count-{size}"
+    counts = {}
+    with count_queries(engine) as statements:
+        user = register_user(client, username)
+    counts["POST /register"] = len(statements)
+
+    url = f"/userdata/{user['id']}"
+    headers = auth_headers(user)
+    response = client.put(url, json={**build_save(size), "version": user["data"]["version"]}, headers=headers)
+    assert response.status_code == 200, response.get_json()
+
+    with count_queries(engine) as statements:
+        response = client.post("/login", json={"username": username, "password": "bench"})
+    counts["POST /login"] = len(statements)
+    assert response.status_code == 200, response.get_json()
+
+    with count_queries(engine) as statements:
+        response = client.get(url, headers=headers)
+    counts["GET /userdata"] = len(statements)
+    assert response.status_code == 200, response.get_json()
+    save = response.get_json()["data"]  # as caught up by the login
+
+    with count_queries(engine) as statements:
+        response = client.get(url, headers=headers)
+    counts["GET /userdata (cached)"] = len(statements)
+    assert response.status_code == 200, response.get_json()
+
+    save["pets"][0]["hunger"] = 0.75
+    save["home_objects"].append({"type": "temporary", "object_id": 1})
+    with count_queries(engine) as statements:
+        response = client.put(url, json=save, headers=headers)
+    counts["PUT /userdata"] = len(statements)
+    assert response.status_code == 200, response.get_json()
+    save = response.get_json()
+
+    patch = {
+        "base_version": save["version"],
+        "pets": [{"id": save["pets"][0]["id"], "hunger": 0.8}],
+        "inventory": [{"id": row["id"], "quantity": 9} for row in save["inventory"]],
+        "deleted": {"home_objects": [save["home_objects"][0]["id"]]},
+    }
+    with count_queries(engine) as statements:
+        response = client.patch(url, json=patch, headers=headers)
+    counts["PATCH /userdata"] = len(statements)
+    assert response.status_code == 200, response.get_json()
+
+    with count_queries(engine) as statements:
+        response = client.get(url, headers=headers)
+    counts["GET /userdata (after write)"] = len(statements)
+    assert response.status_code == 200, response.get_json()
+    return counts
+
+
+def main():
+    app_module = load_app()
+    app, db = app_module.app, app_module.db
+    with app.app_context():
+        engine = db.engine
+    client = app.test_client()
+
+    small = measure(client, engine, SMALL_SAVE)
+    large = measure(client, engine, LARGE_SAVE)
+
+    failures = []
+    rows = []
+    for endpoint, budget in QUERY_BUDGETS.items():
+        ok = small[endpoint] == large[endpoint] and large[endpoint] <= budget
+        if not ok:
+            failures.append(endpoint)
+        rows.append((endpoint, small[endpoint], large[endpoint], budget, "ok" if ok else "FAIL"))
+    print_table(("endpoint", f"{SMALL_SAVE} objs", f"{LARGE_SAVE} objs", "budget", ""), rows)
+
+    if failures:
+        print(f"\nQuery count regression in: {', '.join(failures)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,91 @@
+"""
+Save encoding benchmark: JSON rows vs the columnar encodings (see save_codec.py).
+
+For saves with 10, 100 and 1000 home objects, reports the body size (raw and
+gzipped, as a compressing proxy would send it) and the time to encode and
+decode one save in each encoding the server offers:
+    json      application/json, the row-per-object shape
+    columns   application/vnd.webpets.columns+json
+    msgpack   application/vnd.webpets.columns+msgpack (if msgpack is installed)
+Each save is also PUT back in each encoding and read again to check the
+round trip.
+
+    python -m benchmarks.save_encoding [--iterations 200]
+"""
+import argparse
+import gzip
+import time
+
+from benchmarks.common import auth_headers, load_app, print_table, register_user
+from benchmarks.userdata_put import build_save
+
+HOME_OBJECT_COUNTS = (10, 100, 1000)
+
+
+def per_call_us(fn, arg, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn(arg)
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+def comparable(save):
+    """
+    A save's rows without the fields the columnar encodings leave out or
+    represent differently (abilities as a list or a comma string, nulls).
+    """
+    def normalize(field, value):
+        return ",".join(value) if field == "abilities" and not isinstance(value, str) else value
+
+    return {key: [{field: normalize(field, value) for field, value in row.items()
+                   if field not in ("user_data_id", "item") and value is not None}
+                  for row in save[key]]
+            for key in ("pets", "home_objects", "inventory")}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=200)
+    args = parser.parse_args()
+
+    app_module = load_app()
+    app, db = app_module.app, app_module.db
+    from save_reader import read_save
+    codecs = list(app.extensions["save_codecs"].by_media_type.values())
+
+    client = app.test_client()
+    rows = []
+    for count in HOME_OBJECT_COUNTS:
+        user = register_user(client, f"encoding-{count}")
+        url = f"/userdata/{user['id']}"
+        headers = auth_headers(user)
+        payload = build_save(count)
+        for pet in payload["pets"]:
+            pet["lastUpdate"] = int(time.time() * 1000)  # not away, so reads don't simulate and change it
+        client.put(url, json={**payload, "version": user["data"]["version"]}, headers=headers)
+        with app.app_context():
+            save = read_save(db.session, user["id"])
+        reference = comparable(save["data"])
+
+        baseline = None
+        for codec in codecs:
+            body = codec.encode(save)
+            baseline = baseline or len(body)
+            encode_us = per_call_us(codec.encode, save, args.iterations)
+            decode_us = per_call_us(codec.decode, body, args.iterations)
+
+            # Round trip through the API: PUT the save in this encoding, GET it back the same way
+            put = client.put(url, data=codec.encode(save["data"]), content_type=codec.media_type,
+                             headers={**headers, "Accept": codec.media_type})
+            save["data"]["version"] = codec.decode(put.get_data()).get("version")
+            got = client.get(url, headers={**headers, "Accept": codec.media_type})
+            ok = (put.status_code == 200 and got.mimetype == codec.media_type
+                  and comparable(codec.decode(got.get_data())["data"]) == reference)
+            rows.append((count, codec.name, len(body), f"{len(body) / baseline:.2f}",
+                         len(gzip.compress(body)), f"{encode_us:.0f}", f"{decode_us:.0f}", "yes" if ok else "NO"))
+    print_table(("home_objects", "encoding", "bytes", "vs json", "gzipped", "encode us", "decode us", "round trip"),
+                rows)
+
+
+if __name__ == "__main__":
+    main()
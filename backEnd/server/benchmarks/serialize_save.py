@@ -0,0 +1,90 @@
+"""
+Save serialization micro-benchmark: ORM to_dict chain vs the Core read path.
+
+For small, typical and large saves, loads and encodes one save per iteration
+(a fresh session each time, as a request would have) with:
+    orm + json       eager-loaded User query, to_dict(), stdlib json (jsonify's old path)
+    core + json      save_reader.read_save(), stdlib json
+    core + orjson    save_reader.read_save(), orjson (if installed)
+and reports time per save plus the bytes allocated (tracemalloc peak) for one.
+
+    python -m benchmarks.serialize_save [--iterations 200]
+"""
+import argparse
+import time
+import tracemalloc
+
+from sqlalchemy.orm import joinedload, selectinload
+
+from benchmarks.common import auth_headers, load_app, print_table, register_user
+from benchmarks.userdata_put import build_save
+
+SAVE_SIZES = (("small", 10), ("typical", 100), ("large", 1000))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=200)
+    args = parser.parse_args()
+
+    app_module = load_app()
+    app, db = app_module.app, app_module.db
+    from json_codec import get_encoder, orjson
+    from save_reader import read_save
+
+    stdlib_dumps = get_encoder("stdlib")
+    candidates = [
+        ("orm + json", lambda user_id: stdlib_dumps(orm_save(app_module, user_id))),
+        ("core + json", lambda user_id: stdlib_dumps(read_save(db.session, user_id))),
+    ]
+    if orjson is not None:
+        orjson_dumps = get_encoder("orjson")
+        candidates.append(("core + orjson", lambda user_id: orjson_dumps(read_save(db.session, user_id))))
+
+    client = app.test_client()
+    rows = []
+    for label, size in SAVE_SIZES:
+        user = register_user(client, f"serialize-{label}")
+        save = client.put(f"/userdata/{user['id']}", json={**build_save(size), "version": user["data"]["version"]},
+                          headers=auth_headers(user)).get_json()
+        row_count = len(save["pets"]) + len(save["home_objects"]) + len(save["inventory"])
+        baseline = None
+        for name, serialize in candidates:
+            with app.app_context():
+                serialize(user["id"])  # warm statement caches
+                db.session.remove()
+
+                tracemalloc.start()
+                serialize(user["id"])
+                peak = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+                db.session.remove()
+
+                start = time.perf_counter()
+                for _ in range(args.iterations):
+                    serialize(user["id"])
+                    db.session.remove()
+                per_save = (time.perf_counter() - start) * 1e6 / args.iterations
+            baseline = baseline or per_save
+            rows.append((label, row_count, name, f"{per_save:.0f}", f"{baseline / per_save:.1f}x",
+                         f"{peak / 1024:.0f}"))
+    print_table(("save", "rows", "path", "us/save", "speedup", "peak KiB"), rows)
+
+
+def orm_save(app_module, user_id):
+    """The save as the ORM loaded it: user and save in one joined SELECT, then one SELECT per child table."""
+    User, UserData = app_module.User, app_module.UserData
+    user = User.query.options(
+        joinedload(User.data).options(
+            selectinload(UserData.pets),
+            selectinload(UserData.home_objects),
+            selectinload(UserData.inventory),
+        )
+    ).filter_by(id=user_id).one()
+    result = user.to_dict()
+    result["data"] = user.data.to_dict()
+    return result
+
+
+if __name__ == "__main__":
+    main()
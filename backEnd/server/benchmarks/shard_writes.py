@@ -0,0 +1,139 @@
+"""
+Sharded write throughput: the same write load against 1, 2 and 4 shard files.
+
+For each shard count, --processes worker processes (standing in for server
+workers) each register --threads users, then every thread PATCHes its pet's
+stats as fast as it can for --duration seconds, all processes starting
+together. Each save PATCH is one short write transaction on its user's shard,
+so with one shard every commit queues on the same SQLite write lock. Reports
+writes/s, latency percentiles and failed requests ("database is locked" 500s)
+per shard count.
+
+    python -m benchmarks.shard_writes [--shards 1 2 4] [--processes 4] [--threads 4] [--duration 5]
+    python -m benchmarks.shard_writes --synchronous FULL   # fsync every commit
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from benchmarks.common import auth_headers, load_app, percentile, print_table, register_user
+
+SETUP_SECONDS = 10  # time given to every worker process to start and register its users
+
+
+def writer(client, user, start_at, deadline, latencies, statuses):
+    url = f"/userdata/{user['id']}"
+    headers = auth_headers(user)
+    body = {"version": user["data"]["version"], "pets": [{"name": "bench", "evolution_id": [1, 0]}]}
+    save = client.put(url, json=body, headers=headers).get_json()
+    version, pet_id = save["version"], save["pets"][0]["id"]
+    time.sleep(max(0.0, start_at - time.time()))
+    i = 0
+    while time.time() < deadline:
+        i += 1
+        start = time.perf_counter()
+        patch = {"base_version": version, "pets": [{"id": pet_id, "hunger": (i % 100) / 100.0}]}
+        response = client.patch(url, json=patch, headers=headers)
+        latencies.append((time.perf_counter() - start) * 1000.0)
+        statuses.append(response.status_code)
+        if response.status_code == 200:
+            version = response.get_json()["version"]
+
+
+def run_worker_process(db_dir, process_index, threads, start_at, duration):
+    app = load_app(os.path.join(db_dir, "directory.db")).app
+    setup_client = app.test_client()
+    users = [register_user(setup_client, f"writer-{process_index}-{i}") for i in range(threads)]
+    counts = {}
+    for user in users:
+        shard = app.extensions["shards"].shard_of(user["id"])
+        counts[shard] = counts.get(shard, 0) + 1
+    late = time.time() > start_at
+
+    latencies, statuses = [], []
+    pool = [
+        threading.Thread(target=writer,
+                         args=(app.test_client(), user, start_at, start_at + duration, latencies, statuses))
+        for user in users
+    ]
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    with open(os.path.join(db_dir, f"worker{process_index}.json"), "w") as f:
+        json.dump({"latencies": latencies, "statuses": statuses, "users_per_shard": counts, "late": late}, f)
+
+
+def run_shards(shard_count, processes, threads, duration, synchronous):
+    db_dir = tempfile.mkdtemp(prefix="webpets-shards-")
+    env = dict(
+        os.environ,
+        WEBPETS_LOG_LEVEL="WARNING",
+        WEBPETS_AUTH_SECRET="shard-writes",
+        WEBPETS_SQLITE_SYNCHRONOUS=synchronous,
+        WEBPETS_PASSWORD_SCRYPT_N="1024",  # registration isn't what's measured
+        WEBPETS_DB_SHARDS=",".join(f"sqlite:///{os.path.join(db_dir, f'shard{i}.db')}" for i in range(shard_count)),
+    )
+    # Create the schemas once so workers don't race on CREATE TABLE
+    subprocess.run([sys.executable, "-c",
+                    f"from benchmarks.common import load_app; load_app({os.path.join(db_dir, 'directory.db')!r})"],
+                   env=env, check=True)
+    start_at = time.time() + SETUP_SECONDS
+    children = [
+        subprocess.Popen(
+            [sys.executable, "-m", "benchmarks.shard_writes", "--worker", str(index), "--db", db_dir,
+             "--threads", str(threads), "--start-at", str(start_at), "--duration", str(duration)],
+            env=env, stdout=subprocess.DEVNULL,
+        )
+        for index in range(processes)
+    ]
+    latencies, statuses, users_per_shard, late = [], [], {}, False
+    for index, child in enumerate(children):
+        if child.wait() != 0:
+            raise SystemExit(f"worker {index} failed")
+        with open(os.path.join(db_dir, f"worker{index}.json")) as f:
+            result = json.load(f)
+        latencies += result["latencies"]
+        statuses += result["statuses"]
+        late = late or result["late"]
+        for shard, count in result["users_per_shard"].items():
+            users_per_shard[shard] = users_per_shard.get(shard, 0) + count
+    if late:
+        print(f"warning: {shard_count} shard(s): workers took longer than {SETUP_SECONDS}s to start", file=sys.stderr)
+    ok = sum(1 for status in statuses if status == 200)
+    spread = "/".join(str(users_per_shard.get(str(shard), 0)) for shard in range(shard_count))
+    return ok / duration, (shard_count, spread, len(statuses), len(statuses) - ok, f"{ok / duration:.0f}",
+                           f"{percentile(latencies, 50):.1f}", f"{percentile(latencies, 99):.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--shards", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--processes", type=int, default=4)
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--duration", type=float, default=5)
+    parser.add_argument("--synchronous", default="NORMAL", choices=("OFF", "NORMAL", "FULL"))
+    parser.add_argument("--worker", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--db", help=argparse.SUPPRESS)
+    parser.add_argument("--start-at", type=float, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.worker is not None:
+        run_worker_process(args.db, args.worker, args.threads, args.start_at, args.duration)
+        return
+
+    rows, base = [], None
+    for shard_count in args.shards:
+        rate, row = run_shards(shard_count, args.processes, args.threads, args.duration, args.synchronous)
+        base = base or rate
+        rows.append(row + (f"{rate / base:.2f}x",))
+    print(f"{os.cpu_count()} CPU(s), synchronous={args.synchronous}")
+    print_table(("shards", "users per shard", "requests", "failed", "writes/s", "p50 ms", "p99 ms", "scaling"), rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""
+Shop benchmark: buying an item with a full-save PUT vs POST /purchase.
+
+    put        the old client flow: edit money and inventory locally, PUT the whole save
+    purchase   POST /userdata/<id>/purchase {"item_id", "quantity"}
+For saves with 10, 100 and 400 home objects, reports bytes sent and received,
+queries and latency per purchase. Then --tabs threads buy apples for the same
+user at once, each with money for only half of them, and the final money and
+inventory are checked for lost updates and overspending.
+
+    python -m benchmarks.shop_ops [--iterations 50] [--tabs 8]
+"""
+import argparse
+import json
+import threading
+
+from benchmarks.common import auth_headers, count_queries, load_app, percentile, print_table, register_user, timed
+from benchmarks.userdata_put import build_save
+
+SAVE_SIZES = (10, 100, 400)
+APPLE_ID, APPLE_PRICE = 4, 25
+
+
+def put_purchase(client, url, headers, save):
+    """The client-side flow: pay and add an apple locally, then upload the whole save."""
+    save = {**save, "money": save["money"] - APPLE_PRICE, "inventory": [dict(entry) for entry in save["inventory"]]}
+    entry = next((entry for entry in save["inventory"] if entry["item_id"] == APPLE_ID), None)
+    if entry is None:
+        save["inventory"].append({"item_id": APPLE_ID, "quantity": 1})
+    else:
+        entry["quantity"] += 1
+    body = json.dumps(save)
+    response = client.put(url, data=body, content_type="application/json", headers=headers)
+    return response, len(body)
+
+
+def run_sizes(app, engine, client, iterations):
+    rows = []
+    for size in SAVE_SIZES:
+        for mode in ("put", "purchase"):
+            user = register_user(client, f"shop-{mode}-{size}")
+            url = f"/userdata/{user['id']}"
+            headers = auth_headers(user)
+            save = client.put(url, json={**build_save(size), "money": APPLE_PRICE * iterations * 2,
+                                    "version": user["data"]["version"]},
+                              headers=headers).get_json()
+            sent, received, queries, latencies = [], [], [], []
+            for _ in range(iterations):
+                with count_queries(engine) as statements:
+                    if mode == "put":
+                        (response, body_bytes), elapsed = timed(put_purchase, client, url, headers, save)
+                        save = response.get_json()
+                    else:
+                        body = json.dumps({"item_id": APPLE_ID, "quantity": 1})
+                        body_bytes = len(body)
+                        response, elapsed = timed(client.post, f"{url}/purchase", data=body,
+                                                  content_type="application/json", headers=headers)
+                assert response.status_code == 200, response.get_json()
+                sent.append(body_bytes)
+                received.append(len(response.get_data()))
+                queries.append(len(statements))
+                latencies.append(elapsed)
+            rows.append((size, mode, max(sent), max(received), max(queries),
+                         f"{percentile(latencies, 50):.2f}", f"{percentile(latencies, 99):.2f}"))
+    print_table(("home_objects", "flow", "bytes sent", "bytes received", "queries", "p50 ms", "p99 ms"), rows)
+
+
+def run_race(app, client, tabs):
+    rows = []
+    for mode in ("put", "purchase"):
+        user = register_user(client, f"shop-race-{mode}")
+        url = f"/userdata/{user['id']}"
+        headers = auth_headers(user)
+        affordable = tabs // 2
+        start_save = client.put(url, json={"money": APPLE_PRICE * affordable, "inventory": [],
+                                      "version": user["data"]["version"]},
+                                headers=headers).get_json()
+        successes = []
+        barrier = threading.Barrier(tabs)
+
+        def tab():
+            tab_client = app.test_client()
+            # Every tab starts from the save it loaded, as separate browser tabs would
+            barrier.wait()
+            if mode == "put":
+                if start_save["money"] >= APPLE_PRICE:
+                    response, _ = put_purchase(tab_client, url, headers, start_save)
+                    successes.append(response.status_code == 200)
+            else:
+                response = tab_client.post(f"{url}/purchase", json={"item_id": APPLE_ID}, headers=headers)
+                successes.append(response.status_code == 200)
+
+        threads = [threading.Thread(target=tab) for _ in range(tabs)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        final = client.get(url, headers=headers).get_json()["data"]
+        apples = sum(entry["quantity"] for entry in final["inventory"] if entry["item_id"] == APPLE_ID)
+        bought = sum(successes)
+        paid = APPLE_PRICE * affordable - final["money"]
+        consistent = paid == APPLE_PRICE * apples and apples == bought and bought <= affordable
+        rows.append((mode, tabs, affordable, bought, apples, final["money"], "yes" if consistent else "NO"))
+    print_table(("flow", "tabs", "affordable", "accepted", "apples held", "money left", "consistent"), rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument("--tabs", type=int, default=8)
+    args = parser.parse_args()
+
+    app_module = load_app()
+    app, db = app_module.app, app_module.db
+    with app.app_context():
+        engine = db.engine
+    client = app.test_client()
+    run_sizes(app, engine, client, args.iterations)
+    print()
+    run_race(app, client, args.tabs)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,237 @@
+"""
+End-to-end traffic replay against a seeded population.
+
+Seeds a scratch database with --users synthetic players (see seed.py), then
+runs each scenario for --duration seconds with --clients concurrent clients
+through the app's test client:
+    login     POST /login as random players (password hashing and away-pet catch-up)
+    tick      a client's degradation tick: the full save re-sent with pet stats changed
+    cleanup   poops removed one DELETE /homeobject at a time
+    mixed     sessions of a login followed by ticks (70%), cleanups (20%) and GETs (10%)
+Each client works on its own slice of the players, so clients never conflict.
+Reports throughput, latency percentiles and the database size (file + WAL)
+after each scenario. The population and request mix are fixed by --seed, so
+runs are comparable: save one with --json and pass it to a later run as
+--baseline to print the change next to each number.
+
+    python -m benchmarks.traffic_replay [--users 10000] [--clients 16] [--duration 10]
+    python -m benchmarks.traffic_replay --scenarios tick cleanup --json before.json
+    python -m benchmarks.traffic_replay --scenarios tick cleanup --baseline before.json
+"""
+import argparse
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+
+from sqlalchemy import select
+
+from benchmarks.common import load_app, percentile, print_table
+
+SCENARIOS = ("login", "tick", "cleanup", "mixed")
+POOP_TYPE, POOP_IDS = "temporary", (1, 2, 3)  # see models/home_object.py
+TICKS_PER_USER = 20  # a tick client moves on to another of its players after this many
+MIXED_SESSION_LENGTH = 30
+MIXED_WEIGHTS = (("tick", 70), ("cleanup", 20), ("get", 10))
+
+
+class Client:
+    """One simulated player at a time, from this client's slice of the seeded users."""
+
+    def __init__(self, app, index, clients, user_ids, seed, record, password):
+        self.app = app
+        self.password = password
+        self.http = app.test_client()
+        self.rng = random.Random(seed * 7919 + index)
+        self.user_ids = [user_id for user_id in user_ids if user_id % clients == index]
+        self.record = record
+        self.user_id = None
+        self.headers = None
+        self.save = None
+
+    def request(self, op, method, url, **kwargs):
+        start = time.perf_counter()
+        response = self.http.open(url, method=method, headers=self.headers, **kwargs)
+        self.record(op, response.status_code, (time.perf_counter() - start) * 1000.0)
+        return response
+
+    def switch_user(self, login=False):
+        """Take over another player, by logging in or with a directly issued token."""
+        self.user_id = self.rng.choice(self.user_ids)
+        self.headers = None
+        if login:
+            self.login(self.user_id)
+        if self.headers is None:
+            token = self.app.extensions["auth"].issue(self.user_id)
+            self.headers = {"Authorization": f"Bearer {token}"}
+        self.reload()
+
+    def reload(self):
+        response = self.request("get", "GET", f"/userdata/{self.user_id}")
+        save = response.get_json()
+        self.save = {"id": save["id"], "username": save["username"], **save["data"]}
+
+    def login(self, user_id=None):
+        user_id = self.rng.choice(self.user_ids) if user_id is None else user_id
+        credentials = {"username": f"seed-{user_id}", "password": self.password}
+        response = self.request("login", "POST", "/login", json=credentials)
+        if response.status_code == 200:
+            self.headers = {"Authorization": f"Bearer {response.get_json()['token']}"}
+        elif response.status_code == 429:
+            time.sleep(0.05)  # Retry-After, shortened as in login_throughput
+
+    def tick(self):
+        now = int(time.time() * 1000)
+        for pet in self.save["pets"]:
+            pet["hunger"] = min(1.0, pet["hunger"] + 0.001)
+            pet["happiness"] = max(0.0, pet["happiness"] - 0.0005)
+            pet["lastUpdate"] = now
+        response = self.request("tick", "PUT", f"/userdata/{self.user_id}", json=self.save)
+        if response.status_code == 200:
+            self.save = response.get_json()
+        elif response.status_code == 409:
+            self.reload()  # the simulation or a cleanup wrote the save since it was read
+
+    def cleanup(self):
+        """Remove one poop; False when the yard is already clean."""
+        poops = [obj for obj in self.save["home_objects"]
+                 if obj["type"] == POOP_TYPE and obj["object_id"] in POOP_IDS]
+        if not poops:
+            return False
+        poop = self.rng.choice(poops)
+        response = self.request("cleanup", "DELETE", f"/homeobject/{poop['id']}")
+        if response.status_code == 200:
+            self.save["home_objects"].remove(poop)
+            self.save["version"] = response.get_json()["version"]
+        return True
+
+    def run(self, scenario, deadline):
+        if scenario == "login":
+            while time.perf_counter() < deadline:
+                self.login()
+            return
+        self.switch_user(login=scenario == "mixed")
+        step = 0
+        ops, weights = zip(*MIXED_WEIGHTS)
+        while time.perf_counter() < deadline:
+            step += 1
+            if scenario == "tick":
+                self.tick()
+                if step % TICKS_PER_USER == 0:
+                    self.switch_user()
+            elif scenario == "cleanup":
+                if not self.cleanup():
+                    self.switch_user()
+            else:
+                op = self.rng.choices(ops, weights)[0]
+                if op == "tick":
+                    self.tick()
+                elif op == "cleanup":
+                    self.cleanup()
+                else:
+                    self.request("get", "GET", f"/userdata/{self.user_id}")
+                if step % MIXED_SESSION_LENGTH == 0:
+                    self.switch_user(login=True)
+
+
+def db_size(db_path):
+    return sum(os.path.getsize(path) for path in (db_path, db_path + "-wal") if os.path.exists(path))
+
+
+def run_scenario(app, scenario, user_ids, clients, duration, seed, password):
+    samples = []
+    lock = threading.Lock()
+
+    def record(op, status, elapsed_ms):
+        with lock:
+            samples.append((op, status, elapsed_ms))
+
+    workers = [Client(app, i, clients, user_ids, seed, record, password) for i in range(clients)]
+    start = time.perf_counter()
+    deadline = start + duration
+    threads = [threading.Thread(target=worker.run, args=(scenario, deadline)) for worker in workers]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    results = {}
+    for op in sorted({op for op, _, _ in samples}):
+        ok = [ms for sample_op, status, ms in samples if sample_op == op and status < 400]
+        results[op] = {
+            "requests": sum(1 for sample in samples if sample[0] == op),
+            "errors": sum(1 for sample_op, status, _ in samples if sample_op == op and status >= 400),
+            "rps": len(ok) / elapsed,
+            "p50": percentile(ok, 50),
+            "p95": percentile(ok, 95),
+            "p99": percentile(ok, 99),
+        }
+    return results
+
+
+def change(value, baseline, key, lower_is_better=False):
+    """Formatted value, with its change against the baseline run if there is one."""
+    text = f"{value:.1f}"
+    if baseline and key in baseline and baseline[key]:
+        ratio = value / baseline[key]
+        better = ratio < 1 if lower_is_better else ratio > 1
+        text += f" ({'+' if ratio >= 1 else ''}{(ratio - 1) * 100:.0f}%{'' if better or ratio == 1 else '!'})"
+    return text
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--users", type=int, default=10000)
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument("--seed", type=int, default=0, help="Population and request-mix seed")
+    parser.add_argument("--json", help="Write the results to this file")
+    parser.add_argument("--baseline", help="Results file from an earlier run to compare against")
+    args = parser.parse_args()
+
+    db_path = os.path.join(tempfile.mkdtemp(prefix="webpets-replay-"), "replay.db")
+    os.environ.setdefault("WEBPETS_LOG_LEVEL", "WARNING")
+    app_module = load_app(db_path)
+    app, db = app_module.app, app_module.db
+    from seed import DEFAULT_PASSWORD, seed_users
+
+    start = time.perf_counter()
+    with app.app_context():
+        totals = seed_users(db.engine, args.users, app.extensions["passwords"].hash(DEFAULT_PASSWORD), seed=args.seed)
+        user_ids = db.session.scalars(select(app_module.User.id).order_by(app_module.User.id)).all()
+    print(f"Seeded {', '.join(f'{rows} {table}' for table, rows in totals.items())} "
+          f"in {time.perf_counter() - start:.1f}s; {db_size(db_path) / 2 ** 20:.1f} MB\n")
+
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+
+    results, rows = {}, []
+    for scenario in args.scenarios:
+        ops = run_scenario(app, scenario, user_ids, args.clients, args.duration, args.seed, DEFAULT_PASSWORD)
+        size_mb = db_size(db_path) / 2 ** 20
+        results[scenario] = {"ops": ops, "db_mb": size_mb}
+        for op, result in ops.items():
+            base = baseline.get(scenario, {}).get("ops", {}).get(op)
+            rows.append((scenario, op, result["requests"], result["errors"],
+                         change(result["rps"], base, "rps"),
+                         change(result["p50"], base, "p50", lower_is_better=True),
+                         change(result["p95"], base, "p95", lower_is_better=True),
+                         change(result["p99"], base, "p99", lower_is_better=True),
+                         change(size_mb, baseline.get(scenario), "db_mb", lower_is_better=True)))
+    print_table(("scenario", "op", "requests", "errors", "req/s", "p50 ms", "p95 ms", "p99 ms", "DB MB"), rows)
+    if baseline:
+        print("\n(change vs baseline; ! marks a regression)")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({**results, "settings": vars(args)}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+PUT /userdata/<id> benchmark: queries per request and latency as the save grows.
+
+Each scenario registers a fresh user, uploads a save with the given number of
+home objects (plus a proportional number of pets and inventory rows), then
+replays the client's degradation tick: the full save is re-sent with one pet's
+stats changed.
+
+    python -m benchmarks.userdata_put [--iterations 50]
+"""
+import argparse
+
+from benchmarks.common import auth_headers, count_queries, load_app, percentile, print_table, register_user, timed
+
+SAVE_SIZES = (10, 50, 100, 200, 400)
+
+
+def build_save(size):
+    pets = [
+        {"name": f"pet{i}", "evolution_id": [1, i % 3], "hunger": 0.5, "happiness": 0.5,
+         "abilities": ["Scratch", "Hop"], "createdAt": 0, "lastUpdate": 0}
+        for i in range(max(1, size // 20))
+    ]
+    home_objects = [
+        {"type": "temporary", "object_id": 1, "x": float(i % 16), "y": float(i // 16)}
+        for i in range(size)
+    ]
+    inventory = [{"item_id": 4 + i % 4, "quantity": 1 + i} for i in range(max(1, size // 4))]
+    return {"completed_tutorial": True, "money": 100, "pets": pets,
+            "home_objects": home_objects, "inventory": inventory}
+
+
+def run(iterations):
+    app_module = load_app()
+    app, db = app_module.app, app_module.db
+    client = app.test_client()
+    rows = []
+    for size in SAVE_SIZES:
+        user = register_user(client, f"put-bench-{size}")
+        url = f"/userdata/{user['id']}"
+        headers = auth_headers(user)
+        save = client.put(url, json={**build_save(size), "version": user["data"]["version"]},
+                          headers=headers).get_json()
+
+        query_counts, latencies = [], []
+        with app.app_context():
+            engine = db.engine
+        for tick in range(iterations):
+            save["pets"][0]["hunger"] = min(1.0, save["pets"][0]["hunger"] + 0.001)
+            save["pets"][0]["lastUpdate"] = tick
+            with count_queries(engine) as statements:
+                response, elapsed = timed(client.put, url, json=save, headers=headers)
+            assert response.status_code == 200
+            save = response.get_json()
+            query_counts.append(len(statements))
+            latencies.append(elapsed)
+
+        rows.append((
+            size,
+            len(save["pets"]) + len(save["home_objects"]) + len(save["inventory"]),
+            max(query_counts),
+            f"{percentile(latencies, 50):.2f}",
+            f"{percentile(latencies, 99):.2f}",
+        ))
+    print_table(("home_objects", "rows", "queries/req", "p50 ms", "p99 ms"), rows)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=50)
+    run(parser.parse_args().iterations)
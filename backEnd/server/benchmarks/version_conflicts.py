@@ -0,0 +1,125 @@
+"""
+Optimistic concurrency stress test: many writers hammering one save.
+
+--threads threads (tabs, devices) share one user and each adds 1 to its money
+--writes times by reading the save, incrementing locally and writing it back:
+    put     PUT of the whole save carrying the version it was read at
+    patch   PATCH {"base_version", "money"}
+    blind   PUT with "force": true, ignoring the version: last writer wins
+A 409 means another writer got there first; the thread reads the save again
+and retries. With versioning every accepted write must show up in the final
+money (no lost updates); the blind run shows what happens without it.
+
+Also reports how long the version UPDATE took: it's the first write of every
+save transaction, so it's the statement that waits while another request
+holds SQLite's write lock. Writes already known to be stale are refused
+before it ("409 before lock") and never wait.
+
+    python -m benchmarks.version_conflicts [--threads 16] [--writes 25] [--objects 20]
+"""
+import argparse
+import threading
+import time
+
+from sqlalchemy import event
+
+from benchmarks.common import auth_headers, load_app, percentile, print_table, register_user
+from benchmarks.userdata_put import build_save
+
+MODES = ("put", "patch", "blind")
+
+
+def read_save(client, url, headers):
+    got = client.get(url, headers=headers).get_json()
+    return {"id": got["id"], "username": got["username"], **got["data"]}
+
+
+def writer(client, url, headers, mode, writes, stats):
+    save = read_save(client, url, headers)
+    done = 0
+    while done < writes:
+        start = time.perf_counter()
+        if mode == "patch":
+            response = client.patch(url, json={"base_version": save["version"], "money": save["money"] + 1},
+                                    headers=headers)
+        else:
+            body = {**save, "money": save["money"] + 1}
+            if mode == "blind":
+                body["force"] = True
+            response = client.put(url, json=body, headers=headers)
+        stats["latencies"].append((time.perf_counter() - start) * 1000.0)
+        stats["statuses"].append(response.status_code)
+        if response.status_code == 200:
+            done += 1
+            # The reply is the new save (PUT) or only what changed (PATCH)
+            save = response.get_json() if mode != "patch" else {**save, **response.get_json()}
+        else:
+            save = read_save(client, url, headers)
+
+
+def watch_version_updates(engine, stats):
+    """Time every version UPDATE on engine."""
+    def before(conn, cursor, statement, parameters, context, executemany):
+        context._version_update_start = time.perf_counter()
+
+    def after(conn, cursor, statement, parameters, context, executemany):
+        if statement.startswith("UPDATE user_data SET version"):
+            stats["cas_ms"].append((time.perf_counter() - context._version_update_start) * 1000.0)
+
+    event.listen(engine, "before_cursor_execute", before)
+    event.listen(engine, "after_cursor_execute", after)
+    return lambda: (event.remove(engine, "before_cursor_execute", before),
+                    event.remove(engine, "after_cursor_execute", after))
+
+
+def run_mode(app, engine, mode, threads, writes, objects):
+    client = app.test_client()
+    user = register_user(client, f"conflicts-{mode}")
+    url = f"/userdata/{user['id']}"
+    headers = auth_headers(user)
+    client.put(url, json={**build_save(objects), "money": 0, "version": user["data"]["version"]}, headers=headers)
+    start_money = read_save(client, url, headers)["money"]
+
+    stats = {"latencies": [], "statuses": [], "cas_ms": []}
+    stop_watching = watch_version_updates(engine, stats)
+    pool = [threading.Thread(target=writer, args=(app.test_client(), url, headers, mode, writes, stats))
+            for _ in range(threads)]
+    start = time.perf_counter()
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    stop_watching()
+
+    accepted = stats["statuses"].count(200)
+    conflicts = stats["statuses"].count(409)
+    gained = read_save(client, url, headers)["money"] - start_money
+    # Every accepted write ran one version UPDATE; the others were CAS misses
+    refused_at_cas = len(stats["cas_ms"]) - accepted
+    return (mode, accepted, conflicts, conflicts - refused_at_cas, len(stats["statuses"]) - accepted - conflicts,
+            gained, accepted - gained, f"{accepted / elapsed:.0f}",
+            f"{percentile(stats['latencies'], 50):.1f}", f"{percentile(stats['latencies'], 99):.1f}",
+            f"{percentile(stats['cas_ms'], 50):.2f}", f"{percentile(stats['cas_ms'], 99):.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--writes", type=int, default=25, help="Accepted writes per thread.")
+    parser.add_argument("--objects", type=int, default=20, help="Home objects in the save.")
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=list(MODES))
+    args = parser.parse_args()
+
+    app_module = load_app()
+    app, db = app_module.app, app_module.db
+    with app.app_context():
+        engine = db.engine
+    rows = [run_mode(app, engine, mode, args.threads, args.writes, args.objects) for mode in args.modes]
+    print(f"{args.threads} writers on one save, {args.writes} accepted writes each")
+    print_table(("mode", "accepted", "409", "409 before lock", "errors", "money gained", "lost updates",
+                 "writes/s", "p50 ms", "p99 ms", "lock wait p50 ms", "p99 ms"), rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Write-behind benchmark: database commits per pet stat tick, with and without buffering.
+
+Each mode runs in a fresh process and database. Users send hot-stat PATCHes
+(the client's 30-second degradation tick) back to back; the table shows how
+many commits reached SQLite and the request latency.
+
+    python -m benchmarks.write_behind [--users 50] [--ticks 40]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+from sqlalchemy import event
+
+from benchmarks.common import auth_headers, load_app, percentile, print_table, register_user
+
+
+def run_child(users, ticks):
+    app_module = load_app()
+    app, db = app_module.app, app_module.db
+    client = app.test_client()
+    saves = []
+    for i in range(users):
+        user = register_user(client, f"ticker-{i}")
+        url = f"/userdata/{user['id']}"
+        headers = auth_headers(user)
+        save = client.put(url, json={"version": user["data"]["version"],
+                                     "pets": [{"name": "a", "lastUpdate": 0}, {"name": "b", "lastUpdate": 0}]},
+                          headers=headers).get_json()
+        saves.append((url, headers, save))
+
+    commits = []
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, "commit", lambda conn: commits.append(time.perf_counter()))
+
+    latencies = []
+    start = time.perf_counter()
+    for tick in range(ticks):
+        for index, (url, headers, save) in enumerate(saves):
+            patch = {
+                "base_version": save["version"],
+                "pets": [{"id": pet["id"], "hunger": tick / ticks, "happiness": 1 - tick / ticks, "lastUpdate": tick}
+                         for pet in save["pets"]],
+            }
+            request_start = time.perf_counter()
+            response = client.patch(url, json=patch, headers=headers)
+            latencies.append((time.perf_counter() - request_start) * 1000.0)
+            assert response.status_code == 200, response.get_json()
+            save["version"] = response.get_json()["version"]
+    elapsed = time.perf_counter() - start
+
+    buffer = app.extensions.get("write_behind")
+    if buffer is not None:
+        buffer.stop()
+    print(json.dumps({
+        "requests": len(latencies),
+        "commits": len(commits),
+        "rps": len(latencies) / elapsed,
+        "p50": percentile(latencies, 50),
+        "p99": percentile(latencies, 99),
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--ticks", type=int, default=40)
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        run_child(args.users, args.ticks)
+        return
+
+    rows = []
+    for label, enabled in (("direct", "0"), ("write-behind", "1")):
+        env = dict(os.environ, WEBPETS_WRITE_BEHIND=enabled, WEBPETS_WRITE_BEHIND_INTERVAL="1")
+        output = subprocess.run(
+            [sys.executable, "-m", "benchmarks.write_behind", "--child",
+             "--users", str(args.users), "--ticks", str(args.ticks)],
+            env=env, capture_output=True, text=True, check=True,
+        ).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        rows.append((label, result["requests"], result["commits"], f"{result['rps']:.0f}",
+                     f"{result['p50']:.2f}", f"{result['p99']:.2f}"))
+    print_table(("mode", "ticks", "commits", "req/s", "p50 ms", "p99 ms"), rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+import hashlib
+import json
+import os
+import threading
+from types import MappingProxyType
+from sqlalchemy import insert, select, update
+from database import db
+from models.item import Item
+
+ITEMS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "items.json")
+
+
+class ItemCatalog:
+    """
+    Immutable in-process copy of the item master catalog.
+
+    Built once from data/items.json, indexed by id and by category, with every
+    entry serialized up front. The serialized dicts are shared between all
+    responses that embed them and must be treated as read-only.
+    """
+
+    def __init__(self, definitions):
+        # Keys left out of a definition take the column default, as they would in the table
+        defaults = {
+            column.name: column.default.arg if column.default is not None and column.default.is_scalar else None
+            for column in Item.__table__.columns
+        }
+        rows = []
+        for definition in sorted(definitions, key=lambda d: d["id"]):
+            row = {key: definition.get(key, default) for key, default in defaults.items()}
+            # Placeholder sprite names ("still_needs_one") don't fit the integer column
+            if not isinstance(row.get("sprite_id"), int):
+                row["sprite_id"] = None
+            rows.append(row)
+        self.rows = tuple(MappingProxyType(row) for row in rows)
+        # Only entries that set a price are for sale: unpriced placeholders would otherwise cost the default 0
+        self.purchasable = frozenset(
+            definition["id"] for definition in definitions
+            if definition.get("price") is not None and definition.get("can_store", defaults["can_store"])
+        )
+        self.rows_by_id = MappingProxyType({row["id"]: row for row in self.rows})
+        self.by_id = MappingProxyType({row["id"]: Item(**row).to_dict() for row in rows})
+
+        by_category = {}
+        for entry in self.by_id.values():
+            by_category.setdefault(entry["category"], []).append(entry)
+        self.by_category = MappingProxyType({key: tuple(value) for key, value in by_category.items()})
+
+        # Pre-encoded /items bodies and their ETags
+        self._catalog_body = self._encode(list(self.by_id.values()))
+        self._category_bodies = {
+            category: self._encode(list(entries)) for category, entries in self.by_category.items()
+        }
+
+    @classmethod
+    def from_file(cls, path=ITEMS_PATH):
+        with open(path, encoding="utf-8") as f:
+            return cls(json.load(f))
+
+    @staticmethod
+    def _encode(entries):
+        body = json.dumps(entries, separators=(",", ":")).encode("utf-8")
+        return body, hashlib.sha256(body).hexdigest()[:32]
+
+    def serialize(self, item_id):
+        """Pre-serialized catalog entry for item_id, or None if the id is unknown."""
+        return self.by_id.get(item_id)
+
+    def response_body(self, category=None):
+        """(JSON bytes, ETag) for the whole catalog or one category; None for unknown categories."""
+        if category is None:
+            return self._catalog_body
+        return self._category_bodies.get(category)
+
+    def sync_to_db(self):
+        """Insert or update the item table so it matches the catalog, in two batched statements."""
+        existing = {
+            row["id"]: dict(row)
+            for row in db.session.execute(select(Item.__table__)).mappings()
+        }
+        inserts, updates = [], []
+        for row in self.rows:
+            current = existing.get(row["id"])
+            if current is None:
+                inserts.append(dict(row))
+            elif any(current[key] != value for key, value in row.items()):
+                updates.append(dict(row))
+        if updates:
+            db.session.execute(update(Item), updates)
+        if inserts:
+            db.session.execute(insert(Item), inserts)
+        db.session.commit()
+
+
+_catalog = None
+_catalog_lock = threading.Lock()
+
+
+def get_catalog():
+    """Return the process-wide catalog, building it on first use."""
+    global _catalog
+    if _catalog is None:
+        with _catalog_lock:
+            if _catalog is None:
+                _catalog = ItemCatalog.from_file()
+    return _catalog
+
+
+def init_catalog(app):
+    """Build the catalog at startup and sync it into the item table."""
+    with app.app_context():
+        get_catalog().sync_to_db()
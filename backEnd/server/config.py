@@ -0,0 +1,81 @@
+"""
+Server settings, read from WEBPETS_* environment variables at import.
+Loaded into app.config with app.config.from_object('config').
+"""
+import os
+
+
+def _env(name, default, cast=str):
+    value = os.environ.get(f"WEBPETS_{name}")
+    if value is None or value == "":
+        return default
+    if cast is bool:
+        return value.strip().lower() in ("1", "true", "yes", "on")
+    return cast(value)
+
+
+# Database
+SQLALCHEMY_DATABASE_URI = _env("DATABASE_URL", "sqlite:///data.db")
+SQLALCHEMY_TRACK_MODIFICATIONS = False
+DB_POOL_SIZE = _env("DB_POOL_SIZE", 8, int)
+DB_MAX_OVERFLOW = _env("DB_MAX_OVERFLOW", 16, int)
+DB_POOL_TIMEOUT = _env("DB_POOL_TIMEOUT", 30, float)  # seconds to wait for a pooled connection
+# Save shards (see sharding.py): comma-separated database URLs, e.g.
+# "sqlite:///shard0.db,sqlite:///shard1.db". The main database then only holds
+# the users, their shard numbers and the item catalog. Empty = one database
+DB_SHARDS = _env("DB_SHARDS", "")
+
+# SQLite tuning (ignored for other databases)
+SQLITE_TUNING = _env("SQLITE_TUNING", True, bool)  # WAL journal and connection pragmas
+SQLITE_BUSY_TIMEOUT_MS = _env("SQLITE_BUSY_TIMEOUT_MS", 5000, int)
+SQLITE_SYNCHRONOUS = _env("SQLITE_SYNCHRONOUS", "NORMAL")  # NORMAL is durable across app crashes in WAL mode
+SQLITE_CACHE_SIZE_KB = _env("SQLITE_CACHE_SIZE_KB", 65536, int)
+SQLITE_MMAP_SIZE = _env("SQLITE_MMAP_SIZE", 256 * 1024 * 1024, int)
+
+# Simulation: seconds between bulk catch-ups of away pets (0 = only on login/GET)
+SIMULATION_INTERVAL = _env("SIMULATION_INTERVAL", 0, float)
+
+# Cold-save archival (see archive.py): saves of users not seen for this long are
+# compressed into their user_data row by `flask archive`. Never less than AUTH_TOKEN_TTL
+ARCHIVE_AFTER_DAYS = _env("ARCHIVE_AFTER_DAYS", 30, float)
+
+# Write-behind buffering of pet stat ticks (see write_behind.py)
+WRITE_BEHIND = _env("WRITE_BEHIND", False, bool)
+WRITE_BEHIND_INTERVAL = _env("WRITE_BEHIND_INTERVAL", 5.0, float)  # seconds; also the durability bound
+WRITE_BEHIND_MAX_DIRTY = _env("WRITE_BEHIND_MAX_DIRTY", 1000, int)  # staged pet rows that force an early flush
+
+# Server-sent event streams of save changes (see push.py)
+PUSH_ENABLED = _env("PUSH_ENABLED", True, bool)
+PUSH_HEARTBEAT = _env("PUSH_HEARTBEAT", 15.0, float)  # seconds between keep-alive comments on idle streams
+PUSH_COALESCE_MS = _env("PUSH_COALESCE_MS", 250, int)  # how long a stream gathers a burst before sending it
+PUSH_MAX_STREAMS = _env("PUSH_MAX_STREAMS", 10000, int)  # per process; more are refused with 503
+PUSH_MAX_STREAMS_PER_USER = _env("PUSH_MAX_STREAMS_PER_USER", 4, int)
+PUSH_SIMULATION_INTERVAL = _env("PUSH_SIMULATION_INTERVAL", 60.0, float)  # seconds between catch-ups of streamed users' pets (0 = off)
+
+# Logging (see request_logging.py)
+LOG_LEVEL = _env("LOG_LEVEL", "INFO")
+LOG_PAYLOADS = _env("LOG_PAYLOADS", False, bool)  # dump full save payloads at DEBUG; needs LOG_LEVEL=DEBUG
+LOG_SAMPLE_RATE = _env("LOG_SAMPLE_RATE", 1.0, float)  # fraction of requests whose INFO/DEBUG records are kept
+LOG_SAMPLE_RATES = _env("LOG_SAMPLE_RATES", "patch_userdata=0.05")  # per-endpoint overrides: "endpoint=rate,..."
+
+# Metrics (see metrics.py)
+METRICS_ENABLED = _env("METRICS_ENABLED", True, bool)  # per-request hooks, SQL event hooks and /metrics
+METRICS_SERVER_TIMING = _env("METRICS_SERVER_TIMING", False, bool)  # send phase timings in a Server-Timing header
+
+# Serialized save cache for GET /userdata (see save_cache.py; 0 disables)
+SAVE_CACHE_MAX_BYTES = _env("SAVE_CACHE_MAX_BYTES", 64 * 1024 * 1024, int)
+
+# Response JSON encoder: "auto" (orjson if installed), "orjson" or "stdlib" (see json_codec.py)
+JSON_ENCODER = _env("JSON_ENCODER", "auto")
+
+# Session tokens (see auth.py). Set AUTH_SECRET in production: without it each
+# process signs with a random key, so tokens die on restart
+AUTH_SECRET = _env("AUTH_SECRET", "")
+AUTH_TOKEN_TTL = _env("AUTH_TOKEN_TTL", 7 * 24 * 60 * 60, int)  # seconds
+
+# Password hashing (see passwords.py). scrypt memory per hash is 128 * N * R bytes
+PASSWORD_SCRYPT_N = _env("PASSWORD_SCRYPT_N", 2 ** 14, int)
+PASSWORD_SCRYPT_R = _env("PASSWORD_SCRYPT_R", 8, int)
+PASSWORD_SCRYPT_P = _env("PASSWORD_SCRYPT_P", 1, int)
+PASSWORD_HASH_WORKERS = _env("PASSWORD_HASH_WORKERS", os.cpu_count() or 1, int)  # hashes computed at once
+PASSWORD_HASH_QUEUE = _env("PASSWORD_HASH_QUEUE", 16, int)  # hashes allowed to wait before logins get 429
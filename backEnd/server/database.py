@@ -1,9 +1,121 @@
+from flask import current_app
 from flask_sqlalchemy import SQLAlchemy
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event, inspect, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.schema import CreateColumn
 
-db = SQLAlchemy()
+class ShardedSession(Session):
+    """
+    db.session: when saves are sharded (see sharding.py), statements on save
+    tables go to the engine of the shard the session is routed to.
+    """
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None:
+            router = current_app.extensions.get('shards')
+            if router is not None:
+                engine = router.bind_for(self, mapper, clause)
+                if engine is not None:
+                    return engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+db = SQLAlchemy(session_options={'class_': ShardedSession})
+
+def shard_urls(config):
+    """Database URLs of the save shards from DB_SHARDS, in shard number order."""
+    return [url.strip() for url in config['DB_SHARDS'].split(',') if url.strip()]
+
+def shard_bind_key(shard):
+    return f'shard{shard}'
+
+def engine_options(url, config):
+    """Pool and driver options for the database at url."""
+    url = make_url(url)
+    is_sqlite = url.get_backend_name() == 'sqlite'
+    options = {}
+    if not is_sqlite or url.database not in (None, '', ':memory:'):
+        # In-memory SQLite gets a single static connection from Flask-SQLAlchemy instead
+        options.update(
+            pool_size=config['DB_POOL_SIZE'],
+            max_overflow=config['DB_MAX_OVERFLOW'],
+            pool_timeout=config['DB_POOL_TIMEOUT'],
+        )
+        if is_sqlite:
+            # Pooled connections move between request threads; sqlite3 waits this long on a lock
+            options['connect_args'] = {
+                'check_same_thread': False,
+                'timeout': config['SQLITE_BUSY_TIMEOUT_MS'] / 1000.0,
+            }
+    return options
 
 def init_db(app):
     """Initialize database with Flask app"""
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+        **engine_options(app.config['SQLALCHEMY_DATABASE_URI'], app.config),
+        **app.config.get('SQLALCHEMY_ENGINE_OPTIONS', {}),
+    }
+    # One extra engine per save shard; their tables are created by sharding.init_shards
+    app.config.setdefault('SQLALCHEMY_BINDS', {}).update({
+        shard_bind_key(shard): {'url': url, **engine_options(url, app.config)}
+        for shard, url in enumerate(shard_urls(app.config))
+    })
+
     db.init_app(app)
     with app.app_context():
+        if app.config['SQLITE_TUNING']:
+            for engine in db.engines.values():
+                if engine.url.get_backend_name() == 'sqlite':
+                    tune_sqlite(engine, app.config)
         db.create_all()
+        add_missing_columns()
+        add_missing_indexes()
+
+def tune_sqlite(engine, config):
+    """
+    Put every pooled SQLite connection in WAL mode with the configured pragmas.
+
+    WAL lets readers run alongside the single writer instead of blocking its
+    commit, and busy_timeout makes a second writer wait for the lock rather than
+    failing with "database is locked". sqlite3 only opens a transaction at the
+    first INSERT/UPDATE/DELETE, so a request holds the write lock from its first
+    write to its commit, not for the whole request.
+    """
+    pragmas = (
+        "PRAGMA journal_mode=WAL",
+        f"PRAGMA synchronous={config['SQLITE_SYNCHRONOUS']}",
+        f"PRAGMA busy_timeout={int(config['SQLITE_BUSY_TIMEOUT_MS'])}",
+        f"PRAGMA cache_size=-{int(config['SQLITE_CACHE_SIZE_KB'])}",
+        f"PRAGMA mmap_size={int(config['SQLITE_MMAP_SIZE'])}",
+        "PRAGMA temp_store=MEMORY",
+    )
+
+    @event.listens_for(engine, "connect")
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for pragma in pragmas:
+            cursor.execute(pragma)
+        cursor.close()
+
+def add_missing_columns(engine=None, tables=None):
+    """
+    create_all() only creates missing tables, so columns added to existing models
+    are appended to older databases here with ALTER TABLE. Defaults to every
+    table of the main database.
+    """
+    engine = engine or db.engine
+    inspector = inspect(engine)
+    with engine.begin() as conn:
+        for table in tables or db.metadata.sorted_tables:
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in existing:
+                    ddl = CreateColumn(column).compile(dialect=engine.dialect)
+                    conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {ddl}"))
+
+def add_missing_indexes(engine=None, tables=None):
+    """Create indexes declared on the models that older databases don't have yet."""
+    engine = engine or db.engine
+    with engine.begin() as conn:
+        for table in tables or db.metadata.sorted_tables:
+            for index in table.indexes:
+                index.create(conn, checkfirst=True)
@@ -0,0 +1,93 @@
+"""
+Selecting a user's home objects by id, kind and area.
+
+Area selections run on the (user_data_id, x) index declared on HomeObject:
+one index range scan over the user's objects in the selection's x band, with
+y and the exact shape checked on just those rows. Yards are small enough
+that this matches an R*Tree driven the same way, without the triggers an
+R*Tree needs on every insert, move and delete of a home object.
+"""
+from models import HomeObject
+
+
+def _numbers(value, count, name):
+    """A list of `count` numbers from a JSON list or a "a,b,c" query string value."""
+    if isinstance(value, str):
+        value = value.split(",")
+    try:
+        numbers = [float(number) for number in value]
+    except (TypeError, ValueError):
+        raise ValueError(f"{name} must be {count} numbers")
+    if len(numbers) != count:
+        raise ValueError(f"{name} must be {count} numbers")
+    return numbers
+
+
+def _ints(value, name):
+    """A list of ints from an int, a list of ints or a "1,2,3" query string value."""
+    if isinstance(value, str):
+        value = value.split(",")
+    elif not isinstance(value, list):
+        value = [value]
+    try:
+        return [int(number) for number in value]
+    except (TypeError, ValueError):
+        raise ValueError(f"{name} must be integers")
+
+
+def parse_selection(data):
+    """
+    Validate a selection of home objects, from a JSON body or query arguments:
+        ids        [int, ...]
+        type       str
+        object_id  int or [int, ...]
+        rect       [x_min, y_min, x_max, y_max]
+        circle     [x, y, radius]
+    All given criteria must match. Raises ValueError for malformed or empty selections.
+    """
+    if not isinstance(data, dict):
+        raise ValueError("Selection must be an object")
+    selection = {}
+    if data.get("ids") is not None:
+        selection["ids"] = _ints(data["ids"], "ids")
+    if data.get("type") is not None:
+        if not isinstance(data["type"], str):
+            raise ValueError("type must be a string")
+        selection["type"] = data["type"]
+    if data.get("object_id") is not None:
+        selection["object_ids"] = _ints(data["object_id"], "object_id")
+    if data.get("rect") is not None:
+        x_min, y_min, x_max, y_max = _numbers(data["rect"], 4, "rect")
+        selection["rect"] = (min(x_min, x_max), min(y_min, y_max), max(x_min, x_max), max(y_min, y_max))
+    if data.get("circle") is not None:
+        x, y, radius = _numbers(data["circle"], 3, "circle")
+        if radius < 0:
+            raise ValueError("circle radius must not be negative")
+        selection["circle"] = (x, y, radius)
+    if not selection:
+        raise ValueError("Select home objects by ids, type, object_id, rect and/or circle")
+    return selection
+
+
+def selection_where(user_data_id, selection):
+    """WHERE clauses matching the user's home objects in a parsed selection."""
+    table = HomeObject.__table__
+    clauses = [table.c.user_data_id == user_data_id]
+    if "ids" in selection:
+        clauses.append(table.c.id.in_(selection["ids"]))
+    if "type" in selection:
+        clauses.append(table.c.type == selection["type"])
+    if "object_ids" in selection:
+        clauses.append(table.c.object_id.in_(selection["object_ids"]))
+    if "rect" in selection:
+        x_min, y_min, x_max, y_max = selection["rect"]
+        clauses += [table.c.x.between(x_min, x_max), table.c.y.between(y_min, y_max)]
+    if "circle" in selection:
+        x, y, radius = selection["circle"]
+        # The bounding box lets the index narrow the rows before the distance check
+        clauses += [
+            table.c.x.between(x - radius, x + radius),
+            table.c.y.between(y - radius, y + radius),
+            (table.c.x - x) * (table.c.x - x) + (table.c.y - y) * (table.c.y - y) <= radius * radius,
+        ]
+    return clauses
@@ -0,0 +1,61 @@
+"""
+Pluggable JSON encoding for responses.
+
+JSON_ENCODER picks the encoder: "orjson" (optional, pip install orjson),
+"stdlib", or "auto" (orjson when it's installed, stdlib otherwise). Both
+produce compact UTF-8 bytes; orjson doesn't sort keys, the stdlib encoder
+does, as jsonify always has. Request parsing is left to Flask.
+"""
+import json
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # optional speedup
+    orjson = None
+
+
+# Dates, UUIDs, dataclasses etc. are encoded the way jsonify always has
+_default = DefaultJSONProvider.default
+
+
+def _stdlib_dumps(obj):
+    return json.dumps(obj, default=_default, separators=(",", ":"), sort_keys=True,
+                      ensure_ascii=False).encode("utf-8")
+
+
+def _orjson_dumps(obj):
+    return orjson.dumps(obj, default=_default, option=orjson.OPT_NON_STR_KEYS)
+
+
+def get_encoder(name="auto"):
+    """Return a function encoding an object to compact JSON bytes."""
+    if name == "auto":
+        name = "orjson" if orjson is not None else "stdlib"
+    if name == "orjson":
+        if orjson is None:
+            raise RuntimeError("JSON_ENCODER is 'orjson' but orjson is not installed")
+        return _orjson_dumps
+    if name == "stdlib":
+        return _stdlib_dumps
+    raise ValueError(f"Unknown JSON_ENCODER {name!r}")
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """jsonify() through the configured encoder; pretty-printing (debug) still uses stdlib."""
+
+    encode = staticmethod(_stdlib_dumps)
+
+    def response(self, *args, **kwargs):
+        if (self.compact is None and self._app.debug) or self.compact is False:
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(self.encode(obj), mimetype=self.mimetype)
+
+
+def init_json(app):
+    """Install the configured encoder for jsonify(); returns the encoder function."""
+    encoder = get_encoder(app.config['JSON_ENCODER'])
+    app.json = FastJSONProvider(app)
+    app.json.encode = encoder
+    return encoder
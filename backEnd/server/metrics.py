@@ -0,0 +1,237 @@
+"""
+Request and query instrumentation, exposed in Prometheus text format at /metrics.
+
+Every request records its latency, SQL statement count and time, and request
+and response body sizes, labelled by Flask endpoint. Handlers mark their own
+phases (parse, reconcile, commit, serialize) with `phase(name)`. With
+METRICS_SERVER_TIMING on, the phases and the request's total SQL time are also
+sent back in a Server-Timing header, for the browser's network panel.
+
+Metrics live in process memory: behind several uvicorn workers each process
+reports its own numbers, so scrape them per worker or sum them downstream.
+"""
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from flask import g, has_request_context, request
+from sqlalchemy import event
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+
+def _labels_text(names, values):
+    if not names:
+        return ""
+    pairs = ",".join(
+        '%s="%s"' % (name, str(value).replace("\\", "\\\\").replace('"', '\\"'))
+        for name, value in zip(names, values)
+    )
+    return "{" + pairs + "}"
+
+
+class Counter:
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for label_values, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_labels_text(self.labels, label_values)} {value}")
+        return lines
+
+
+class Gauge:
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def set(self, value, *label_values):
+        with self._lock:
+            self._values[label_values] = value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge"]
+        with self._lock:
+            for label_values, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_labels_text(self.labels, label_values)} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help_text, buckets, labels=()):
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(buckets)
+        self.labels = tuple(labels)
+        self._series = {}  # label values -> [bucket counts..., +Inf count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [0] * (len(self.buckets) + 2)
+            series[index] += 1
+            series[-1] += value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for label_values, series in sorted(self._series.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets + ("+Inf",), series):
+                    cumulative += count
+                    labels = _labels_text(self.labels + ("le",), label_values + (bound,))
+                    lines.append(f"{self.name}_bucket{labels} {cumulative}")
+                labels = _labels_text(self.labels, label_values)
+                lines.append(f"{self.name}_sum{labels} {series[-1]}")
+                lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+REQUESTS = Counter("webpets_requests_total", "Requests handled.", ("endpoint", "method", "status"))
+REQUEST_SECONDS = Histogram("webpets_request_duration_seconds", "Request latency.", LATENCY_BUCKETS,
+                            ("endpoint", "method"))
+PHASE_SECONDS = Histogram("webpets_request_phase_seconds", "Time spent in a marked phase of a request.",
+                          LATENCY_BUCKETS, ("endpoint", "phase"))
+REQUEST_QUERIES = Histogram("webpets_request_queries", "SQL statements executed per request.", COUNT_BUCKETS,
+                            ("endpoint",))
+QUERY_SECONDS = Histogram("webpets_query_duration_seconds", "SQL statement latency.", LATENCY_BUCKETS,
+                          ("endpoint", "statement"))
+REQUEST_BYTES = Histogram("webpets_request_body_bytes", "Request body size.", SIZE_BUCKETS, ("endpoint",))
+RESPONSE_BYTES = Histogram("webpets_response_body_bytes", "Response body size.", SIZE_BUCKETS, ("endpoint",))
+RECONCILED_ROWS = Counter("webpets_reconciled_rows_total", "Save rows written by PUT/PATCH.",
+                          ("table", "operation"))
+SAVE_CACHE_LOOKUPS = Counter("webpets_save_cache_lookups_total", "Serialized save cache lookups.", ("result",))
+SAVE_CACHE_EVICTIONS = Counter("webpets_save_cache_evictions_total", "Saves evicted to stay under the memory cap.")
+SAVE_CACHE_BYTES = Gauge("webpets_save_cache_bytes", "Bytes of serialized saves held in the cache.")
+PUSH_STREAMS = Gauge("webpets_push_streams", "Open server-sent event streams.")
+PUSH_EVENTS = Counter("webpets_push_events_total", "Save change events published to open streams.", ("type",))
+PUSH_MESSAGES = Counter("webpets_push_messages_total", "Coalesced event messages sent on streams.", ("type",))
+SAVES_ARCHIVED = Counter("webpets_saves_archived_total", "Saves compressed into the cold archive.")
+SAVES_REHYDRATED = Counter("webpets_saves_rehydrated_total", "Archived saves restored to the hot tables.")
+
+REGISTRY = [REQUESTS, REQUEST_SECONDS, PHASE_SECONDS, REQUEST_QUERIES, QUERY_SECONDS,
+            REQUEST_BYTES, RESPONSE_BYTES, RECONCILED_ROWS,
+            SAVE_CACHE_LOOKUPS, SAVE_CACHE_EVICTIONS, SAVE_CACHE_BYTES,
+            PUSH_STREAMS, PUSH_EVENTS, PUSH_MESSAGES, SAVES_ARCHIVED, SAVES_REHYDRATED]
+
+
+def render():
+    """The whole registry in Prometheus text exposition format."""
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+@contextmanager
+def phase(name):
+    """Time a named phase of the current request (no-op outside a request)."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        if has_request_context() and "metrics_phases" in g:
+            g.metrics_phases[name] = g.metrics_phases.get(name, 0.0) + time.perf_counter() - start
+
+
+def record_reconciled(changes, deleted=None):
+    """Count rows written by reconcile_userdata ({key: (inserted, updated)}) and deleted ids."""
+    for key, (inserted, updated) in changes.items():
+        if inserted:
+            RECONCILED_ROWS.inc(key, "inserted", amount=len(inserted))
+        if updated:
+            RECONCILED_ROWS.inc(key, "updated", amount=len(updated))
+    for key, ids in (deleted or {}).items():
+        if ids:
+            RECONCILED_ROWS.inc(key, "deleted", amount=len(ids))
+
+
+def _instrument_engine(engine):
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("metrics_query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["metrics_query_start"].pop()
+        verb = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else "OTHER"
+        if has_request_context() and "metrics_queries" in g:
+            g.metrics_queries += 1
+            g.metrics_query_seconds += elapsed
+            endpoint = request.endpoint
+        else:
+            endpoint = "background"
+        QUERY_SECONDS.observe(elapsed, endpoint or "unknown", verb)
+
+
+def init_metrics(app, *engines):
+    """Install the request hooks, the SQL event hooks on each engine and the /metrics route."""
+    if not app.config['METRICS_ENABLED']:
+        return
+    for engine in engines:
+        _instrument_engine(engine)
+    server_timing = app.config['METRICS_SERVER_TIMING']
+
+    @app.before_request
+    def start_request_metrics():
+        g.metrics_start = time.perf_counter()
+        g.metrics_queries = 0
+        g.metrics_query_seconds = 0.0
+        g.metrics_phases = {}
+
+    def record(status, response=None):
+        g.metrics_recorded = True
+        elapsed = time.perf_counter() - g.metrics_start
+        endpoint = request.endpoint or "unknown"
+        REQUESTS.inc(endpoint, request.method, status)
+        REQUEST_SECONDS.observe(elapsed, endpoint, request.method)
+        REQUEST_QUERIES.observe(g.metrics_queries, endpoint)
+        if request.content_length:
+            REQUEST_BYTES.observe(request.content_length, endpoint)
+        if response is not None and response.content_length is not None:
+            RESPONSE_BYTES.observe(response.content_length, endpoint)
+        for name, seconds in g.metrics_phases.items():
+            PHASE_SECONDS.observe(seconds, endpoint, name)
+        return elapsed
+
+    @app.after_request
+    def record_request_metrics(response):
+        if "metrics_start" not in g:
+            return response
+        elapsed = record(response.status_code, response)
+
+        if server_timing:
+            entries = [f"{name};dur={seconds * 1000.0:.2f}" for name, seconds in g.metrics_phases.items()]
+            entries.append(f'db;dur={g.metrics_query_seconds * 1000.0:.2f};desc="{g.metrics_queries} queries"')
+            entries.append(f"total;dur={elapsed * 1000.0:.2f}")
+            response.headers["Server-Timing"] = ", ".join(entries)
+        return response
+
+    @app.teardown_request
+    def record_failed_request_metrics(error):
+        # An exception that escapes the request (propagated, or raised by another
+        # after_request hook) skips record_request_metrics; count it as the 500 it becomes
+        if error is not None and "metrics_start" in g and not g.get("metrics_recorded"):
+            record(500)
+
+    @app.route('/metrics', methods=['GET'])
+    def metrics():
+        return app.response_class(render(), mimetype='text/plain; version=0.0.4')
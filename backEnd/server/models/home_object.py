@@ -1,4 +1,5 @@
 from database import db
+from validation import is_int, is_number, is_string, optional
 
 '''
 TENTATIVE HOME OBJECT MAP:
@@ -27,6 +28,11 @@ Decor:
 
 class HomeObject(db.Model):
     __tablename__ = 'home_object'
+    __table_args__ = (
+        db.Index('ix_home_object_user_data_id_type', 'user_data_id', 'type', 'object_id'),
+        db.Index('ix_home_object_user_data_id_x', 'user_data_id', 'x'),  # area selections
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     user_data_id = db.Column(db.Integer, db.ForeignKey('user_data.id'), nullable=True)
     type = db.Column(db.String(50))  # Type of home object (e.g., 'decor', 'temporary', etc.)
@@ -44,29 +50,34 @@ class HomeObject(db.Model):
             "y": self.y
         }
     
+    # Column values for a home object created from a payload that omits them.
+    JSON_DEFAULTS = {
+        "type": None,
+        "object_id": None,
+        "x": 0.0,
+        "y": 0.0
+    }
+
+    # Accepted type of every payload key (see validation.py); other keys are ignored.
+    JSON_TYPES = {
+        "id": optional(is_int),
+        "type": is_string,
+        "object_id": is_int,
+        "x": is_number,
+        "y": is_number
+    }
+
+    # Payload keys a new home object has to carry.
+    JSON_REQUIRED = ("type", "object_id")
+
     @classmethod
-    def process_json(cls, home_object_data, user_data_id):
+    def columns_from_json(cls, home_object_data, current):
         """
-        Given a dictionary of home object data and a parent user_data_id,
-        either update an existing home object (if "id" exists) or create a new one.
+        Given a dictionary of home object data and the object's current column
+        values (or JSON_DEFAULTS for a new object), return the resulting column values.
         """
-        if "id" in home_object_data:
-            home_obj = cls.query.get(home_object_data["id"])
-            if home_obj and home_obj.user_data_id == user_data_id:
-                # Update existing home object
-                home_obj.type = home_object_data.get("type", home_obj.type)
-                home_obj.object_id = home_object_data.get("object_id", home_obj.object_id)
-                home_obj.x = home_object_data.get("x", home_obj.x)
-                home_obj.y = home_object_data.get("y", home_obj.y)
-                return home_obj
-        
-        # Create new home object
-        new_home_obj = cls(
-            user_data_id=user_data_id,
-            type=home_object_data.get("type"),
-            object_id=home_object_data.get("object_id"),
-            x=home_object_data.get("x", 0.0),
-            y=home_object_data.get("y", 0.0)
-        )
-        db.session.add(new_home_obj)
-        return new_home_obj
+        columns = dict(current)
+        for key in ("type", "object_id", "x", "y"):
+            if key in home_object_data:
+                columns[key] = home_object_data[key]
+        return columns
@@ -1,13 +1,20 @@
+import catalog
 from database import db
+from validation import is_int, optional
 
 class InventoryItem(db.Model):
     """Junction table: represents a single item-quantity pair in a user's inventory"""
     __tablename__ = 'inventory_item'
+    __table_args__ = (
+        db.Index('ix_inventory_item_user_data_id_item_id', 'user_data_id', 'item_id'),
+        db.Index('ix_inventory_item_item_id', 'item_id'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     user_data_id = db.Column(db.Integer, db.ForeignKey('user_data.id'), nullable=False)
     item_id = db.Column(db.Integer, db.ForeignKey('item.id'), nullable=False)
     quantity = db.Column(db.Integer, default=1)
-    # Relationship to get item details
+    # Relationship to get item details (serialization uses the in-process catalog instead)
     item = db.relationship('Item', backref='inventory_entries')
 
     def to_dict(self):
@@ -16,31 +23,33 @@ class InventoryItem(db.Model):
             "user_data_id": self.user_data_id,
             "item_id": self.item_id,
             "quantity": self.quantity,
-            "item": self.item.to_dict() if self.item else None
+            "item": catalog.get_catalog().serialize(self.item_id)
         }
     
+    # Column values for an inventory entry created from a payload that omits them.
+    JSON_DEFAULTS = {
+        "item_id": None,
+        "quantity": 1
+    }
+
+    # Accepted type of every payload key (see validation.py); other keys are ignored.
+    JSON_TYPES = {
+        "id": optional(is_int),
+        "item_id": is_int,
+        "quantity": is_int
+    }
+
+    # Payload keys a new inventory entry has to carry.
+    JSON_REQUIRED = ("item_id",)
+
     @classmethod
-    def process_json(cls, inventory_data, user_data_id):
+    def columns_from_json(cls, inventory_data, current):
         """
-        Given a dictionary of inventory data and a parent user_data_id,
-        either update an existing inventory item (if "id" exists) or create a new one.
+        Given a dictionary of inventory data and the entry's current column
+        values (or JSON_DEFAULTS for a new entry), return the resulting column values.
         """
-        if "id" in inventory_data:
-            inv_item = cls.query.get(inventory_data["id"])
-            if inv_item and inv_item.user_data_id == user_data_id:
-                # Update existing inventory item
-                inv_item.quantity = inventory_data.get("quantity", inv_item.quantity)
-                inv_item.item_id = inventory_data.get("item_id", inv_item.item_id)
-                return inv_item
-        
-        # Create new inventory item
-        item_id = inventory_data.get("item_id")
-        quantity = inventory_data.get("quantity", 1)
-        
-        new_inv_item = cls(
-            user_data_id=user_data_id,
-            item_id=item_id,
-            quantity=quantity
-        )
-        db.session.add(new_inv_item)
-        return new_inv_item
+        columns = dict(current)
+        for key in ("item_id", "quantity"):
+            if key in inventory_data:
+                columns[key] = inventory_data[key]
+        return columns
@@ -1,6 +1,12 @@
 from database import db
+from validation import either, is_int, is_number, is_string, list_of, optional
 
 class Pet(db.Model):
+    __table_args__ = (
+        db.Index('ix_pet_user_data_id', 'user_data_id'),
+        db.Index('ix_pet_last_update', 'last_update'),  # bulk simulation finds away pets by it
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     user_data_id = db.Column(db.Integer, db.ForeignKey('user_data.id'), nullable=True)
     evolution_line = db.Column(db.Integer, default=0)
@@ -29,63 +35,64 @@ class Pet(db.Model):
             "lastUpdate": self.last_update
         }
 
+    # Column values for a pet created from a payload that omits them.
+    JSON_DEFAULTS = {
+        "evolution_line": 0,
+        "evolution_stage": 0,
+        "name": None,
+        "level": 1,
+        "xp": 0,
+        "hunger": 0.5,
+        "happiness": 0.5,
+        "abilities": "",
+        "created_at": None,
+        "last_update": None
+    }
+
+    # Accepted type of every payload key (see validation.py); other keys are ignored.
+    JSON_TYPES = {
+        "id": optional(is_int),
+        "evolution_id": optional(list_of(is_int, length=2)),
+        "name": optional(is_string),
+        "level": is_int,
+        "xp": is_int,
+        "hunger": is_number,
+        "happiness": is_number,
+        "abilities": optional(either(list_of(is_string), is_string)),
+        "createdAt": optional(is_int),
+        "lastUpdate": optional(is_int)
+    }
+
+    # Payload keys a new pet has to carry.
+    JSON_REQUIRED = ("name",)
+
+    # Payload keys that map straight onto a column of the same meaning.
+    JSON_FIELDS = (
+        ("name", "name"),
+        ("level", "level"),
+        ("xp", "xp"),
+        ("hunger", "hunger"),
+        ("happiness", "happiness"),
+        ("createdAt", "created_at"),
+        ("lastUpdate", "last_update")
+    )
+
     @classmethod
-    def process_json(cls, pet_data, user_data_id):
+    def columns_from_json(cls, pet_data, current):
         """
-        Given a dictionary of pet data and a parent user_data_id,
-        either update an existing pet (if "id" exists) or create a new one.
+        Given a dictionary of pet data and the pet's current column values
+        (or JSON_DEFAULTS for a new pet), return the resulting column values.
         """
-        print('unpacking pet...')        # If an id is provided, try to fetch and update an existing pet.
-        if "id" in pet_data:
-            pet = cls.query.get(pet_data["id"])
-            if pet and pet.user_data_id == user_data_id:
-                pet.name = pet_data.get("name", pet.name)
-                pet.level = pet_data.get("level", pet.level)
-                pet.xp = pet_data.get("xp", pet.xp)
-                pet.hunger = pet_data.get("hunger", pet.hunger)
-                pet.happiness = pet_data.get("happiness", pet.happiness)
-                pet.created_at = pet_data.get("createdAt", pet.created_at)
-                pet.last_update = pet_data.get("lastUpdate", pet.last_update)
-                # Handle abilities: if provided as a list, join into a comma-separated string.
-                abilities = pet_data.get("abilities")
-                if abilities is not None:
-                    if isinstance(abilities, list):
-                        pet.abilities = ",".join(abilities)
-                    else:
-                        pet.abilities = abilities
-                # Process evolution identifier if provided.
-                evolution_id = pet_data.get("evolution_id")
-                if evolution_id and isinstance(evolution_id, list) and len(evolution_id) == 2:
-                    pet.evolution_stage, pet.evolution_line = evolution_id
-                return pet        # Otherwise, create a new pet.
-        name = pet_data.get("name")
-        level = pet_data.get("level", 1)
-        xp = pet_data.get("xp", 0)
-        hunger = pet_data.get("hunger", 0.5)
-        happiness = pet_data.get("happiness", 0.5)
-        created_at = pet_data.get("createdAt")
-        last_update = pet_data.get("lastUpdate")
-        abilities = pet_data.get("abilities", [])
-        if isinstance(abilities, list):
-            abilities = ",".join(abilities)
-        evolution_id = pet_data.get("evolution_id", [0, 0])
-        if isinstance(evolution_id, list) and len(evolution_id) == 2:
-            evolution_stage, evolution_line = evolution_id
-        else:
-            evolution_stage, evolution_line = 0, 0
-
-        new_pet = cls(
-            user_data_id=user_data_id,
-            evolution_line=evolution_line,
-            evolution_stage=evolution_stage,
-            name=name,
-            level=level,
-            xp=xp,
-            hunger=hunger,
-            happiness=happiness,
-            abilities=abilities,
-            created_at=created_at,
-            last_update=last_update
-        )
-        db.session.add(new_pet)
-        return new_pet
+        columns = dict(current)
+        for key, column in cls.JSON_FIELDS:
+            if key in pet_data:
+                columns[column] = pet_data[key]
+        # Handle abilities: if provided as a list, join into a comma-separated string.
+        abilities = pet_data.get("abilities")
+        if abilities is not None:
+            columns["abilities"] = ",".join(abilities) if isinstance(abilities, list) else abilities
+        # Process evolution identifier if provided.
+        evolution_id = pet_data.get("evolution_id")
+        if evolution_id and isinstance(evolution_id, list) and len(evolution_id) == 2:
+            columns["evolution_stage"], columns["evolution_line"] = evolution_id
+        return columns
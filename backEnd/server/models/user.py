@@ -5,6 +5,10 @@ class User(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(80), unique=True, nullable=False)
     password = db.Column(db.String(120), nullable=False)
+    # Shard holding the save when saves are sharded (see sharding.py); NULL: this database
+    shard = db.Column(db.Integer, nullable=True)
+    # Epoch ms of registration or the last login, to the hour (see archive.py); NULL: not yet known
+    last_seen = db.Column(db.BigInteger, nullable=True)
     # One-to-one relationship with UserData
     data = db.relationship('UserData', backref='user', uselist=False)
 
@@ -1,3 +1,4 @@
+from sqlalchemy.orm import deferred
 from database import db
 
 class UserData(db.Model):
@@ -6,6 +7,11 @@ class UserData(db.Model):
     id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
     completed_tutorial = db.Column(db.Boolean, default=False)
     money = db.Column(db.Integer, default=0)
+    # Incremented on every write to the save; patches are checked against it
+    version = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    # Set while the save is archived (see archive.py): its child rows are in `archive`, not their tables
+    archived_at = db.Column(db.BigInteger, nullable=True)
+    archive = deferred(db.Column(db.LargeBinary, nullable=True))
     pets = db.relationship('Pet', backref='user_data', lazy=True)
     home_objects = db.relationship('HomeObject', backref='user_data', lazy=True)
     inventory = db.relationship('InventoryItem', backref='user_data', lazy=True)
@@ -14,6 +20,7 @@ class UserData(db.Model):
         return {
             "completed_tutorial": self.completed_tutorial,
             "money": self.money,
+            "version": self.version,
             "pets": [pet.to_dict() for pet in self.pets],
             "home_objects": [obj.to_dict() for obj in self.home_objects],
             "inventory": [inv.to_dict() for inv in self.inventory]
@@ -0,0 +1,113 @@
+"""
+scrypt password hashing on a bounded worker pool.
+
+Hashing is deliberately slow (tens of milliseconds at the default cost), so it
+runs on a small thread pool: hashlib.scrypt releases the GIL, and request
+threads simply wait for their result. At most PASSWORD_HASH_WORKERS hashes run
+at once and PASSWORD_HASH_QUEUE more may wait; beyond that a login or
+registration is refused with PoolSaturated (the routes answer 429) instead of
+piling up behind a login storm.
+
+Stored hashes look like "scrypt$<n>$<r>$<p>$<salt>$<hash>". Plaintext rows
+from before hashing, and hashes made with other cost parameters, still verify
+and are flagged for rehashing so login can upgrade them in place.
+"""
+import base64
+import hashlib
+import hmac
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+SCHEME = "scrypt"
+SALT_BYTES = 16
+HASH_BYTES = 32
+
+
+class PoolSaturated(Exception):
+    """Raised when the hashing pool and its queue are full."""
+
+
+def _b64(data):
+    return base64.b64encode(data).rstrip(b"=").decode("ascii")
+
+
+def _unb64(text):
+    return base64.b64decode(text + "=" * (-len(text) % 4))
+
+
+def _scrypt(password, salt, n, r, p):
+    return hashlib.scrypt(password.encode("utf-8"), salt=salt, n=n, r=r, p=p,
+                          maxmem=256 * n * r * p, dklen=HASH_BYTES)
+
+
+class PasswordHasher:
+    def __init__(self, n, r, p, workers, max_queue):
+        self.n, self.r, self.p = n, r, p
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="password-hash")
+        self._slots = threading.BoundedSemaphore(workers + max_queue)
+        self.stats = {"hashed": 0, "verified": 0, "rejected": 0}
+
+    def _run(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            self.stats["rejected"] += 1
+            raise PoolSaturated()
+        try:
+            future = self._pool.submit(fn, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future.result()
+
+    def _hash(self, password):
+        salt = os.urandom(SALT_BYTES)
+        digest = _scrypt(password, salt, self.n, self.r, self.p)
+        return f"{SCHEME}${self.n}${self.r}${self.p}${_b64(salt)}${_b64(digest)}"
+
+    def _verify(self, password, stored):
+        parts = stored.split("$")
+        if len(parts) != 6 or parts[0] != SCHEME:
+            # Legacy plaintext row
+            return hmac.compare_digest(password.encode("utf-8"), stored.encode("utf-8")), True
+        try:
+            n, r, p = int(parts[1]), int(parts[2]), int(parts[3])
+            digest = _scrypt(password, _unb64(parts[4]), n, r, p)
+            expected = _unb64(parts[5])
+        except ValueError:
+            # Corrupt hash (bad parameters or base64): nothing can match it
+            return False, False
+        return hmac.compare_digest(digest, expected), (n, r, p) != (self.n, self.r, self.p)
+
+    def hash(self, password):
+        """Hash a new password on the pool. May raise PoolSaturated."""
+        stored = self._run(self._hash, password)
+        self.stats["hashed"] += 1
+        return stored
+
+    def verify(self, password, stored):
+        """
+        Check password against a stored value on the pool. Returns (matches,
+        needs_rehash); needs_rehash is set for plaintext rows and hashes made
+        with other cost parameters. May raise PoolSaturated.
+        """
+        if not stored.startswith(SCHEME + "$"):
+            # Nothing to compute for plaintext rows; don't spend a pool slot on them
+            result = self._verify(password, stored)
+        else:
+            result = self._run(self._verify, password, stored)
+        self.stats["verified"] += 1
+        return result
+
+
+def init_passwords(app):
+    """Create the password hasher from the PASSWORD_* settings."""
+    hasher = PasswordHasher(
+        n=app.config['PASSWORD_SCRYPT_N'],
+        r=app.config['PASSWORD_SCRYPT_R'],
+        p=app.config['PASSWORD_SCRYPT_P'],
+        workers=app.config['PASSWORD_HASH_WORKERS'],
+        max_queue=app.config['PASSWORD_HASH_QUEUE'],
+    )
+    app.extensions['passwords'] = hasher
+    return hasher
@@ -0,0 +1,395 @@
+"""
+Per-user server-sent event streams of save changes.
+
+GET /userdata/<id>/events opens a text/event-stream of small typed events
+about that user's save, with the session token in the Authorization header or,
+for browsers' EventSource (which can't set headers), a ?token= argument:
+    ready         sent first on every (re)connect: reload the save, then apply events
+    pets          {"version", "pets": [changed fields of each pet, with its id]}
+    home_objects  {"version", "home_objects": [new or changed rows], "deleted": [ids]}
+    inventory     {"version", "inventory": [new or changed entries], "deleted": [ids]}
+    money         {"version", "money"}
+    save          {"version"}: the save was rewritten wholesale; reload it
+Each message carries the save version, also as its SSE id. Values are
+absolute, so applying an event twice is harmless; clients skip events older
+than the version they hold.
+
+Writers call publish_changes() with a reply-shaped change set. The events wait
+on db.session and go out when it commits (a rollback drops them); nothing is
+built for users without an open stream. Bursts are coalesced: a stream waits
+PUSH_COALESCE_MS after its first pending event and merges everything that
+arrives meanwhile, later values winning, into at most one message per type.
+A stream that falls too far behind gets one "save" instead. Idle streams get a
+comment line every PUSH_HEARTBEAT seconds so proxies keep them open.
+
+Under asgi.py, streams are answered by asgi_app() on uvicorn's event loop, so
+an idle one costs a coroutine and a few small objects rather than a thread.
+The Flask route in app.py serves them under the werkzeug server, one thread
+each. The hub lives in process memory: a stream hears about the writes its
+own worker handles, including the live simulation of its users' pets (see
+simulation.start_live_simulation), but not other workers' writes.
+"""
+import abc
+import asyncio
+import re
+import threading
+import time
+from urllib.parse import parse_qs
+from flask import current_app
+from sqlalchemy import event
+from database import ShardedSession, db
+from metrics import PUSH_EVENTS, PUSH_MESSAGES, PUSH_STREAMS
+
+ROW_KEYS = ("pets", "home_objects", "inventory")
+MAX_PENDING_ROWS = 500  # merged rows a stream may owe before it's told to reload instead
+
+READY = b"retry: 5000\nevent: ready\ndata: {}\n\n"
+HEARTBEAT = b": keep-alive\n\n"
+STREAM_HEADERS = (
+    ("Content-Type", "text/event-stream"),
+    ("Cache-Control", "no-cache"),
+    ("X-Accel-Buffering", "no"),  # stop nginx from buffering the stream
+    ("Access-Control-Allow-Origin", "*"),
+)
+EVENTS_PATH = re.compile(r"/userdata/(\d+)/events")
+
+
+class _Pending:
+    """Events merged since a stream's last message."""
+    __slots__ = ("version", "rows", "deleted", "money", "reload", "size")
+
+    def __init__(self):
+        self.version = 0
+        self.rows = {key: {} for key in ROW_KEYS}  # row id -> (version, fields)
+        self.deleted = {key: set() for key in ROW_KEYS}
+        self.money = None  # (version, money)
+        self.reload = False
+        self.size = 0
+
+    def merge(self, kind, payload):
+        version = payload.get("version") or 0
+        self.version = max(self.version, version)
+        if self.reload:
+            return
+        if kind == "save":
+            self.reload = True
+        elif kind == "money":
+            if self.money is None or version >= self.money[0]:
+                self.money = (version, payload["money"])
+        else:
+            rows, deleted = self.rows[kind], self.deleted[kind]
+            for row in payload.get(kind, ()):
+                current = rows.get(row["id"])
+                if current is None:
+                    rows[row["id"]] = (version, dict(row))
+                    self.size += 1
+                elif version >= current[0]:
+                    rows[row["id"]] = (version, {**current[1], **row})
+                else:
+                    # Published out of order: only fill in fields the newer event didn't set
+                    rows[row["id"]] = (current[0], {**row, **current[1]})
+            for row_id in payload.get("deleted", ()):
+                rows.pop(row_id, None)
+                deleted.add(row_id)
+                self.size += 1
+            if self.size > MAX_PENDING_ROWS:
+                self.reload = True
+
+    def messages(self):
+        """[(event type, payload)] for everything merged."""
+        if self.reload:
+            return [("save", {"version": self.version})]
+        messages = []
+        for key in ROW_KEYS:
+            rows, deleted = self.rows[key], self.deleted[key]
+            if rows or deleted:
+                payload = {"version": self.version, key: [fields for _, fields in rows.values()]}
+                if deleted:
+                    payload["deleted"] = sorted(deleted)
+                messages.append((key, payload))
+        if self.money is not None:
+            messages.append(("money", {"version": self.version, "money": self.money[1]}))
+        return messages
+
+
+class Subscriber(abc.ABC):
+    """One open stream. offer() runs on writer threads; the stream takes what's pending."""
+
+    def __init__(self, user_id):
+        self.user_id = user_id
+        self._pending = None
+        self._lock = threading.Lock()
+
+    def offer(self, kind, payload):
+        with self._lock:
+            first = self._pending is None
+            if first:
+                self._pending = _Pending()
+            self._pending.merge(kind, payload)
+        if first:
+            # One wake-up per burst; the rest merge into the same pending set
+            self._wake()
+
+    def take(self):
+        with self._lock:
+            pending, self._pending = self._pending, None
+        return pending
+
+    @abc.abstractmethod
+    def _wake(self):
+        """Tell the stream something is pending; called from the offering thread."""
+
+
+class AsyncSubscriber(Subscriber):
+    """A stream served by a coroutine on an event loop."""
+
+    def __init__(self, user_id, loop):
+        super().__init__(user_id)
+        self._loop = loop
+        self._ready = asyncio.Event()
+
+    def _wake(self):
+        self._loop.call_soon_threadsafe(self._ready.set)
+
+    async def wait(self, timeout, disconnected):
+        """True once something is pending, False after `timeout` seconds or a disconnect."""
+        waiter = asyncio.ensure_future(self._ready.wait())
+        await asyncio.wait((waiter, disconnected), timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+        waiter.cancel()
+        if self._ready.is_set():
+            self._ready.clear()
+            return True
+        return False
+
+
+class ThreadSubscriber(Subscriber):
+    """A stream served by a blocking generator on its own thread."""
+
+    def __init__(self, user_id):
+        super().__init__(user_id)
+        self._ready = threading.Event()
+
+    def _wake(self):
+        self._ready.set()
+
+    def wait(self, timeout):
+        if self._ready.wait(timeout):
+            self._ready.clear()
+            return True
+        return False
+
+
+class PushHub:
+    def __init__(self, encode, heartbeat, coalesce_seconds, max_streams, max_streams_per_user):
+        self.encode = encode
+        self.heartbeat = heartbeat
+        self.coalesce = coalesce_seconds
+        self.max_streams = max_streams
+        self.max_streams_per_user = max_streams_per_user
+        self._streams = {}  # user id -> set of subscribers
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def open(self, subscriber):
+        """Register a stream; False when the process or the user has too many open."""
+        with self._lock:
+            streams = self._streams.get(subscriber.user_id, ())
+            if self._count >= self.max_streams or len(streams) >= self.max_streams_per_user:
+                return False
+            self._streams.setdefault(subscriber.user_id, set()).add(subscriber)
+            self._count += 1
+            count = self._count
+        PUSH_STREAMS.set(count)
+        return True
+
+    def close(self, subscriber):
+        with self._lock:
+            streams = self._streams.get(subscriber.user_id)
+            if streams is None or subscriber not in streams:
+                return
+            streams.discard(subscriber)
+            if not streams:
+                del self._streams[subscriber.user_id]
+            self._count -= 1
+            count = self._count
+        PUSH_STREAMS.set(count)
+
+    def watched(self, user_ids=None):
+        """The users (of user_ids, or all) with at least one open stream."""
+        streams = self._streams
+        if user_ids is None:
+            return set(streams)
+        return {user_id for user_id in user_ids if user_id in streams}
+
+    def is_watched(self, user_id):
+        return user_id in self._streams
+
+    def publish(self, user_id, kind, payload):
+        subscribers = self._streams.get(user_id)
+        if not subscribers:
+            return
+        PUSH_EVENTS.inc(kind)
+        for subscriber in tuple(subscribers):
+            subscriber.offer(kind, payload)
+
+    def render(self, pending):
+        """SSE bytes for a subscriber's pending events (b"" if there are none)."""
+        if pending is None:
+            return b""
+        chunks = []
+        for kind, payload in pending.messages():
+            PUSH_MESSAGES.inc(kind)
+            chunks.append(f"event: {kind}\nid: {payload['version']}\ndata: ".encode("ascii"))
+            chunks.append(self.encode(payload))
+            chunks.append(b"\n\n")
+        return b"".join(chunks)
+
+
+def _hub():
+    return current_app.extensions.get('push')
+
+
+def watched_users(user_ids):
+    """The users among user_ids with an open stream in this process."""
+    hub = _hub()
+    return set() if hub is None else hub.watched(user_ids)
+
+
+def publish_changes(user_id, changes, on_commit=True):
+    """
+    Push a reply-shaped change set ({"version", "money"?, "completed_tutorial"?,
+    "pets"?, "home_objects"?, "inventory"?, "deleted"?: {key: [ids]}}) to
+    user_id's streams as typed events, when db.session next commits or, with
+    on_commit False, now (for changes already committed). A change set with
+    "reload" (or a tutorial flag) becomes a single "save" event.
+    """
+    hub = _hub()
+    if hub is None or not hub.is_watched(user_id):
+        return
+    version = changes.get("version")
+    if changes.get("reload") or "completed_tutorial" in changes:
+        events = [("save", {"version": version})]
+    else:
+        deleted = changes.get("deleted") or {}
+        events = [
+            (key, {"version": version, key: changes.get(key) or [], "deleted": deleted.get(key) or []})
+            for key in ROW_KEYS if changes.get(key) or deleted.get(key)
+        ]
+        if changes.get("money") is not None:
+            events.append(("money", {"version": version, "money": changes["money"]}))
+    if on_commit:
+        db.session.info.setdefault("push_events", []).extend((user_id, kind, payload) for kind, payload in events)
+    else:
+        for kind, payload in events:
+            hub.publish(user_id, kind, payload)
+
+
+def authorize_stream(auth, user_id, token):
+    """None if token may open user_id's stream, else (status, error)."""
+    token_user = auth.verify(token) if token else None
+    if token_user is None:
+        return 401, "Authentication required"
+    if token_user != user_id:
+        return 403, "Forbidden"
+    return None
+
+
+def thread_stream(hub, subscriber):
+    """Body generator for a stream served on its own thread (the Flask route)."""
+    try:
+        yield READY
+        while True:
+            if subscriber.wait(hub.heartbeat):
+                time.sleep(hub.coalesce)
+                body = hub.render(subscriber.take())
+                if body:
+                    yield body
+            else:
+                yield HEARTBEAT
+    finally:
+        hub.close(subscriber)
+
+
+async def _disconnect(receive):
+    while (await receive())["type"] != "http.disconnect":
+        pass
+
+
+async def _serve_stream(app, hub, user_id, scope, receive, send):
+    authorization = dict(scope["headers"]).get(b"authorization", b"").decode("latin-1")
+    scheme, _, token = authorization.partition(" ")
+    token = token.strip() if scheme.lower() == "bearer" else None
+    if not token:
+        token = parse_qs(scope["query_string"].decode("latin-1")).get("token", [None])[0]
+
+    subscriber = AsyncSubscriber(user_id, asyncio.get_running_loop())
+    refused = authorize_stream(app.extensions['auth'], user_id, token)
+    if refused is None and not hub.open(subscriber):
+        refused = 503, "Too many open event streams"
+    if refused is not None:
+        status, error = refused
+        await send({"type": "http.response.start", "status": status, "headers": [
+            (b"content-type", b"application/json"), (b"access-control-allow-origin", b"*"),
+        ]})
+        await send({"type": "http.response.body", "body": hub.encode({"error": error})})
+        return
+
+    disconnected = asyncio.ensure_future(_disconnect(receive))
+    try:
+        await send({"type": "http.response.start", "status": 200, "headers": [
+            (name.lower().encode("latin-1"), value.encode("latin-1")) for name, value in STREAM_HEADERS
+        ]})
+        await send({"type": "http.response.body", "body": READY, "more_body": True})
+        while not disconnected.done():
+            if await subscriber.wait(hub.heartbeat, disconnected):
+                await asyncio.sleep(hub.coalesce)
+                body = hub.render(subscriber.take())
+                if not body:
+                    continue
+            elif disconnected.done():
+                break
+            else:
+                body = HEARTBEAT
+            await send({"type": "http.response.body", "body": body, "more_body": True})
+    finally:
+        hub.close(subscriber)
+        disconnected.cancel()
+
+
+def asgi_app(app, inner):
+    """
+    Wrap the ASGI app `inner` (the Flask app under a2wsgi) so event streams
+    are served on the event loop instead of tying up one of its threads each.
+    """
+    hub = app.extensions.get('push')
+    if hub is None:
+        return inner
+
+    async def dispatch(scope, receive, send):
+        if scope["type"] == "http" and scope["method"] == "GET":
+            match = EVENTS_PATH.fullmatch(scope["path"])
+            if match:
+                await _serve_stream(app, hub, int(match[1]), scope, receive, send)
+                return
+        await inner(scope, receive, send)
+    return dispatch
+
+
+def init_push(app, encode):
+    """Create the hub and send queued events on commit; returns it, or None with PUSH_ENABLED off."""
+    if not app.config['PUSH_ENABLED']:
+        return None
+    hub = PushHub(encode, app.config['PUSH_HEARTBEAT'], app.config['PUSH_COALESCE_MS'] / 1000.0,
+                  app.config['PUSH_MAX_STREAMS'], app.config['PUSH_MAX_STREAMS_PER_USER'])
+
+    @event.listens_for(ShardedSession, "after_commit")
+    def send_committed_events(session):
+        for user_id, kind, payload in session.info.pop("push_events", ()):
+            hub.publish(user_id, kind, payload)
+
+    @event.listens_for(ShardedSession, "after_rollback")
+    def drop_rolled_back_events(session):
+        session.info.pop("push_events", None)
+
+    app.extensions['push'] = hub
+    return hub
@@ -0,0 +1,173 @@
+from sqlalchemy import delete, insert, select, update
+from database import db
+from models import UserData, Pet, HomeObject, InventoryItem
+from validation import is_bool, is_int, list_of
+
+# Payload key -> model for every child table of a save.
+CHILD_MODELS = (
+    ("pets", Pet),
+    ("home_objects", HomeObject),
+    ("inventory", InventoryItem),
+)
+
+class UnknownRows(Exception):
+    """A patch names row ids that aren't in the save."""
+
+    def __init__(self, table, ids):
+        super().__init__(f"Unknown {table} ids: {', '.join(map(str, ids))}")
+        self.table = table
+        self.ids = ids
+
+
+# Save fields next to the child lists, and their accepted types.
+SAVE_FIELDS = {
+    "completed_tutorial": is_bool,
+    "money": is_int,
+}
+
+
+def payload_error(data):
+    """
+    Why a save payload (PUT or PATCH) is malformed, or None if it's fine:
+    the save fields and every row's fields must have their JSON types, and
+    rows without an id (which become new rows) must carry the model's
+    JSON_REQUIRED keys.
+    """
+    for key, check in SAVE_FIELDS.items():
+        if key in data and not check(data[key]):
+            return f"Invalid {key}"
+    for key, model in CHILD_MODELS:
+        rows = data.get(key, [])
+        if not isinstance(rows, list) or not all(isinstance(row, dict) for row in rows):
+            return f"{key} must be a list of objects"
+        for row in rows:
+            for field, check in model.JSON_TYPES.items():
+                if field in row and not check(row[field]):
+                    return f"Invalid {key}.{field}"
+            if row.get("id") is None and any(row.get(field) is None for field in model.JSON_REQUIRED):
+                return f"New {key} need {', '.join(model.JSON_REQUIRED)}"
+    deleted = data.get("deleted", {})
+    if not isinstance(deleted, dict):
+        return "deleted must be an object of id lists"
+    for key, ids in deleted.items():
+        if not list_of(is_int)(ids):
+            return f"deleted.{key} must be a list of ids"
+    return None
+
+
+def plan_rows(model, rows_data, user_data_id, listed_only=False):
+    """
+    The read-only half of reconcile_rows: returns (inserts, updates), the
+    column dicts of the rows to create and of the rows whose values changed.
+    With listed_only (patches) only rows without an id are created; an id
+    that isn't one of the user's rows raises UnknownRows.
+    """
+    table = model.__table__
+    existing = {}
+    listed_ids = [row_data["id"] for row_data in rows_data if row_data.get("id") is not None]
+    if listed_ids or not listed_only:
+        query = select(table).where(table.c.user_data_id == user_data_id)
+        if listed_only:
+            query = query.where(table.c.id.in_(listed_ids))
+        existing = {row["id"]: dict(row) for row in db.session.execute(query).mappings()}
+    if listed_only:
+        unknown = sorted(set(listed_ids) - existing.keys())
+        if unknown:
+            raise UnknownRows(table.name, unknown)
+
+    inserts = []
+    updates = {}
+    for row_data in rows_data:
+        current = existing.get(row_data.get("id"))
+        if current is None:
+            # Unknown ids (or ids owned by someone else) become new rows, as before.
+            columns = model.columns_from_json(row_data, model.JSON_DEFAULTS)
+            columns["user_data_id"] = user_data_id
+            inserts.append(columns)
+            continue
+        columns = model.columns_from_json(row_data, updates.get(current["id"], current))
+        if columns != current or current["id"] in updates:
+            updates[current["id"]] = columns
+
+    return inserts, list(updates.values())
+
+
+def apply_rows(model, inserts, updates):
+    """Write a plan_rows plan. Returns an (inserted_ids, updated_ids) pair."""
+    if updates:
+        db.session.execute(update(model), updates)
+    inserted_ids = []
+    if inserts:
+        inserted_ids = list(db.session.scalars(
+            insert(model).returning(model.__table__.c.id, sort_by_parameter_order=True), inserts
+        ))
+    return inserted_ids, [columns["id"] for columns in updates]
+
+
+def reconcile_rows(model, rows_data, user_data_id, listed_only=False):
+    """
+    Reconcile a list of JSON rows against the rows of `model` owned by user_data_id.
+
+    The user's existing rows are fetched with a single SELECT and diffed against
+    the payload in memory. Rows whose values changed are written with one batched
+    UPDATE, new rows with one batched INSERT; unchanged rows cost nothing.
+    Rows missing from the payload are left alone, as before. With listed_only
+    the SELECT is restricted to the ids named in the payload (used by patches).
+    Returns an (inserted_ids, updated_ids) pair.
+    """
+    return apply_rows(model, *plan_rows(model, rows_data, user_data_id, listed_only))
+
+
+def delete_rows(model, ids, user_data_id):
+    """Delete the listed rows of `model` owned by user_data_id. Returns the ids actually deleted."""
+    if not ids:
+        return []
+    table = model.__table__
+    return list(db.session.scalars(
+        delete(table)
+        .where(table.c.user_data_id == user_data_id, table.c.id.in_(ids))
+        .returning(table.c.id)
+    ))
+
+
+def bump_version(user_data_id, base_version=None):
+    """
+    Increment a save's version and return the new one. With base_version this is
+    a compare-and-swap: nothing is written and None is returned if the stored
+    version has moved on.
+    """
+    table = UserData.__table__
+    statement = update(table).where(table.c.id == user_data_id)
+    if base_version is not None:
+        statement = statement.where(table.c.version == base_version)
+    return db.session.scalar(statement.values(version=table.c.version + 1).returning(table.c.version))
+
+
+def plan_userdata(user_data_id, data, listed_only=False):
+    """
+    The read-only half of reconcile_userdata: {payload_key: (inserts, updates)}
+    for every child list present. It only SELECTs, which sqlite3 runs outside
+    any transaction, so it can run before the version compare-and-swap and
+    keep the save's write transaction down to the CAS and the writes. Every
+    write to a save bumps its version, so a plan is still accurate if the CAS
+    succeeds.
+    """
+    return {key: plan_rows(model, data[key], user_data_id, listed_only)
+            for key, model in CHILD_MODELS if key in data}
+
+
+def apply_userdata(user_data, data, plans):
+    """Write a save payload's fields and its plan_userdata plans. Returns {key: (inserted_ids, updated_ids)}."""
+    if 'completed_tutorial' in data:
+        user_data.completed_tutorial = data['completed_tutorial']
+    if 'money' in data:
+        user_data.money = data['money']
+    return {key: apply_rows(model, *plans[key]) for key, model in CHILD_MODELS if key in plans}
+
+
+def reconcile_userdata(user_data, data, listed_only=False):
+    """
+    Apply a save payload to user_data and its child tables.
+    Returns {payload_key: (inserted_ids, updated_ids)} for every child list present.
+    """
+    return apply_userdata(user_data, data, plan_userdata(user_data.id, data, listed_only))
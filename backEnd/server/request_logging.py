@@ -0,0 +1,120 @@
+"""
+Structured, non-blocking logging for the API.
+
+Everything goes through app.logger. Records are put on an in-memory queue by
+the request thread and written (as one JSON object per line) to stderr by a
+background listener thread, so a slow terminal or pipe never stalls a request.
+Messages use lazy %-style arguments: nothing is formatted for records below
+LOG_LEVEL.
+
+Each request is sampled once, at LOG_SAMPLE_RATE or its endpoint's rate in
+LOG_SAMPLE_RATES; unsampled requests drop their INFO and DEBUG records,
+warnings and errors are always kept. Full save payloads are only logged when
+LOG_PAYLOADS is set.
+"""
+import atexit
+import json
+import logging
+import queue
+import random
+import sys
+import time
+from logging.handlers import QueueHandler, QueueListener
+from flask import g, has_request_context, request
+
+# Attributes every LogRecord has; anything else was passed through `extra`
+_RECORD_ATTRS = set(logging.makeLogRecord({}).__dict__) | {"message", "asctime"}
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record: time, level, logger, message and any extra fields."""
+
+    def format(self, record):
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRS and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """Drop INFO and below from requests that weren't sampled."""
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING or not has_request_context():
+            return True
+        return g.get("log_sampled", True)
+
+
+_traceback_formatter = logging.Formatter()
+
+
+class _StructuredQueueHandler(QueueHandler):
+    def prepare(self, record):
+        # Merge the arguments and render any traceback now (they may not outlive
+        # the request); the JSON encoding and the write happen on the listener
+        record = logging.makeLogRecord(record.__dict__)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = _traceback_formatter.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def parse_sample_rates(spec):
+    """'endpoint=rate,endpoint=rate' -> {endpoint: rate}."""
+    rates = {}
+    for part in spec.split(","):
+        if part.strip():
+            endpoint, rate = part.split("=", 1)
+            rates[endpoint.strip()] = float(rate)
+    return rates
+
+
+def init_logging(app, stream=None):
+    """Route app.logger through a queue to a JSON stderr handler and log sampled requests."""
+    log_queue = queue.SimpleQueue()
+    output = logging.StreamHandler(stream or sys.stderr)
+    output.setFormatter(JsonFormatter())
+    listener = QueueListener(log_queue, output)
+    listener.start()
+    atexit.register(listener.stop)
+
+    handler = _StructuredQueueHandler(log_queue)
+    handler.addFilter(SamplingFilter())
+    app.logger.handlers[:] = [handler]
+    app.logger.setLevel(app.config['LOG_LEVEL'].upper())
+    app.logger.propagate = False
+
+    default_rate = app.config['LOG_SAMPLE_RATE']
+    rates = parse_sample_rates(app.config['LOG_SAMPLE_RATES'])
+
+    @app.before_request
+    def sample_request():
+        g.log_sampled = random.random() < rates.get(request.endpoint, default_rate)
+        g.request_start = time.perf_counter()
+
+    @app.after_request
+    def log_request(response):
+        if g.get("log_sampled") and app.logger.isEnabledFor(logging.INFO):
+            app.logger.info(
+                "%s %s %s", request.method, request.path, response.status_code,
+                extra={
+                    "endpoint": request.endpoint,
+                    "status": response.status_code,
+                    "ms": round((time.perf_counter() - g.request_start) * 1000.0, 2),
+                },
+            )
+        return response
+
+    return listener
@@ -0,0 +1,86 @@
+"""
+Bounded LRU cache of serialized saves, keyed by user id and save version.
+
+Every write to a save bumps its version (see reconcile.bump_version and the
+pet simulation), so a cached body is only served while the stored version
+still matches; an entry left behind by a missed invalidation, or by another
+worker process, can never be returned stale. Write paths still invalidate
+their user's entry so dead bodies don't hold memory until they're evicted.
+
+Only one version per user is kept, with a body for each save encoding
+(see save_codec.py) that has been asked for at that version. Entries are evicted least recently used
+first once the bodies exceed SAVE_CACHE_MAX_BYTES.
+"""
+import threading
+from collections import OrderedDict
+import metrics
+
+
+class SaveCache:
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # user id -> (version, {encoding name: body})
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+    def get(self, user_id, version, encoding="json"):
+        """The cached body of user_id's save at `version` in `encoding`, or None."""
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None or entry[0] != version or encoding not in entry[1]:
+                self.stats["misses"] += 1
+                metrics.SAVE_CACHE_LOOKUPS.inc("miss")
+                return None
+            self._entries.move_to_end(user_id)
+            self.stats["hits"] += 1
+        metrics.SAVE_CACHE_LOOKUPS.inc("hit")
+        return entry[1][encoding]
+
+    def put(self, user_id, version, body, encoding="json"):
+        if len(body) > self.max_bytes:
+            return
+        with self._lock:
+            current = self._entries.get(user_id)
+            if current is not None and current[0] > version:
+                return  # a newer version was cached meanwhile
+            if current is not None and current[0] == version:
+                bodies = current[1]
+                self._bytes -= len(bodies.get(encoding, b""))
+                self._entries.move_to_end(user_id)
+            else:
+                self._discard(user_id)
+                bodies = {}
+                self._entries[user_id] = (version, bodies)
+            bodies[encoding] = body
+            self._bytes += len(body)
+            evicted = 0
+            while self._bytes > self.max_bytes:
+                _, (_, old_bodies) = self._entries.popitem(last=False)
+                self._bytes -= sum(len(old_body) for old_body in old_bodies.values())
+                evicted += 1
+            self.stats["evictions"] += evicted
+            size = self._bytes
+        if evicted:
+            metrics.SAVE_CACHE_EVICTIONS.inc(amount=evicted)
+        metrics.SAVE_CACHE_BYTES.set(size)
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._discard(user_id)
+            size = self._bytes
+        metrics.SAVE_CACHE_BYTES.set(size)
+
+    def _discard(self, user_id):
+        entry = self._entries.pop(user_id, None)
+        if entry is not None:
+            self._bytes -= sum(len(body) for body in entry[1].values())
+
+
+def init_save_cache(app):
+    """Create the save cache unless SAVE_CACHE_MAX_BYTES is 0; returns it or None."""
+    if app.config['SAVE_CACHE_MAX_BYTES'] <= 0:
+        return None
+    cache = SaveCache(app.config['SAVE_CACHE_MAX_BYTES'])
+    app.extensions['save_cache'] = cache
+    return cache
@@ -0,0 +1,139 @@
+"""
+Compact save encodings, chosen by content negotiation.
+
+Save responses (register, login, GET/PUT/PATCH /userdata) are encoded in the
+best of these the client lists in Accept, and PUT/PATCH bodies may be sent in
+any of them (by Content-Type):
+    application/json                        the row-per-object shape the models' to_dict produce
+    application/vnd.webpets.columns+json    the columnar layout below, as JSON
+    application/vnd.webpets.columns+msgpack the columnar layout as MessagePack (optional, pip install msgpack)
+Clients that send no Accept header, or only application/json, get JSON as before.
+
+In the columnar layout each child list ("pets", "home_objects", "inventory")
+becomes an object of parallel arrays, one per field, so field names are sent
+once per table instead of once per row. Fields that repeat what the client
+already has are left out: user_data_id (the save's id) and the catalog entry
+embedded in each inventory row (GET /items has it). A pet's evolution_id is
+split into evolution_stage and evolution_line columns and its abilities are
+sent as the stored comma-separated string. A row without some field has null
+in that column, and null always means "not given": decoding leaves the field
+out of the row.
+"""
+import json
+from werkzeug.exceptions import BadRequest, UnsupportedMediaType
+
+try:
+    import msgpack
+except ImportError:  # optional binary encoding
+    msgpack = None
+
+JSON = "application/json"
+COLUMNS_JSON = "application/vnd.webpets.columns+json"
+COLUMNS_MSGPACK = "application/vnd.webpets.columns+msgpack"
+
+ROW_KEYS = ("pets", "home_objects", "inventory")
+_DROPPED_FIELDS = {"pets": ("user_data_id",), "home_objects": ("user_data_id",), "inventory": ("user_data_id", "item")}
+
+
+def _pet_row(pet):
+    row = {key: value for key, value in pet.items() if key not in ("evolution_id", "abilities")}
+    if "evolution_id" in pet:
+        row["evolution_stage"], row["evolution_line"] = pet["evolution_id"]
+    if "abilities" in pet:
+        abilities = pet["abilities"]
+        row["abilities"] = abilities if isinstance(abilities, str) else ",".join(abilities)
+    return row
+
+
+def to_columns(rows, key):
+    """A list of row dicts as {field: [value per row]}."""
+    dropped = _DROPPED_FIELDS[key]
+    if key == "pets":
+        rows = [_pet_row(row) for row in rows]
+    fields = [field for field in dict.fromkeys(field for row in rows for field in row) if field not in dropped]
+    return {field: [row.get(field) for row in rows] for field in fields}
+
+
+def from_columns(columns, key):
+    """The rows of a {field: [values]} table; null values are left out of their row."""
+    if not isinstance(columns, dict) or not all(isinstance(values, list) for values in columns.values()):
+        raise BadRequest(f"Columnar '{key}' must map field names to arrays")
+    lengths = {len(values) for values in columns.values()}
+    if len(lengths) > 1:
+        raise BadRequest(f"Columnar '{key}' has arrays of different lengths")
+    rows = [{} for _ in range(lengths.pop() if lengths else 0)]
+    for field, values in columns.items():
+        for row, value in zip(rows, values):
+            if value is not None:
+                row[field] = value
+    if key == "pets":
+        for row in rows:
+            if "evolution_stage" in row and "evolution_line" in row:
+                row["evolution_id"] = [row.pop("evolution_stage"), row.pop("evolution_line")]
+    return rows
+
+
+def _convert(payload, convert):
+    """Apply convert(value, key) to every child list of a save payload, including one nested under "data"."""
+    if not isinstance(payload, dict):
+        return payload
+    converted = dict(payload)
+    for key in ROW_KEYS:
+        if converted.get(key) is not None:
+            converted[key] = convert(converted[key], key)
+    if isinstance(converted.get("data"), dict):
+        converted["data"] = _convert(converted["data"], convert)
+    return converted
+
+
+class SaveCodec:
+    def __init__(self, name, media_type, dumps, loads, columnar):
+        self.name = name
+        self.media_type = media_type
+        self._dumps = dumps
+        self._loads = loads
+        self.columnar = columnar
+
+    def encode(self, payload):
+        if self.columnar:
+            payload = _convert(payload, to_columns)
+        return self._dumps(payload)
+
+    def decode(self, body):
+        try:
+            payload = self._loads(body)
+        except Exception:
+            raise BadRequest(f"Malformed {self.media_type} body")
+        if self.columnar:
+            payload = _convert(payload, from_columns)
+        return payload
+
+
+class SaveCodecs:
+    def __init__(self, encode_json):
+        self.json = SaveCodec("json", JSON, encode_json, json.loads, columnar=False)
+        codecs = [self.json, SaveCodec("columns", COLUMNS_JSON, encode_json, json.loads, columnar=True)]
+        if msgpack is not None:
+            codecs.append(SaveCodec("msgpack", COLUMNS_MSGPACK, msgpack.packb, msgpack.unpackb, columnar=True))
+        self.by_media_type = {codec.media_type: codec for codec in codecs}
+
+    def for_response(self, request):
+        """The codec for the best media type in the request's Accept header; JSON if none match."""
+        media_type = request.accept_mimetypes.best_match(list(self.by_media_type), default=JSON)
+        return self.by_media_type[media_type]
+
+    def read_body(self, request):
+        """The request's save payload decoded according to its Content-Type (JSON when unset); None if empty."""
+        media_type = request.mimetype or JSON
+        codec = self.by_media_type.get(media_type)
+        if codec is None:
+            raise UnsupportedMediaType(f"Save bodies can't be sent as {media_type}")
+        body = request.get_data(cache=True)
+        return codec.decode(body) if body else None
+
+
+def init_save_codecs(app, encode_json):
+    """Create the codecs, encoding JSON with the app's response encoder; returns them."""
+    codecs = SaveCodecs(encode_json)
+    app.extensions['save_codecs'] = codecs
+    return codecs
@@ -0,0 +1,130 @@
+"""
+Read-only fast path that builds a save's JSON shape from plain rows.
+
+The save is read with Core SELECTs (one for the user and UserData, or two
+when saves are sharded, then one per child table), so no ORM instances are
+hydrated and nothing enters the session's identity map. Rows go straight into
+the same dicts the models' to_dict methods produce, which remain the reference
+for the shape; inventory entries embed the catalog's pre-serialized item, as
+InventoryItem.to_dict does. An archived save (see archive.py) raises
+SaveArchived rather than reading as empty.
+"""
+from functools import lru_cache
+from flask import current_app
+from sqlalchemy import select
+import catalog
+from archive import SaveArchived
+from models import User, UserData, Pet, HomeObject, InventoryItem
+
+_users = User.__table__
+_saves = UserData.__table__
+_pets = Pet.__table__
+_home_objects = HomeObject.__table__
+_inventory = InventoryItem.__table__
+
+_SAVE_QUERY = (
+    select(_users.c.id, _users.c.username, _saves.c.completed_tutorial, _saves.c.money, _saves.c.version,
+           _saves.c.archived_at)
+    .join(_saves, _saves.c.id == _users.c.id)
+)
+# The same in two parts, for sharded saves: the user is in the directory, the save on its shard
+_USER_QUERY = select(_users.c.id, _users.c.username)
+_SAVE_ONLY_QUERY = select(_saves.c.completed_tutorial, _saves.c.money, _saves.c.version, _saves.c.archived_at)
+# Column orders pet_dict/inventory_dict expect, also usable in RETURNING clauses
+PET_COLUMNS = (
+    _pets.c.id, _pets.c.user_data_id, _pets.c.evolution_stage, _pets.c.evolution_line, _pets.c.name,
+    _pets.c.level, _pets.c.xp, _pets.c.hunger, _pets.c.happiness, _pets.c.abilities,
+    _pets.c.created_at, _pets.c.last_update,
+)
+INVENTORY_COLUMNS = (_inventory.c.id, _inventory.c.user_data_id, _inventory.c.item_id, _inventory.c.quantity)
+
+_PET_QUERY = select(*PET_COLUMNS).order_by(_pets.c.id)
+_HOME_OBJECT_QUERY = select(
+    _home_objects.c.id, _home_objects.c.user_data_id, _home_objects.c.type,
+    _home_objects.c.object_id, _home_objects.c.x, _home_objects.c.y,
+).order_by(_home_objects.c.id)
+_INVENTORY_QUERY = select(*INVENTORY_COLUMNS).order_by(_inventory.c.id)
+
+
+@lru_cache(maxsize=4096)
+def _split_abilities(abilities):
+    # Pets share a handful of ability strings; tuples encode as JSON arrays
+    return tuple(abilities.split(",")) if abilities else ()
+
+
+def pet_dict(row):
+    """Pet.to_dict() shape for a row of PET_COLUMNS."""
+    (pet_id, owner_id, stage, line, name, level, xp, hunger, happiness, abilities,
+     created_at, last_update) = row
+    return {
+        "id": pet_id,
+        "user_data_id": owner_id,
+        "evolution_id": [stage, line],
+        "name": name,
+        "level": level,
+        "xp": xp,
+        "hunger": hunger,
+        "happiness": happiness,
+        "abilities": _split_abilities(abilities),
+        "createdAt": created_at,
+        "lastUpdate": last_update,
+    }
+
+
+def pet_dicts(session, user_data_id):
+    return [pet_dict(row) for row in session.execute(_PET_QUERY.where(_pets.c.user_data_id == user_data_id))]
+
+
+def home_object_dicts(session, user_data_id):
+    return [
+        {"id": object_row_id, "user_data_id": owner_id, "type": type_, "object_id": object_id, "x": x, "y": y}
+        for object_row_id, owner_id, type_, object_id, x, y
+        in session.execute(_HOME_OBJECT_QUERY.where(_home_objects.c.user_data_id == user_data_id))
+    ]
+
+
+def inventory_dict(row, serialize=None):
+    """InventoryItem.to_dict() shape for a row of INVENTORY_COLUMNS."""
+    entry_id, owner_id, item_id, quantity = row
+    serialize = serialize or catalog.get_catalog().serialize
+    return {"id": entry_id, "user_data_id": owner_id, "item_id": item_id, "quantity": quantity,
+            "item": serialize(item_id)}
+
+
+def inventory_dicts(session, user_data_id):
+    serialize = catalog.get_catalog().serialize
+    return [
+        inventory_dict(row, serialize)
+        for row in session.execute(_INVENTORY_QUERY.where(_inventory.c.user_data_id == user_data_id))
+    ]
+
+
+def read_save(session, user_id):
+    """
+    {"id", "username", "data": {...}} for user_id, shaped like User.to_dict()
+    plus UserData.to_dict(), or None if the user or their save doesn't exist.
+    Raises SaveArchived if the save has to be rehydrated first.
+    """
+    if current_app.extensions.get('shards') is None:
+        row = session.execute(_SAVE_QUERY.where(_users.c.id == user_id)).first()
+    else:
+        user = session.execute(_USER_QUERY.where(_users.c.id == user_id)).first()
+        save = user and session.execute(_SAVE_ONLY_QUERY.where(_saves.c.id == user_id)).first()
+        row = save and (*user, *save)
+    if row is None:
+        return None
+    user_id, username, completed_tutorial, money, version, archived_at = row
+    if archived_at is not None:
+        raise SaveArchived(user_id)
+    return {
+        "id": user_id,
+        "username": username,
+        "data": {
+            "completed_tutorial": completed_tutorial,
+            "money": money,
+            "version": version,
+            "pets": pet_dicts(session, user_id),
+            "home_objects": home_object_dicts(session, user_id),
+            "inventory": inventory_dicts(session, user_id),
+        },
+    }
@@ -0,0 +1,175 @@
+"""
+Synthetic player population for benchmarks and capacity testing.
+
+seed_users() writes N users with their saves straight into the tables with
+batched executemany INSERTs, a few thousand users per transaction, so a
+100k-user database takes well under a minute. Ids are assigned here rather
+than by the database, which lets child rows be generated alongside their
+owner without reading anything back.
+
+Distributions roughly follow real saves: most players have one or two pets
+(some still eggs), a few decor pieces and a handful of stored items, while the
+poop count is heavy-tailed because abandoned yards keep accumulating them.
+Last activity is spread from "just now" to three months ago, so some pets are
+due for a catch-up on their owner's next login. The same seed always produces
+the same population.
+
+Every seeded user is named "<prefix><id>" and shares one password, hashed once.
+With sharded saves (see sharding.py) users go to the directory and each save
+to the shard the router assigns its user.
+"""
+import random
+from sqlalchemy import func, insert, select
+from catalog import get_catalog
+from models import User, UserData, Pet, HomeObject, InventoryItem
+from simulation import POOP_BOUNDS, POOP_TYPE, MS_PER_HOUR, now_ms
+
+DEFAULT_PASSWORD = "seed"
+DEFAULT_PREFIX = "seed-"
+
+PET_COUNT_WEIGHTS = ((1, 55), (2, 25), (3, 12), (4, 5), (5, 3))
+EGG_SHARE = 0.15
+ABILITIES = ("Scratch", "Hop", "Nap", "Dig", "Sing", "Zoomies")
+DECOR_IDS = (1, 2, 3, 4, 5)  # see models/home_object.py
+FOOD_IDS = (4, 5, 6)  # apple, bread, meat left on the floor
+POOP_IDS = (1, 2, 3)
+MAX_POOPS = 500
+# (share of players, how long ago they were last active, in hours)
+ACTIVITY = ((0.3, 0, 1), (0.4, 1, 24 * 7), (0.3, 24 * 7, 24 * 90))
+
+
+SAVE_MODELS = (UserData, Pet, HomeObject, InventoryItem)
+
+
+def _next_ids(engine, save_engines):
+    """First free id in each table, so seeding appends to existing databases."""
+    with engine.connect() as conn:
+        ids = {User: (conn.scalar(select(func.max(User.__table__.c.id))) or 0) + 1}
+    for model in (Pet, HomeObject, InventoryItem):
+        ids[model] = 1
+        for save_engine in save_engines:
+            with save_engine.connect() as conn:
+                ids[model] = max(ids[model], (conn.scalar(select(func.max(model.__table__.c.id))) or 0) + 1)
+    return ids
+
+
+def _last_active(rng, now):
+    pick = rng.random()
+    for share, low_hours, high_hours in ACTIVITY:
+        if pick < share:
+            break
+        pick -= share
+    return now - int(rng.uniform(low_hours, high_hours) * MS_PER_HOUR)
+
+
+def _position(rng):
+    return rng.uniform(*POOP_BOUNDS["x"]), rng.uniform(*POOP_BOUNDS["y"])
+
+
+def generate_batch(rng, ids, count, password_hash, prefix, storable_item_ids, now):
+    """Rows for `count` users, as {model: [row dicts]}; advances the ids in place."""
+    rows = {User: [], UserData: [], Pet: [], HomeObject: [], InventoryItem: []}
+    pet_counts, pet_weights = zip(*PET_COUNT_WEIGHTS)
+    for _ in range(count):
+        user_id = ids[User]
+        ids[User] += 1
+        last_active = _last_active(rng, now)
+        rows[User].append({"id": user_id, "username": f"{prefix}{user_id}", "password": password_hash, "shard": None,
+                          "last_seen": last_active})
+        rows[UserData].append({
+            "id": user_id,
+            "completed_tutorial": rng.random() < 0.9,
+            "money": int(rng.lognormvariate(5.0, 1.0)),
+            "version": 0,
+        })
+
+        for _ in range(rng.choices(pet_counts, pet_weights)[0]):
+            egg = rng.random() < EGG_SHARE
+            created_at = last_active - int(rng.uniform(0, 24 * 60) * MS_PER_HOUR)
+            rows[Pet].append({
+                "id": ids[Pet],
+                "user_data_id": user_id,
+                "evolution_line": rng.randrange(3),
+                "evolution_stage": 0 if egg else rng.choice((1, 1, 1, 2)),
+                "name": f"pet{ids[Pet]}",
+                "level": 1 if egg else 1 + min(49, int(rng.expovariate(0.2))),
+                "xp": 0 if egg else rng.randrange(100),
+                "hunger": rng.random(),
+                "happiness": rng.random(),
+                "abilities": "" if egg else ",".join(rng.sample(ABILITIES, rng.randint(1, 3))),
+                "created_at": created_at,
+                "last_update": last_active,
+            })
+            ids[Pet] += 1
+
+        home_objects = [("decor", object_id) for object_id in rng.sample(DECOR_IDS, rng.randint(0, 3))]
+        home_objects += [("temporary", rng.choice(FOOD_IDS)) for _ in range(rng.randint(0, 2))]
+        poops = min(MAX_POOPS, int(rng.lognormvariate(2.0, 1.0)))
+        home_objects += [(POOP_TYPE, rng.choice(POOP_IDS)) for _ in range(poops)]
+        for object_type, object_id in home_objects:
+            x, y = _position(rng)
+            rows[HomeObject].append({
+                "id": ids[HomeObject], "user_data_id": user_id,
+                "type": object_type, "object_id": object_id, "x": x, "y": y,
+            })
+            ids[HomeObject] += 1
+
+        stored = rng.randint(0, len(storable_item_ids))
+        for item_id in rng.sample(storable_item_ids, stored):
+            rows[InventoryItem].append({
+                "id": ids[InventoryItem], "user_data_id": user_id,
+                "item_id": item_id, "quantity": 1 + int(rng.expovariate(0.3)),
+            })
+            ids[InventoryItem] += 1
+    return rows
+
+
+def _insert_saves(conn, batch, totals):
+    # Parents first for the foreign keys
+    for model in SAVE_MODELS:
+        if batch[model]:
+            conn.execute(insert(model.__table__), batch[model])
+            totals[model.__tablename__] += len(batch[model])
+
+
+def seed_users(engine, count, password_hash, prefix=DEFAULT_PREFIX, seed=0, batch_size=2000, progress=None,
+               router=None):
+    """
+    Insert `count` synthetic users and their saves, batch_size users per
+    transaction. password_hash is stored for every user (hash one password
+    with the app's hasher). progress, if given, is called with the number of
+    users written so far after each batch. With a shard router, engine is the
+    directory and each shard gets its saves in a transaction of its own.
+    Returns the number of rows per table.
+    """
+    rng = random.Random(seed)
+    now = now_ms()
+    storable_item_ids = [row["id"] for row in get_catalog().rows if row["can_store"] and row["category"]]
+    totals = {model.__tablename__: 0 for model in (User, *SAVE_MODELS)}
+    ids = _next_ids(engine, [engine] if router is None else [router.engine(shard) for shard in router.placements])
+    written = 0
+    while written < count:
+        batch = generate_batch(rng, ids, min(batch_size, count - written), password_hash, prefix,
+                               storable_item_ids, now)
+        if router is not None:
+            for user in batch[User]:
+                user["shard"] = router.assign(user["username"])
+        with engine.begin() as conn:
+            conn.execute(insert(User.__table__), batch[User])
+            totals[User.__tablename__] += len(batch[User])
+            if router is None:
+                _insert_saves(conn, batch, totals)
+        if router is not None:
+            shards = {user["id"]: user["shard"] for user in batch[User]}
+            shard_batches = {shard: {model: [] for model in SAVE_MODELS} for shard in range(len(router.engines))}
+            for model in SAVE_MODELS:
+                owner = "id" if model is UserData else "user_data_id"
+                for row in batch[model]:
+                    shard_batches[shards[row[owner]]][model].append(row)
+            for shard, shard_batch in shard_batches.items():
+                with router.engine(shard).begin() as conn:
+                    _insert_saves(conn, shard_batch, totals)
+        written += len(batch[User])
+        if progress is not None:
+            progress(written)
+    return totals
@@ -0,0 +1,68 @@
+#!/usr/bin/env python
+"""
+Production launcher for the API.
+
+    python serve.py --workers 4            # uvicorn, one process per worker
+    python serve.py --server werkzeug      # the threaded Werkzeug dev server app.py runs
+
+Each uvicorn worker is a separate process with its own connection pool on the
+shared SQLite file (WAL lets them read concurrently). Per-process background
+state is handled here: the periodic pet simulation runs once, in this launcher,
+rather than in every worker, write-behind buffering is refused because a
+user's requests could land on different workers, and if no AUTH_SECRET is set
+one is generated here and shared so every worker accepts every token.
+Event streams are per process too: each worker keeps its own streamed users'
+pets live, but a stream only hears about the writes its own worker handles,
+so another tab's changes may reach a client only on its next reload.
+"""
+import argparse
+import os
+import secrets
+import sys
+
+SHUTDOWN_GRACE_SECONDS = 5
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the WebPets API.")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=5000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--server", choices=("uvicorn", "werkzeug"), default="uvicorn")
+    args = parser.parse_args()
+
+    if args.server == "werkzeug":
+        from app import app
+        app.run(host=args.host, port=args.port, debug=False, threaded=True)
+        return
+
+    import uvicorn
+    import config
+
+    if args.workers > 1:
+        if config.WRITE_BEHIND:
+            parser.error("WEBPETS_WRITE_BEHIND buffers per process; run it with --workers 1")
+        if not config.AUTH_SECRET:
+            # Every worker must verify the tokens the others issue
+            os.environ["WEBPETS_AUTH_SECRET"] = config.AUTH_SECRET = secrets.token_hex(32)
+        if config.PUSH_ENABLED:
+            print("warning: event streams only carry writes made through the same worker", file=sys.stderr)
+        interval = config.SIMULATION_INTERVAL
+        if interval > 0:
+            # Workers re-read the environment when they import the app; the
+            # launcher's own import must not start a second loop either
+            os.environ["WEBPETS_SIMULATION_INTERVAL"] = "0"
+            config.SIMULATION_INTERVAL = 0
+        # Create the schema and sync the catalog once, before workers race to do it
+        from app import app
+        if interval > 0:
+            from simulation import start_simulation_worker
+            start_simulation_worker(app, interval)
+
+    # Event streams never finish on their own; don't let them hold up a shutdown
+    uvicorn.run("asgi:asgi_app", host=args.host, port=args.port, workers=args.workers, log_level="warning",
+                timeout_graceful_shutdown=SHUTDOWN_GRACE_SECONDS)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,298 @@
+"""
+Horizontal sharding of saves across several SQLite files.
+
+With DB_SHARDS set to a list of database URLs, the main database becomes the
+directory: it keeps the user table, with each user's shard number in
+user.shard, and the item catalog. Saves (user_data and its child tables) live
+in the shard files. Every SQLite file has its own write lock, so writes to
+saves on different shards commit side by side instead of queueing on one file.
+
+db.session routes statements itself (see database.ShardedSession). Statements
+on save tables go to the shard picked with use_shard/route_to_user or, failing
+that, to the shard of the request's authenticated user (g.user_id); everything
+else goes to the directory. A statement joining the user table to a save table
+can't be routed, so read paths query them separately. Users with no shard
+number still have their save in the directory, as before sharding was turned
+on, until a rebalance moves them out.
+
+New users are spread over the shards by a hash of their username. Row ids in
+save tables are only unique within a shard, which is fine since every lookup
+is scoped to the save's owner. Changing the shard list is offline work: stop
+the server, add URLs to DB_SHARDS (shards can't be removed), run
+`flask shards rebalance`, start it again.
+
+Without DB_SHARDS there is no router and every helper here is a no-op.
+"""
+import threading
+import zlib
+from collections import OrderedDict
+from flask import current_app, g, has_request_context
+from sqlalchemy import delete, func, insert, inspect, select, update
+from sqlalchemy.sql.dml import UpdateBase
+from sqlalchemy.sql.util import find_tables
+from database import add_missing_columns, add_missing_indexes, db, shard_bind_key, shard_urls
+from models import User, UserData, Pet, HomeObject, InventoryItem
+
+_users = User.__table__
+_saves = UserData.__table__
+_CHILD_TABLES = (Pet.__table__, HomeObject.__table__, InventoryItem.__table__)
+SAVE_TABLES = (_saves, *_CHILD_TABLES)  # parent first
+_SAVE_TABLE_NAMES = frozenset(table.name for table in SAVE_TABLES)
+
+SHARD_CACHE_SIZE = 100000  # user id -> shard entries kept per process
+
+
+class ShardRouter:
+    def __init__(self, directory, engines):
+        self.directory = directory
+        self.engines = engines  # shard number -> engine
+        self._shards = OrderedDict()  # user id -> shard, LRU
+        self._lock = threading.Lock()
+
+    @property
+    def placements(self):
+        """Everywhere a save can live: None (the directory), then each shard number."""
+        return [None, *range(len(self.engines))]
+
+    def engine(self, shard):
+        return self.directory if shard is None else self.engines[shard]
+
+    def assign(self, username):
+        """Shard for a new user."""
+        return zlib.crc32(username.encode("utf-8")) % len(self.engines)
+
+    def remember(self, user_id, shard):
+        with self._lock:
+            self._shards[user_id] = shard
+            self._shards.move_to_end(user_id)
+            if len(self._shards) > SHARD_CACHE_SIZE:
+                self._shards.popitem(last=False)
+
+    def shard_of(self, user_id):
+        """
+        user_id's shard, from the directory on first use. Shards only change
+        offline, so looked up entries never go stale while the server runs.
+        """
+        with self._lock:
+            if user_id in self._shards:
+                self._shards.move_to_end(user_id)
+                return self._shards[user_id]
+        # Own connection: this runs while the session is choosing one
+        with self.directory.connect() as conn:
+            row = conn.execute(select(_users.c.shard).where(_users.c.id == user_id)).first()
+        if row is None:
+            return None
+        self.remember(user_id, row.shard)
+        return row.shard
+
+    def bind_for(self, session, mapper, clause):
+        """The engine for a statement on save tables, or None for any other statement."""
+        if mapper is not None:
+            names = {inspect(mapper).local_table.name}
+        elif isinstance(clause, UpdateBase):
+            names = {clause.table.name}
+        elif clause is not None:
+            names = {table.name for table in find_tables(clause, include_crud=True)}
+        else:
+            return None
+        if names.isdisjoint(_SAVE_TABLE_NAMES):
+            return None
+        if not names <= _SAVE_TABLE_NAMES:
+            raise RuntimeError(f"Can't route a statement across the directory and save shards: {sorted(names)}")
+        if "shard" in session.info:
+            return self.engine(session.info["shard"])
+        if has_request_context() and "user_id" in g:
+            return self.engine(self.shard_of(g.user_id))
+        raise RuntimeError("Save table used before the session was routed to a shard")
+
+
+def get_router():
+    return current_app.extensions.get('shards')
+
+
+def assign_shard(username):
+    """Shard number for a new user, or None when saves aren't sharded."""
+    router = get_router()
+    return None if router is None else router.assign(username)
+
+
+def use_shard(shard):
+    """Route db.session's save statements to `shard` (None: the directory) for the rest of its life."""
+    if get_router() is not None:
+        db.session.info["shard"] = shard
+
+
+def route_to_user(user_id):
+    """Route db.session's save statements to user_id's shard."""
+    router = get_router()
+    if router is not None:
+        use_shard(router.shard_of(user_id))
+
+
+def each_shard(user_ids=None):
+    """
+    Yield (shard, ids) once per shard, with db.session routed to that shard in
+    the loop body: every placement with ids None, otherwise only the shards
+    holding some of user_ids, with those ids. Without sharding, yields
+    (None, user_ids) once. The session's routing is restored afterwards.
+    """
+    router = get_router()
+    if router is None:
+        yield None, None if user_ids is None else list(user_ids)
+        return
+    if user_ids is None:
+        groups = {shard: None for shard in router.placements}
+    else:
+        groups = {}
+        for user_id in user_ids:
+            groups.setdefault(router.shard_of(user_id), []).append(user_id)
+    info = db.session.info
+    had_shard, previous = "shard" in info, info.get("shard")
+    try:
+        for shard, ids in groups.items():
+            info["shard"] = shard
+            yield shard, ids
+    finally:
+        if had_shard:
+            info["shard"] = previous
+        else:
+            info.pop("shard", None)
+
+
+def init_shards(app):
+    """Create the save tables on every shard and the router; returns it, or None without DB_SHARDS."""
+    urls = shard_urls(app.config)
+    if not urls:
+        return None
+    with app.app_context():
+        engines = [db.engines[shard_bind_key(shard)] for shard in range(len(urls))]
+        for engine in engines:
+            db.metadata.create_all(engine, tables=SAVE_TABLES)
+            add_missing_columns(engine, SAVE_TABLES)
+            add_missing_indexes(engine, SAVE_TABLES)
+        router = ShardRouter(db.engine, engines)
+    app.extensions['shards'] = router
+    return router
+
+
+# ---------------------------
+# Offline rebalancing
+# ---------------------------
+
+def _placed_on(shard):
+    return _users.c.shard.is_(None) if shard is None else _users.c.shard == shard
+
+
+def shard_counts(router):
+    """Users per placement (None: still in the directory), including shards no longer configured."""
+    with router.directory.connect() as conn:
+        counts = dict(conn.execute(select(_users.c.shard, func.count()).group_by(_users.c.shard)).all())
+    return {**{shard: 0 for shard in router.placements}, **counts}
+
+
+def plan_rebalance(router):
+    """
+    Moves that leave every shard with an equal share of users (give or take
+    one) and none in the directory, as [(from, to, [user ids])]. Only as many
+    users as needed move.
+    """
+    counts = shard_counts(router)
+    shard_count = len(router.engines)
+    missing = sorted(shard for shard in counts if shard is not None and shard >= shard_count)
+    if missing:
+        raise ValueError(f"Users are placed on shards {missing}, which DB_SHARDS no longer lists")
+    total = sum(counts.values())
+    targets = [total // shard_count + (1 if shard < total % shard_count else 0) for shard in range(shard_count)]
+    surplus = {None: counts[None], **{shard: max(0, counts[shard] - targets[shard]) for shard in range(shard_count)}}
+    deficits = [max(0, targets[shard] - counts[shard]) for shard in range(shard_count)]
+
+    moves = []
+    with router.directory.connect() as conn:
+        for source, excess in surplus.items():
+            if not excess:
+                continue
+            user_ids = list(conn.scalars(
+                select(_users.c.id).where(_placed_on(source)).order_by(_users.c.id.desc()).limit(excess)
+            ))
+            for target in range(shard_count):
+                taken = min(deficits[target], len(user_ids))
+                if taken:
+                    moves.append((source, target, user_ids[:taken]))
+                    user_ids = user_ids[taken:]
+                    deficits[target] -= taken
+    return moves
+
+
+def _delete_saves(conn, user_ids):
+    # Children before their parent
+    for table in SAVE_TABLES[::-1]:
+        owner = table.c.id if table is _saves else table.c.user_data_id
+        conn.execute(delete(table).where(owner.in_(user_ids)))
+
+
+def move_users(router, source, target, user_ids):
+    """
+    Copy the saves of user_ids from one placement to another, repoint the
+    directory, then delete the originals. A crash part way leaves either an
+    unused copy on the target (replaced when the move is retried) or an
+    unused original on the source (removed by sweep_orphans); the directory
+    always points at a complete save. Child rows get new ids on the target,
+    and the save version is bumped so clients reload rather than patch with
+    the old ids.
+    """
+    with router.engine(source).connect() as conn:
+        saves = [dict(row) for row in conn.execute(select(_saves).where(_saves.c.id.in_(user_ids))).mappings()]
+        children = {
+            table: [
+                {key: value for key, value in row.items() if key != "id"}
+                for row in conn.execute(select(table).where(table.c.user_data_id.in_(user_ids))).mappings()
+            ]
+            for table in _CHILD_TABLES
+        }
+    with router.engine(target).begin() as conn:
+        _delete_saves(conn, user_ids)
+        if saves:
+            conn.execute(insert(_saves), [{**save, "version": save["version"] + 1} for save in saves])
+        for table, rows in children.items():
+            if rows:
+                conn.execute(insert(table), rows)
+    with router.directory.begin() as conn:
+        conn.execute(update(_users).where(_users.c.id.in_(user_ids)).values(shard=target))
+    with router.engine(source).begin() as conn:
+        _delete_saves(conn, user_ids)
+    for user_id in user_ids:
+        router.remember(user_id, target)
+
+
+def sweep_orphans(router, batch_size=500):
+    """Delete saves left on a placement the directory doesn't point to; returns how many."""
+    with router.directory.connect() as conn:
+        shards = dict(conn.execute(select(_users.c.id, _users.c.shard)).all())
+    removed = 0
+    for shard in router.placements:
+        with router.engine(shard).connect() as conn:
+            stored = list(conn.scalars(select(_saves.c.id)))
+        orphans = [user_id for user_id in stored if shards.get(user_id, shard) != shard]
+        for start in range(0, len(orphans), batch_size):
+            with router.engine(shard).begin() as conn:
+                _delete_saves(conn, orphans[start:start + batch_size])
+        removed += len(orphans)
+    return removed
+
+
+def rebalance(router, batch_size=500, progress=None):
+    """
+    Run plan_rebalance's moves batch_size users per transaction, then sweep
+    orphans. Offline only: nothing else may write while it runs. progress, if
+    given, is called with (from, to, users moved so far) after each batch.
+    Returns (users moved, orphaned saves removed).
+    """
+    moved = 0
+    for source, target, user_ids in plan_rebalance(router):
+        for start in range(0, len(user_ids), batch_size):
+            batch = user_ids[start:start + batch_size]
+            move_users(router, source, target, batch)
+            moved += len(batch)
+            if progress is not None:
+                progress(source, target, moved)
+    return moved, sweep_orphans(router, batch_size)
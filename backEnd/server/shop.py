@@ -0,0 +1,154 @@
+"""
+Server-side shop purchases and item use.
+
+Each operation is a few conditional statements in one short transaction, in
+place of the client editing money and inventory locally and PUTting the whole
+save back:
+    purchase   UPDATE user_data SET money = money - cost ... WHERE money >= cost,
+               then add to the user's inventory entry for the item (or create one)
+    use        UPDATE inventory_item SET quantity = quantity - n ... WHERE quantity >= n
+               (the entry is deleted at zero), then optionally apply the item's
+               hunger_restore / happiness_boost to a pet
+Both bump the save version. Because the checks are in the WHERE clauses, two
+tabs spending at once can't overspend or use the same item twice: SQLite runs
+the writes one after the other and the second sees the first's result.
+
+Prices and effects come from the in-process catalog, which is what the item
+table is synced from. Replies carry only the rows that changed, in the shape
+PATCH replies use, so clients merge them the same way.
+"""
+from sqlalchemy import delete, func, insert, select, update
+from catalog import get_catalog
+from database import db
+from models import UserData, Pet, InventoryItem
+from reconcile import bump_version
+from save_reader import INVENTORY_COLUMNS, PET_COLUMNS, inventory_dict, pet_dict
+
+MAX_QUANTITY = 999
+STAT_SCALE = 100.0  # hunger_restore / happiness_boost are percentages of the 0-1 stats
+
+
+class ShopError(Exception):
+    """A shop operation that can't go ahead; the routes answer status with {"error": message, **extra}."""
+
+    def __init__(self, status, message, **extra):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+        self.extra = extra
+
+
+def parse_item_request(data, needs_pet=False):
+    """(item_id, quantity, pet_id) from a request body; raises ShopError(400) if malformed."""
+    data = data if isinstance(data, dict) else {}
+    item_id, quantity, pet_id = data.get("item_id"), data.get("quantity", 1), data.get("pet_id")
+
+    def is_int(value):
+        return isinstance(value, int) and not isinstance(value, bool)
+
+    if not is_int(item_id) or not is_int(quantity) or not 1 <= quantity <= MAX_QUANTITY:
+        raise ShopError(400, "Invalid payload")
+    if (pet_id is not None or needs_pet) and not is_int(pet_id):
+        raise ShopError(400, "Invalid payload")
+    return item_id, quantity, pet_id
+
+
+def _catalog_item(item_id):
+    item = get_catalog().rows_by_id.get(item_id)
+    if item is None:
+        raise ShopError(404, "Item not found")
+    return item
+
+
+def _add_to_inventory(user_id, item_id, quantity):
+    """Add quantity to the user's (first) entry for item_id, creating it if there is none."""
+    table = InventoryItem.__table__
+    entry_id = (
+        select(table.c.id)
+        .where(table.c.user_data_id == user_id, table.c.item_id == item_id)
+        .order_by(table.c.id).limit(1).scalar_subquery()
+    )
+    entry = db.session.execute(
+        update(table).where(table.c.id == entry_id)
+        .values(quantity=func.coalesce(table.c.quantity, 0) + quantity)
+        .returning(*INVENTORY_COLUMNS)
+    ).first()
+    if entry is None:
+        entry = db.session.execute(
+            insert(table).values(user_data_id=user_id, item_id=item_id, quantity=quantity)
+            .returning(*INVENTORY_COLUMNS)
+        ).first()
+    return entry
+
+
+def purchase(user_id, item_id, quantity=1):
+    """Buy quantity of item_id if the user can afford it. The caller commits."""
+    item = _catalog_item(item_id)
+    if item_id not in get_catalog().purchasable:
+        raise ShopError(400, "Item can't be bought")
+    cost = item["price"] * quantity
+
+    saves = UserData.__table__
+    save = db.session.execute(
+        update(saves).where(saves.c.id == user_id, saves.c.money >= cost)
+        .values(money=saves.c.money - cost, version=saves.c.version + 1)
+        .returning(saves.c.money, saves.c.version)
+    ).first()
+    if save is None:
+        current = db.session.execute(select(saves.c.money).where(saves.c.id == user_id)).first()
+        if current is None:
+            raise ShopError(404, "UserData not found")
+        raise ShopError(409, "Not enough money", money=current.money)
+
+    entry = _add_to_inventory(user_id, item_id, quantity)
+    return {"version": save.version, "money": save.money, "inventory": [inventory_dict(entry)]}
+
+
+def use_item(user_id, item_id, quantity=1, pet_id=None, food_only=False):
+    """
+    Take quantity of item_id out of the user's inventory, applying its effects
+    to pet_id if given. With food_only, items that restore no hunger are
+    refused. The caller commits.
+    """
+    item = _catalog_item(item_id)
+    if food_only and not (item["hunger_restore"] or 0) > 0:
+        raise ShopError(400, "Item isn't food")
+
+    table = InventoryItem.__table__
+    entry_id = (
+        select(table.c.id)
+        .where(table.c.user_data_id == user_id, table.c.item_id == item_id, table.c.quantity >= quantity)
+        .order_by(table.c.id).limit(1).scalar_subquery()
+    )
+    entry = db.session.execute(
+        update(table).where(table.c.id == entry_id)
+        .values(quantity=table.c.quantity - quantity)
+        .returning(*INVENTORY_COLUMNS)
+    ).first()
+    if entry is None:
+        raise ShopError(409, "Not enough of that item in the inventory")
+
+    result = {}
+    if entry.quantity <= 0:
+        db.session.execute(delete(table).where(table.c.id == entry.id))
+        result["inventory"] = []
+        result["deleted"] = {"inventory": [entry.id]}
+    else:
+        result["inventory"] = [inventory_dict(entry)]
+
+    if pet_id is not None:
+        pets = Pet.__table__
+        hunger = (item["hunger_restore"] or 0) / STAT_SCALE * quantity
+        happiness = (item["happiness_boost"] or 0) / STAT_SCALE * quantity
+        pet = db.session.execute(
+            update(pets).where(pets.c.id == pet_id, pets.c.user_data_id == user_id)
+            .values(hunger=func.max(0.0, pets.c.hunger - hunger),
+                    happiness=func.min(1.0, pets.c.happiness + happiness))
+            .returning(*PET_COLUMNS)
+        ).first()
+        if pet is None:
+            raise ShopError(404, "Pet not found")
+        result["pets"] = [pet_dict(pet)]
+
+    result["version"] = bump_version(user_id)
+    return result
@@ -0,0 +1,220 @@
+"""
+Server-side pet simulation: hunger/happiness degradation and away-time poops.
+
+Degradation is linear and clamped, so bringing a pet from last_update to now is
+a closed-form expression evaluated by SQLite in one UPDATE for any number of
+pets. Poops are placed on fixed POOP_INTERVAL_MS slots and positioned by a hash
+of (pet id, slot), so re-running a catch-up never spawns different poops.
+
+Rates mirror frontEnd/src/sceneElements/Pet.jsx, which keeps degrading pets
+while a client is open; pets no client has ticked for AWAY_AFTER_MS are
+considered away and are caught up here. Users with an open event stream (see
+push.py) get the changes pushed, and start_live_simulation keeps their pets
+current while they play, so their clients needn't upload the ticks.
+"""
+import threading
+import time
+from sqlalchemy import and_, func, insert, select, update
+from database import db
+from models import UserData, Pet, HomeObject
+from push import publish_changes, watched_users
+from sharding import each_shard
+
+MS_PER_HOUR = 1000 * 60 * 60
+HUNGER_PER_HOUR = 0.1
+HAPPINESS_PER_HOUR = 0.025
+POOP_INTERVAL_MS = 1000 * 60 * 3
+AWAY_AFTER_MS = POOP_INTERVAL_MS
+MAX_POOPS_PER_CATCH_UP = 10  # per pet, so a long absence doesn't bury the yard
+POOP_BOUNDS = {"x": (-8.0, 8.0), "y": (-6.0, 6.0)}  # Pet.jsx default bounds
+POOP_TYPE, POOP_OBJECT_ID = "temporary", 1  # poo_s, see models/home_object.py
+
+_MASK64 = (1 << 64) - 1
+
+
+def now_ms():
+    return int(time.time() * 1000)
+
+
+def _unit_hash(seed):
+    """splitmix64 of seed, scaled to [0, 1)."""
+    z = (seed + 0x9E3779B97F4A7C15) & _MASK64
+    z = ((z ^ (z >> 30)) * 0xBF58476D1CE4E5B9) & _MASK64
+    z = ((z ^ (z >> 27)) * 0x94D049BB133111EB) & _MASK64
+    return (z ^ (z >> 31)) / float(1 << 64)
+
+
+def poop_position(pet_id, slot):
+    """Deterministic (x, y) for the poop a pet drops in a given interval slot."""
+    seed = (pet_id << 32) ^ slot
+    x_min, x_max = POOP_BOUNDS["x"]
+    y_min, y_max = POOP_BOUNDS["y"]
+    return (
+        x_min + (x_max - x_min) * _unit_hash(seed),
+        y_min + (y_max - y_min) * _unit_hash(seed ^ _MASK64),
+    )
+
+
+def _away_pets(now, user_data_ids=None, away_after_ms=AWAY_AFTER_MS):
+    """WHERE clause matching pets (of user_data_ids, if given) no client has ticked for away_after_ms."""
+    table = Pet.__table__
+    due = and_(
+        table.c.user_data_id.isnot(None),
+        table.c.last_update.isnot(None),
+        table.c.last_update <= now - away_after_ms,
+    )
+    if user_data_ids is not None:
+        due = and_(due, table.c.user_data_id.in_(user_data_ids))
+    return due
+
+
+def simulate_pets(now=None, user_data_id=None, batch_size=10000, user_data_ids=None, away_after_ms=AWAY_AFTER_MS):
+    """
+    Bring every away pet (or only the pets of user_data_id or user_data_ids) up
+    to `now` in one pass.
+
+    Executes one SELECT of the due pets, one UPDATE bumping the owners' save
+    versions, batched INSERTs for the poops dropped while away and one UPDATE
+    applying the closed-form stat decay. Eggs degrade but don't poop. Owners
+    with an open event stream cost two more SELECTs, for the events queued on
+    the session. The caller commits. Returns {"pets": caught-up pets, "poops":
+    poops spawned}.
+    """
+    now = now_ms() if now is None else now
+    table = Pet.__table__
+    if user_data_id is not None:
+        user_data_ids = [user_data_id]
+    due = _away_pets(now, user_data_ids, away_after_ms)
+    pets = db.session.execute(
+        select(table.c.id, table.c.user_data_id, table.c.last_update, table.c.evolution_stage).where(due)
+    ).all()
+    if not pets:
+        return {"pets": 0, "poops": 0}
+
+    versions = UserData.__table__
+    db.session.execute(
+        update(versions)
+        .where(versions.c.id.in_(select(table.c.user_data_id).where(due).distinct()))
+        .values(version=versions.c.version + 1)
+    )
+
+    watched = watched_users({owner_id for _, owner_id, _, _ in pets})
+    poops, watched_poops = [], []
+    poop_count = 0
+    for pet_id, owner_id, last_update, evolution_stage in pets:
+        if evolution_stage == 0:
+            continue
+        first_slot = last_update // POOP_INTERVAL_MS + 1
+        last_slot = now // POOP_INTERVAL_MS
+        dropped = watched_poops if owner_id in watched else poops
+        for slot in range(max(first_slot, last_slot - MAX_POOPS_PER_CATCH_UP + 1), last_slot + 1):
+            x, y = poop_position(pet_id, slot)
+            dropped.append({"user_data_id": owner_id, "type": POOP_TYPE, "object_id": POOP_OBJECT_ID, "x": x, "y": y})
+        if len(poops) >= batch_size:
+            db.session.execute(insert(HomeObject.__table__), poops)
+            poop_count += len(poops)
+            poops = []
+    if poops:
+        db.session.execute(insert(HomeObject.__table__), poops)
+        poop_count += len(poops)
+    new_objects = []
+    if watched_poops:
+        objects = HomeObject.__table__
+        new_objects = db.session.execute(insert(objects).returning(*objects.c), watched_poops).mappings().all()
+        poop_count += len(new_objects)
+
+    elapsed_hours = (now - table.c.last_update) / float(MS_PER_HOUR)
+    db.session.execute(
+        update(table).where(due).values(
+            hunger=func.min(1.0, table.c.hunger + HUNGER_PER_HOUR * elapsed_hours),
+            happiness=func.max(0.0, table.c.happiness - HAPPINESS_PER_HOUR * elapsed_hours),
+            last_update=now,
+        )
+    )
+    if watched:
+        _queue_events(watched, [pet_id for pet_id, owner_id, _, _ in pets if owner_id in watched], new_objects)
+    return {"pets": len(pets), "poops": poop_count}
+
+
+def _queue_events(user_ids, pet_ids, new_objects):
+    """Queue the pet stats and poops just written for the owners' event streams."""
+    table, versions = Pet.__table__, UserData.__table__
+    changes = {
+        user_id: {"version": version, "pets": [], "home_objects": []}
+        for user_id, version in db.session.execute(
+            select(versions.c.id, versions.c.version).where(versions.c.id.in_(user_ids))
+        )
+    }
+    stats = db.session.execute(
+        select(table.c.id, table.c.user_data_id, table.c.hunger, table.c.happiness, table.c.last_update)
+        .where(table.c.id.in_(pet_ids))
+    )
+    for pet_id, owner_id, hunger, happiness, last_update in stats:
+        changes[owner_id]["pets"].append(
+            {"id": pet_id, "hunger": hunger, "happiness": happiness, "lastUpdate": last_update}
+        )
+    for row in new_objects:
+        changes[row["user_data_id"]]["home_objects"].append(dict(row))
+    for user_id, change in changes.items():
+        publish_changes(user_id, change)
+
+
+def catch_up_user(user_data_id):
+    """Lazily simulate one user's pets (on login/GET), committing only if any were away."""
+    result = simulate_pets(user_data_id=user_data_id)
+    if result["pets"]:
+        db.session.commit()
+    return result
+
+
+def start_simulation_worker(app, interval_seconds):
+    """Run the bulk catch-up across all pets, shard by shard, every interval_seconds on a daemon thread."""
+    def run():
+        while True:
+            time.sleep(interval_seconds)
+            with app.app_context():
+                try:
+                    # Staged stat ticks are newer than the stored last_update
+                    if 'write_behind' in app.extensions:
+                        app.extensions['write_behind'].flush()
+                    for _ in each_shard():
+                        simulate_pets()
+                    db.session.commit()
+                except Exception:
+                    db.session.rollback()
+                    app.logger.exception("Pet simulation pass failed")
+
+    worker = threading.Thread(target=run, name="pet-simulation", daemon=True)
+    worker.start()
+    return worker
+
+
+def start_live_simulation(app, hub, interval_seconds):
+    """
+    Every interval_seconds on a daemon thread, catch up the pets of users with
+    an open event stream in this process, treating pets as away after one
+    interval rather than AWAY_AFTER_MS. Their streams get the new stats and
+    poops, so the pets stay live without the client uploading ticks.
+    """
+    def run():
+        while True:
+            time.sleep(interval_seconds)
+            user_ids = hub.watched()
+            if not user_ids:
+                continue
+            with app.app_context():
+                try:
+                    write_behind = app.extensions.get('write_behind')
+                    for user_id in user_ids:
+                        if write_behind is not None:
+                            write_behind.flush_user(user_id)
+                    for _, ids in each_shard(user_ids):
+                        simulate_pets(user_data_ids=ids, away_after_ms=int(interval_seconds * 1000))
+                    db.session.commit()
+                except Exception:
+                    db.session.rollback()
+                    app.logger.exception("Live pet simulation pass failed")
+
+    worker = threading.Thread(target=run, name="live-pet-simulation", daemon=True)
+    worker.start()
+    return worker
@@ -0,0 +1,42 @@
+"""
+Backend tests, run from backEnd/server:
+    python -m pytest tests
+
+The app is imported once per session against a throwaway database, as the
+benchmarks do (benchmarks.common.load_app); each test registers its own users.
+"""
+import itertools
+import os
+
+import pytest
+
+os.environ.setdefault("WEBPETS_PASSWORD_SCRYPT_N", "1024")  # hashing isn't what's tested
+os.environ.setdefault("WEBPETS_LOG_LEVEL", "WARNING")
+
+from benchmarks.common import auth_headers, load_app, register_user
+
+_user_numbers = itertools.count()
+
+
+@pytest.fixture(scope="session")
+def app_module():
+    return load_app()
+
+
+@pytest.fixture
+def app(app_module):
+    return app_module.app
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def new_user(client):
+    """Register a fresh user; returns (register response JSON, auth headers, save url)."""
+    def register(prefix="test"):
+        user = register_user(client, f"{prefix}-{next(_user_numbers)}")
+        return user, auth_headers(user), f"/userdata/{user['id']}"
+    return register
@@ -0,0 +1,32 @@
+"""
+Query counts of the save endpoints: fixed, and the same for a small and a
+large save, so an N+1 regression fails the suite. The requests are those of
+benchmarks/query_counts.py, which prints the counts.
+"""
+import pytest
+
+from benchmarks.query_counts import LARGE_SAVE, SMALL_SAVE, measure
+
+# Statements per request. Lower them when a change saves a query; raising one needs a reason.
+BUDGETS = {
+    "POST /login": 10,  # includes a catch-up of the pets' time away
+    "GET /userdata": 6,
+    "GET /userdata (cached)": 2,
+    "PUT /userdata": 11,
+    "PATCH /userdata": 9,
+}
+
+
+@pytest.fixture(scope="module")
+def counts(app_module):
+    with app_module.app.app_context():
+        engine = app_module.db.engine
+    client = app_module.app.test_client()
+    return measure(client, engine, SMALL_SAVE), measure(client, engine, LARGE_SAVE)
+
+
+@pytest.mark.parametrize("endpoint", BUDGETS)
+def test_query_budget(counts, endpoint):
+    small, large = counts
+    assert small[endpoint] == large[endpoint], "statement count grows with the save"
+    assert large[endpoint] <= BUDGETS[endpoint]
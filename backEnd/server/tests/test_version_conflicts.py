@@ -0,0 +1,70 @@
+"""
+Optimistic concurrency: writers racing on one save never lose an update.
+
+Threads read the save, add 1 to its money and write it back with the version
+they read (by PUT or by PATCH), rereading and retrying on 409, as
+benchmarks/version_conflicts.py does under load.
+"""
+import threading
+
+THREADS = 8
+WRITES = 5
+
+
+def read_save(client, url, headers):
+    got = client.get(url, headers=headers).get_json()
+    return {"id": got["id"], "username": got["username"], **got["data"]}
+
+
+def increment(app, url, headers, mode, accepted, statuses):
+    client = app.test_client()
+    save = read_save(client, url, headers)
+    done = 0
+    while done < WRITES:
+        if mode == "patch":
+            response = client.patch(url, json={"base_version": save["version"], "money": save["money"] + 1},
+                                    headers=headers)
+        else:
+            response = client.put(url, json={**save, "money": save["money"] + 1}, headers=headers)
+        statuses.append(response.status_code)
+        if response.status_code == 200:
+            done += 1
+            accepted.append(response.get_json()["version"])
+        save = read_save(client, url, headers)
+
+
+def race(app, url, headers, modes):
+    accepted, statuses = [], []
+    threads = [threading.Thread(target=increment, args=(app, url, headers, mode, accepted, statuses))
+               for mode in modes]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return accepted, statuses
+
+
+def test_racing_writers_lose_no_updates(app, client, new_user):
+    user, headers, url = new_user("race")
+    start = client.put(url, json={"version": user["data"]["version"], "money": 0}, headers=headers).get_json()
+
+    modes = ["put", "patch"] * (THREADS // 2)
+    accepted, statuses = race(app, url, headers, modes)
+
+    assert set(statuses) <= {200, 409}
+    assert len(accepted) == THREADS * WRITES
+    # Exactly one winner per version, and every accepted write is in the money
+    assert sorted(accepted) == list(range(start["version"] + 1, start["version"] + 1 + len(accepted)))
+    final = read_save(client, url, headers)
+    assert final["money"] == len(accepted)
+    assert final["version"] == start["version"] + len(accepted)
+
+
+def test_forced_put_skips_the_version_check(client, new_user):
+    user, headers, url = new_user("force")
+    stale = user["data"]["version"]
+    assert client.put(url, json={"version": stale, "money": 1}, headers=headers).status_code == 200
+    assert client.put(url, json={"version": stale, "money": 2}, headers=headers).status_code == 409
+    assert client.put(url, json={"money": 3}, headers=headers).status_code == 428
+    assert client.put(url, json={"money": 3, "force": True}, headers=headers).status_code == 200
+    assert read_save(client, url, headers)["money"] == 3
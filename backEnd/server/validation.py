@@ -0,0 +1,38 @@
+"""
+Type checks for the fields of JSON payloads.
+
+Each check takes a decoded value and returns True if it's acceptable. JSON
+tells booleans from numbers, so unlike isinstance(value, int) these never
+accept True/False as an integer.
+"""
+
+
+def is_int(value):
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def is_number(value):
+    return is_int(value) or isinstance(value, float)
+
+
+def is_bool(value):
+    return isinstance(value, bool)
+
+
+def is_string(value):
+    return isinstance(value, str)
+
+
+def optional(check):
+    """check, or null."""
+    return lambda value: value is None or check(value)
+
+
+def either(*checks):
+    return lambda value: any(check(value) for check in checks)
+
+
+def list_of(check, length=None):
+    """A list whose items all pass check, of exactly `length` items if given."""
+    return lambda value: (isinstance(value, list) and (length is None or len(value) == length)
+                          and all(check(item) for item in value))
@@ -0,0 +1,230 @@
+"""
+Opt-in write-behind buffer for high-frequency pet stat ticks.
+
+PATCHes that only touch pet hunger/happiness/lastUpdate are staged in memory
+per user and answered straight away; a background flusher commits everything
+staged in one transaction every WRITE_BEHIND_INTERVAL seconds, or as soon as
+WRITE_BEHIND_MAX_DIRTY pet rows are waiting. A crash loses at most one interval
+of ticks, and the buffer is flushed on shutdown.
+
+Staged ticks advance the save version in memory, so patches chain exactly as
+they would against the database. Any other read or write of a user's save must
+call flush_user first so it sees (and versions on top of) the staged ticks.
+Ticks being written stay visible as "in flight" until their transaction
+commits (or fails and they're restaged), so a patch arriving mid-flush versions
+on top of them rather than on the older stored version. The buffer is per
+process: with several workers a user's requests must reach the same one, or
+write-behind should stay off.
+"""
+import atexit
+import threading
+from sqlalchemy import bindparam, func, update
+from database import db
+from models import UserData, Pet
+from sharding import each_shard
+
+# Pet fields a buffered patch may carry: payload key -> column
+HOT_PET_FIELDS = {"hunger": "hunger", "happiness": "happiness", "lastUpdate": "last_update"}
+
+
+def is_hot_stat_patch(data):
+    """True for a PATCH body that only changes existing pets' hot stats."""
+    if set(data) - {"base_version", "pets"} or not data.get("pets"):
+        return False
+    for pet in data["pets"]:
+        if not isinstance(pet, dict) or not isinstance(pet.get("id"), int):
+            return False
+        fields = set(pet) - {"id"}
+        if not fields or fields - HOT_PET_FIELDS.keys():
+            return False
+    return True
+
+
+class _PendingSave:
+    __slots__ = ("version", "pets")
+
+    def __init__(self, version):
+        self.version = version
+        self.pets = {}  # pet id -> {column: value}
+
+
+class WriteBehindBuffer:
+    def __init__(self, app, interval, max_dirty):
+        self.app = app
+        self.interval = interval
+        self.max_dirty = max_dirty
+        self._pending = {}  # user id -> _PendingSave
+        self._in_flight = {}  # user id -> _PendingSave being written, until its commit
+        self._dirty_rows = 0
+        self._lock = threading.Lock()
+        self._wake = threading.Condition(self._lock)
+        self._landed = threading.Condition(self._lock)  # notified when in-flight ticks commit or are restaged
+        self._stopping = False
+        self._thread = None
+        self.stats = {"staged": 0, "flushes": 0, "flushed_rows": 0}
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="write-behind", daemon=True)
+        self._thread.start()
+        atexit.register(self.stop)
+
+    def stop(self):
+        """Stop the flusher and write out everything still staged."""
+        with self._lock:
+            self._stopping = True
+            self._wake.notify()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.flush()
+
+    def _latest(self, user_id):
+        # Staged ticks are newer than any being written
+        return self._pending.get(user_id) or self._in_flight.get(user_id)
+
+    def pending_version(self, user_id):
+        """Version of the user's save including staged and in-flight ticks, or None if there are none."""
+        with self._lock:
+            pending = self._latest(user_id)
+            return pending.version if pending else None
+
+    def stage(self, user_id, base_version, stored_version, pets):
+        """
+        Stage a hot-stat patch. stored_version is the save's version in the
+        database, used when nothing is staged yet. Returns the new version, or
+        None if base_version is stale.
+        """
+        with self._lock:
+            latest = self._latest(user_id)
+            current = latest.version if latest else stored_version
+            if base_version != current:
+                return None
+            pending = self._pending.get(user_id)
+            if pending is None:
+                pending = self._pending[user_id] = _PendingSave(current)
+            for pet in pets:
+                staged = pending.pets.get(pet["id"])
+                if staged is None:
+                    staged = pending.pets[pet["id"]] = {}
+                    self._dirty_rows += 1
+                for key, column in HOT_PET_FIELDS.items():
+                    if key in pet:
+                        staged[column] = pet[key]
+            pending.version += 1
+            self.stats["staged"] += 1
+            if self._dirty_rows >= self.max_dirty:
+                self._wake.notify()
+            return pending.version
+
+    def flush_user(self, user_id):
+        """
+        Commit one user's staged ticks now, after any write of theirs already in
+        flight, before their save is read or written otherwise.
+        """
+        with self._lock:
+            while user_id in self._in_flight:
+                self._landed.wait()
+            pending = self._pending.pop(user_id, None)
+            if pending:
+                self._dirty_rows -= len(pending.pets)
+                self._in_flight[user_id] = pending
+        if pending:
+            self._write({user_id: pending})
+
+    def flush(self):
+        """Commit everything staged in one transaction."""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            self._dirty_rows = 0
+            self._in_flight.update(pending)
+        if pending:
+            with self.app.app_context():
+                self._write(pending)
+
+    def _landed_writes(self, pending):
+        """Stop showing a write's ticks as in flight; called with the lock held."""
+        for user_id, save in pending.items():
+            if self._in_flight.get(user_id) is save:
+                del self._in_flight[user_id]
+        self._landed.notify_all()
+
+    def _run(self):
+        while True:
+            with self._lock:
+                if not self._stopping and self._dirty_rows < self.max_dirty:
+                    self._wake.wait(self.interval)
+                if self._stopping:
+                    return
+            try:
+                self.flush()
+            except Exception:
+                self.app.logger.exception("Write-behind flush failed")
+
+    def _write(self, pending):
+        pets = Pet.__table__
+        saves = UserData.__table__
+        flushed_rows = 0
+        try:
+            # One pair of statements per shard the staged users' saves are on
+            for _, user_ids in each_shard(pending):
+                pet_rows = [
+                    {
+                        "b_id": pet_id,
+                        "b_user": user_id,
+                        **{f"b_{column}": staged.get(column) for column in HOT_PET_FIELDS.values()},
+                    }
+                    for user_id in user_ids
+                    for pet_id, staged in pending[user_id].pets.items()
+                ]
+                version_rows = [{"b_user": user_id, "b_version": pending[user_id].version} for user_id in user_ids]
+                # Stats missing from every staged tick of a pet keep their stored value
+                db.session.execute(
+                    update(pets)
+                    .where(pets.c.id == bindparam("b_id"), pets.c.user_data_id == bindparam("b_user"))
+                    .values({
+                        column: func.coalesce(bindparam(f"b_{column}"), pets.c[column])
+                        for column in HOT_PET_FIELDS.values()
+                    }),
+                    pet_rows,
+                )
+                db.session.execute(
+                    update(saves)
+                    .where(saves.c.id == bindparam("b_user"), saves.c.version < bindparam("b_version"))
+                    .values(version=bindparam("b_version")),
+                    version_rows,
+                )
+                flushed_rows += len(pet_rows)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            self._restage(pending)
+            raise
+        with self._lock:
+            self._landed_writes(pending)
+        self.stats["flushes"] += 1
+        self.stats["flushed_rows"] += flushed_rows
+
+    def _restage(self, pending):
+        """Put ticks from a failed flush back, under anything staged since."""
+        with self._lock:
+            self._landed_writes(pending)
+            for user_id, save in pending.items():
+                current = self._pending.get(user_id)
+                if current is None:
+                    self._pending[user_id] = save
+                    self._dirty_rows += len(save.pets)
+                    continue
+                for pet_id, staged in save.pets.items():
+                    if pet_id not in current.pets:
+                        self._dirty_rows += 1
+                    current.pets[pet_id] = {**staged, **current.pets.get(pet_id, {})}
+
+
+def init_write_behind(app):
+    """Start the write-behind buffer if WRITE_BEHIND is enabled; returns it or None."""
+    if not app.config['WRITE_BEHIND']:
+        return None
+    buffer = WriteBehindBuffer(app, app.config['WRITE_BEHIND_INTERVAL'], app.config['WRITE_BEHIND_MAX_DIRTY'])
+    buffer.start()
+    app.extensions['write_behind'] = buffer
+    return buffer
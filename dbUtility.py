@@ -1,17 +1,38 @@
 #!/usr/bin/env python
+"""
+DB utility for the server's SQLite database.
+
+    python dbUtility.py                                   # interactive menu (view / wipe)
+    python dbUtility.py view --table pet --limit 20 --offset 100
+    python dbUtility.py count [--table pet]
+    python dbUtility.py export backup/ [--format ndjson|csv] [--tables pet user]
+    python dbUtility.py import backup/ [--replace]
+
+Every command streams rows in --batch-size chunks, so memory stays flat however
+big the tables are. Exports write one <table>.<format>.gz per table plus the
+schema (schema.sql); import creates any missing tables from it and inserts each
+batch with a single executemany. BLOB values (archived saves) are written as
+"base64:<data>" strings in both formats and decoded again on import.
+"""
+import argparse
+import base64
+import csv
+import gzip
+import json
 import os
-from sqlalchemy import create_engine, inspect
-from sqlalchemy.orm import sessionmaker
-from sqlalchemy.ext.declarative import declarative_base
+import sys
+import time
+from sqlalchemy import LargeBinary, MetaData, create_engine, inspect
 from sqlalchemy import text
 
 # Configuration
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 DATABASE_FILENAME = os.path.join(BASE_DIR, "backEnd", "server", "instance", "data.db")
 DATABASE_URL = f"sqlite:///{DATABASE_FILENAME}"
-
-# SQLAlchemy base (not used for reflection, but may be useful)
-Base = declarative_base()
+BATCH_SIZE = 10000
+SCHEMA_FILENAME = "schema.sql"
+CSV_NULL = "\\N"  # CSV has no NULL; written and read back as this marker
+BLOB_PREFIX = "base64:"  # neither format has bytes; BLOBs are written as this plus their base64
 
 def view_db():
     """View contents of all tables in the DB."""
@@ -38,13 +59,13 @@ def view_db():
             col_names = [col["name"] for col in columns]
             print("Columns:", col_names)
 
-            # Query all rows from the table
-            result = conn.execute(text(f"SELECT * FROM {table}"))
-            rows = result.fetchall()
-            if rows:
-                for row in rows:
-                    print(row)
-            else:
+            # Stream the rows rather than loading the whole table
+            result = conn.execution_options(yield_per=BATCH_SIZE).execute(text(f"SELECT * FROM {table}"))
+            empty = True
+            for row in result:
+                print(row)
+                empty = False
+            if empty:
                 print("No data in this table.")
 
 def wipe_db():
@@ -59,7 +80,175 @@ def wipe_db():
     else:
         print("DB file not found.")
 
-def main():
+def open_db(path, must_exist=True):
+    """Engine and reflected metadata for the database at path."""
+    if must_exist and not os.path.exists(path):
+        sys.exit(f"DB file not found: {path}")
+    engine = create_engine(f"sqlite:///{path}")
+    metadata = MetaData()
+    metadata.reflect(engine)
+    return engine, metadata
+
+def pick_tables(metadata, names):
+    """Tables named on the command line (all of them by default), parents before children."""
+    if not names:
+        return list(metadata.sorted_tables)
+    unknown = set(names) - set(metadata.tables)
+    if unknown:
+        sys.exit(f"Unknown table(s): {', '.join(sorted(unknown))}")
+    return [table for table in metadata.sorted_tables if table.name in names]
+
+def quoted(conn, name):
+    return conn.dialect.identifier_preparer.quote(name)
+
+def stream_rows(conn, table, batch_size, limit=-1, offset=0):
+    """
+    Yield lists of raw row tuples, batch_size at a time, from a streaming cursor.
+    Plain SQL rather than select(table) so values come back exactly as SQLite
+    stores them (0/1, not reflected booleans) and round-trip through CSV.
+    """
+    order = ", ".join(quoted(conn, column.name) for column in table.primary_key.columns) or "rowid"
+    result = conn.execution_options(stream_results=True, yield_per=batch_size).exec_driver_sql(
+        f"SELECT * FROM {quoted(conn, table.name)} ORDER BY {order} LIMIT ? OFFSET ?", (limit, offset)
+    )
+    for partition in result.partitions():
+        yield partition
+
+def view_command(args):
+    engine, metadata = open_db(args.db)
+    table = pick_tables(metadata, [args.table])[0]
+    print(" | ".join(table.columns.keys()))
+    shown = 0
+    with engine.connect() as conn:
+        for batch in stream_rows(conn, table, args.batch_size, args.limit, args.offset):
+            for row in batch:
+                print(" | ".join("NULL" if value is None else str(value) for value in row))
+            shown += len(batch)
+    print(f"({shown} rows from offset {args.offset})")
+
+def count_command(args):
+    engine, metadata = open_db(args.db)
+    with engine.connect() as conn:
+        for table in pick_tables(metadata, [args.table] if args.table else None):
+            print(f"{table.name}: {conn.exec_driver_sql(f'SELECT count(*) FROM {quoted(conn, table.name)}').scalar()}")
+
+def export_value(value):
+    return BLOB_PREFIX + base64.b64encode(value).decode("ascii") if isinstance(value, bytes) else value
+
+def import_value(value):
+    return base64.b64decode(value[len(BLOB_PREFIX):]) if isinstance(value, str) and value.startswith(BLOB_PREFIX) else value
+
+def export_path(directory, table_name, fmt, compress):
+    return os.path.join(directory, f"{table_name}.{fmt}" + (".gz" if compress else ""))
+
+def open_text(path, mode):
+    if path.endswith(".gz"):
+        return gzip.open(path, mode + "t", encoding="utf-8", newline="", compresslevel=6)
+    return open(path, mode, encoding="utf-8", newline="")
+
+def export_command(args):
+    engine, metadata = open_db(args.db)
+    os.makedirs(args.out, exist_ok=True)
+    tables = pick_tables(metadata, args.tables)
+    with engine.connect() as conn:
+        # The schema travels with the data so import can recreate missing tables
+        schema = conn.execute(text(
+            "SELECT sql FROM sqlite_master WHERE sql IS NOT NULL AND name NOT LIKE 'sqlite_%' "
+            "ORDER BY CASE type WHEN 'table' THEN 0 ELSE 1 END, name"
+        )).scalars()
+        with open(os.path.join(args.out, SCHEMA_FILENAME), "w", encoding="utf-8") as f:
+            f.write(";\n".join(schema) + ";\n")
+
+        for table in tables:
+            start = time.perf_counter()
+            path = export_path(args.out, table.name, args.format, not args.no_compress)
+            columns = table.columns.keys()
+            rows = 0
+            with open_text(path, "w") as f:
+                if args.format == "csv":
+                    writer = csv.writer(f)
+                    writer.writerow(columns)
+                for batch in stream_rows(conn, table, args.batch_size):
+                    if args.format == "csv":
+                        writer.writerows([CSV_NULL if value is None else export_value(value) for value in row]
+                                         for row in batch)
+                    else:
+                        f.writelines(json.dumps(dict(zip(columns, map(export_value, row))), separators=(",", ":")) + "\n"
+                                     for row in batch)
+                    rows += len(batch)
+            print(f"{table.name}: {rows} rows -> {path} ({time.perf_counter() - start:.1f}s)")
+
+def read_batches(path, fmt, columns, batch_size, blob_columns=()):
+    """
+    Yield lists of row tuples (in columns order) from an export file,
+    batch_size at a time, decoding the values of blob_columns back to bytes.
+    """
+    with open_text(path, "r") as f:
+        if fmt == "csv":
+            reader = csv.reader(f)
+            header = next(reader)
+            records = (
+                {name: None if value == CSV_NULL else value for name, value in zip(header, row)}
+                for row in reader
+            )
+        else:
+            records = (json.loads(line) for line in f if line.strip())
+        batch = []
+        for record in records:
+            batch.append(tuple(import_value(record.get(name)) if name in blob_columns else record.get(name)
+                               for name in columns))
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+def find_export(directory, table_name):
+    for fmt in ("ndjson", "csv"):
+        for suffix in (".gz", ""):
+            path = os.path.join(directory, f"{table_name}.{fmt}{suffix}")
+            if os.path.exists(path):
+                return path, fmt
+    return None, None
+
+def import_command(args):
+    engine, metadata = open_db(args.db, must_exist=False)
+    schema_path = os.path.join(args.src, SCHEMA_FILENAME)
+    if os.path.exists(schema_path):
+        with open(schema_path, encoding="utf-8") as f:
+            statements = [statement.strip() for statement in f.read().split(";\n") if statement.strip()]
+        with engine.begin() as conn:
+            for statement in statements:
+                # Only what's missing: CREATE TABLE/INDEX x -> CREATE TABLE/INDEX IF NOT EXISTS x
+                words = statement.split(None, 2)
+                if len(words) == 3 and words[0].upper() == "CREATE" and "IF NOT EXISTS" not in statement.upper():
+                    kind, rest = words[1], words[2]
+                    if kind.upper() == "UNIQUE":
+                        kind, rest = "UNIQUE " + rest.split(None, 1)[0], rest.split(None, 1)[1]
+                    statement = f"CREATE {kind} IF NOT EXISTS {rest}"
+                conn.exec_driver_sql(statement)
+        metadata = MetaData()
+        metadata.reflect(engine)
+
+    tables = [table for table in pick_tables(metadata, args.tables) if find_export(args.src, table.name)[0]]
+    with engine.begin() as conn:
+        if args.replace:
+            for table in reversed(tables):
+                conn.exec_driver_sql(f"DELETE FROM {quoted(conn, table.name)}")
+        for table in tables:
+            start = time.perf_counter()
+            path, fmt = find_export(args.src, table.name)
+            columns = table.columns.keys()
+            insert = (f"INSERT INTO {quoted(conn, table.name)} ({', '.join(quoted(conn, name) for name in columns)}) "
+                      f"VALUES ({', '.join('?' * len(columns))})")
+            rows = 0
+            blob_columns = {column.name for column in table.columns if isinstance(column.type, LargeBinary)}
+            for batch in read_batches(path, fmt, columns, args.batch_size, blob_columns):
+                conn.exec_driver_sql(insert, batch)  # one executemany per batch
+                rows += len(batch)
+            print(f"{table.name}: {rows} rows <- {path} ({time.perf_counter() - start:.1f}s)")
+
+def interactive():
     while True:
         print("\n--- DB Utility ---")
         print("Options:")
@@ -78,5 +267,37 @@ def main():
         else:
             print("Invalid choice. Please try again.")
 
+def main():
+    parser = argparse.ArgumentParser(description="DB utility. Run without a command for the interactive menu.")
+    parser.add_argument("--db", default=DATABASE_FILENAME, help="SQLite file (default: the server's instance/data.db)")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help=f"Rows per batch (default: {BATCH_SIZE})")
+    commands = parser.add_subparsers(dest="command")
+
+    view = commands.add_parser("view", help="Page through one table")
+    view.add_argument("--table", required=True)
+    view.add_argument("--limit", type=int, default=50)
+    view.add_argument("--offset", type=int, default=0)
+
+    count = commands.add_parser("count", help="Row counts for every table, or one")
+    count.add_argument("--table")
+
+    export = commands.add_parser("export", help="Dump tables to compressed NDJSON or CSV files")
+    export.add_argument("out", help="Output directory")
+    export.add_argument("--tables", nargs="+", help="Only these tables (default: all)")
+    export.add_argument("--format", choices=("ndjson", "csv"), default="ndjson")
+    export.add_argument("--no-compress", action="store_true", help="Write plain files instead of .gz")
+
+    restore = commands.add_parser("import", help="Load tables from an export directory")
+    restore.add_argument("src", help="Directory written by export")
+    restore.add_argument("--tables", nargs="+", help="Only these tables (default: every exported one)")
+    restore.add_argument("--replace", action="store_true", help="Delete the tables' existing rows first")
+
+    args = parser.parse_args()
+    handlers = {"view": view_command, "count": count_command, "export": export_command, "import": import_command}
+    if args.command:
+        handlers[args.command](args)
+    else:
+        interactive()
+
 if __name__ == "__main__":
     main()
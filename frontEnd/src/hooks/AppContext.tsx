@@ -46,29 +46,285 @@ export interface UserData {
   username: string;
   completed_tutorial: boolean;
   money: number;
+  version: number; // bumped by the server on every write to the save
   pets: Pet[];
   home_objects: HomeObject[];
   inventory: InventoryItem[];
 }
 
+type RowKey = "pets" | "home_objects" | "inventory";
+const ROW_KEYS: RowKey[] = ["pets", "home_objects", "inventory"];
+
+// Only the parts of a save that changed. Rows with an id are updated, rows without one are created.
+export interface UserDataPatch {
+  completed_tutorial?: boolean;
+  money?: number;
+  pets?: Partial<Pet>[];
+  home_objects?: Partial<HomeObject>[];
+  inventory?: Partial<InventoryItem>[];
+  deleted?: Partial<Record<RowKey, number[]>>;
+}
+
+// Which home objects a batch delete removes; every given criterion must match
+export interface HomeObjectSelection {
+  ids?: number[];
+  type?: string;
+  object_id?: number | number[];
+  rect?: [number, number, number, number]; // x_min, y_min, x_max, y_max
+  circle?: [number, number, number]; // x, y, radius
+}
+
+// Apply server rows (matched by id) and deletions to a local row list
+function mergeRows<T extends { id: number }>(rows: T[], changed: Partial<T>[] = [], deletedIds: number[] = []): T[] {
+  const byId = new Map(changed.filter(row => row.id !== undefined).map(row => [row.id, row]));
+  const merged = rows
+    .filter(row => !deletedIds.includes(row.id))
+    .map(row => (byId.has(row.id) ? { ...row, ...byId.get(row.id) } : row));
+  const known = new Set(rows.map(row => row.id));
+  byId.forEach((row, id) => {
+    if (!known.has(id as number) && !deletedIds.includes(id as number)) merged.push(row as T);
+  });
+  return merged;
+}
+
+// Apply a patch (or a server reply of changed rows) to a save
+function applyPatch(current: UserData, changes: UserDataPatch): UserData {
+  const next = { ...current };
+  if (changes.completed_tutorial !== undefined) next.completed_tutorial = changes.completed_tutorial;
+  if (changes.money !== undefined) next.money = changes.money;
+  ROW_KEYS.forEach((key) => {
+    const rows = current[key] as { id: number }[];
+    next[key] = mergeRows(rows, (changes[key] || []) as { id: number }[], changes.deleted?.[key]) as any;
+  });
+  return next;
+}
+
+// Re-apply a full-save update on top of a newer save: its fields and rows win, rows without an id are added
+function rebase(current: UserData, changes: Partial<UserData>): UserData {
+  const next = { ...current };
+  if (changes.completed_tutorial !== undefined) next.completed_tutorial = changes.completed_tutorial;
+  if (changes.money !== undefined) next.money = changes.money;
+  ROW_KEYS.forEach((key) => {
+    const rows = changes[key] as { id?: number }[] | undefined;
+    if (!rows) return;
+    const created = rows.filter((row) => row.id === undefined);
+    next[key] = [...mergeRows(current[key] as { id: number }[], rows as { id: number }[]), ...created] as any;
+  });
+  return next;
+}
+
+// Compact save encoding (see backEnd/server/save_codec.py): each row list as parallel arrays
+export const SAVE_MEDIA_TYPE = "application/vnd.webpets.columns+json";
+
+type Columns = Record<string, unknown[]>;
+
+function toColumns(key: RowKey, rows: Record<string, any>[]): Columns {
+  const flat = rows.map(({ evolution_id, abilities, ...rest }) => {
+    const row: Record<string, any> = rest;
+    delete row.user_data_id; // the save's id
+    if (key === "inventory") delete row.item; // the catalog entry
+    if (evolution_id !== undefined) [row.evolution_stage, row.evolution_line] = evolution_id;
+    if (abilities !== undefined) row.abilities = Array.isArray(abilities) ? abilities.join(",") : abilities;
+    return row;
+  });
+  const fields = Array.from(new Set(flat.flatMap((row) => Object.keys(row))));
+  return Object.fromEntries(fields.map((field) => [field, flat.map((row) => row[field] ?? null)]));
+}
+
+function fromColumns(key: RowKey, columns: Columns, saveId: number | undefined, catalog: Map<number, unknown>) {
+  const fields = Object.keys(columns);
+  const count = fields.length ? columns[fields[0]].length : 0;
+  return Array.from({ length: count }, (_, i) => {
+    const row: Record<string, any> = {};
+    fields.forEach((field) => {
+      if (columns[field][i] !== null) row[field] = columns[field][i];
+    });
+    if (saveId !== undefined) row.user_data_id = saveId;
+    if (key === "pets") {
+      if ("evolution_stage" in row) {
+        row.evolution_id = [row.evolution_stage, row.evolution_line];
+        delete row.evolution_stage;
+        delete row.evolution_line;
+      }
+      if (typeof row.abilities === "string") row.abilities = row.abilities ? row.abilities.split(",") : [];
+    }
+    if (key === "inventory") row.item = catalog.get(row.item_id);
+    return row;
+  });
+}
+
+// Columnar saves leave out the catalog entries, which /items serves (cached by ETag)
+let itemCatalog: Promise<Map<number, unknown>> | null = null;
+function loadItemCatalog(): Promise<Map<number, unknown>> {
+  if (!itemCatalog) {
+    const currentHost = window.location.hostname;
+    itemCatalog = fetch(`http://${currentHost}:5000/items`)
+      .then((res) => res.json())
+      .then((items: { id: number }[]) => new Map(items.map((item) => [item.id, item] as [number, unknown])))
+      .catch((err) => {
+        itemCatalog = null;
+        throw err;
+      });
+  }
+  return itemCatalog;
+}
+
+// The JSON of a save response, with columnar row lists (top level or under "data") turned back into rows
+export async function readSaveResponse(res: Response): Promise<any> {
+  const payload = await res.json();
+  if (!(res.headers.get("Content-Type") || "").startsWith(SAVE_MEDIA_TYPE)) return payload;
+  const catalog = await loadItemCatalog();
+  const decode = (part: any, saveId: number | undefined) => {
+    if (!part || typeof part !== "object") return part;
+    const rows: Record<string, any> = {};
+    ROW_KEYS.forEach((key) => {
+      if (part[key] && !Array.isArray(part[key])) rows[key] = fromColumns(key, part[key], saveId, catalog);
+    });
+    return { ...part, ...rows };
+  };
+  const saveId = payload.id ?? useAppStore.getState().userData?.id;
+  const decoded = decode(payload, saveId);
+  if (payload.data) decoded.data = decode(payload.data, saveId);
+  return decoded;
+}
+
+// Replace the local save with the server's full snapshot
+async function reloadUserData(): Promise<void> {
+  const userData = useAppStore.getState().userData;
+  if (!userData) return;
+  const currentHost = window.location.hostname;
+  const res = await fetch(`http://${currentHost}:5000/userdata/${userData.id}`, { headers: authHeaders() });
+  if (!res.ok) return;
+  const fresh = await readSaveResponse(res);
+  useAppStore.setState({ userData: { id: fresh.id, username: fresh.username, ...fresh.data } });
+}
+
+// Patches are sent one at a time so each carries the version returned by the previous one
+let patchChain: Promise<void> = Promise.resolve();
+// Full-save writes that lose a version race are rebased and sent again this many times
+const PUT_RETRIES = 3;
+
+// Purchases and item use run on the server, queued behind pending patches; the reply holds only the changed rows
+function postItemOperation(operation: "purchase" | "use" | "feed", body: object): Promise<boolean> {
+  const run = async (): Promise<boolean> => {
+    const userData = useAppStore.getState().userData;
+    if (!userData) return false;
+    const currentHost = window.location.hostname;
+    const res = await fetch(`http://${currentHost}:5000/userdata/${userData.id}/${operation}`, {
+      method: "POST",
+      headers: authHeaders(),
+      body: JSON.stringify(body),
+    });
+    const result = await res.json();
+    const current = useAppStore.getState().userData;
+    if (!res.ok) {
+      if (VERBOSE_DEBUG) console.log(`❌ ${operation} refused:`, result);
+      // A refused purchase reports the real balance
+      if (current && result.money !== undefined) useAppStore.setState({ userData: { ...current, money: result.money } });
+      return false;
+    }
+    if (VERBOSE_DEBUG) console.log(`✅ ${operation}:`, result);
+    if (current) useAppStore.setState({ userData: { ...applyPatch(current, result), version: result.version } });
+    return true;
+  };
+  const done = patchChain.then(run).catch((err) => {
+    console.error(`Error in ${operation}:`, err);
+    return false;
+  });
+  patchChain = done.then(() => undefined);
+  return done;
+}
+
+// Server-sent save changes (see backEnd/server/push.py); one stream per logged-in tab
+let eventSource: EventSource | null = null;
+
+// Apply a pushed event unless the local save is already newer
+function applyEvent(kind: RowKey | "money", data: any) {
+  const current = useAppStore.getState().userData;
+  if (!current || data.version < current.version) return;
+  const changes: UserDataPatch = kind === "money"
+    ? { money: data.money }
+    : { [kind]: data[kind], deleted: { [kind]: data.deleted || [] } };
+  useAppStore.setState({ userData: { ...applyPatch(current, changes), version: data.version } });
+}
+
+function openEventStream(userId: number, token: string) {
+  eventSource?.close();
+  const currentHost = window.location.hostname;
+  // EventSource can't send an Authorization header, so the token goes in the query
+  const source = new EventSource(`http://${currentHost}:5000/userdata/${userId}/events?token=${encodeURIComponent(token)}`);
+  let connectedBefore = false;
+  source.addEventListener("ready", () => {
+    if (VERBOSE_DEBUG) console.log("📡 Event stream open");
+    // Changes made while reconnecting weren't pushed
+    if (connectedBefore) patchChain = patchChain.then(reloadUserData).catch(() => undefined);
+    connectedBefore = true;
+    useAppStore.setState({ liveUpdates: true });
+  });
+  ROW_KEYS.forEach((kind) => source.addEventListener(kind, (event) => applyEvent(kind, JSON.parse((event as MessageEvent).data))));
+  source.addEventListener("money", (event) => applyEvent("money", JSON.parse((event as MessageEvent).data)));
+  source.addEventListener("save", (event) => {
+    const current = useAppStore.getState().userData;
+    if (current && JSON.parse((event as MessageEvent).data).version > current.version) {
+      patchChain = patchChain.then(reloadUserData).catch(() => undefined);
+    }
+  });
+  // The browser reconnects by itself; until then the client keeps its pets ticking on its own
+  source.onerror = () => useAppStore.setState({ liveUpdates: false });
+  eventSource = source;
+}
+
+// Headers for save requests: JSON plus the session token issued by /login or /register
+export function authHeaders(): Record<string, string> {
+  const token = useAppStore.getState().authToken;
+  // Save replies come back columnar; readSaveResponse reads either encoding
+  const headers: Record<string, string> = { "Content-Type": "application/json", Accept: `${SAVE_MEDIA_TYPE}, application/json;q=0.5` };
+  if (token) headers.Authorization = `Bearer ${token}`;
+  return headers;
+}
+
 interface AppState {
   navigation: NavigationState;
   userData: UserData | null;
+  authToken: string | null;
+  liveUpdates: boolean; // an event stream is open: the server keeps the pets' stats and poops current
   navigateTo: (page: TopLevelPage, subPage?: ValidSubPage | null, activePetId?: number | null) => void;
   setUserData: (userData: UserData | null) => void;
+  setAuthToken: (authToken: string | null) => void;
+  connectEvents: () => void;
   updateUserData: (changes: Partial<UserData>) => void;
+  patchUserData: (patch: UserDataPatch) => void;
   deleteHomeObject: (homeObjectId: number) => void;
+  deleteHomeObjects: (selection: HomeObjectSelection) => void;
+  purchaseItem: (itemId: number, quantity?: number) => Promise<boolean>;
+  consumeItem: (itemId: number, petId?: number, quantity?: number) => Promise<boolean>;
+  feedPet: (petId: number, itemId: number, quantity?: number) => Promise<boolean>;
 }
 
 export const useAppStore = create<AppState>((set, get) => ({
   navigation: { activePage: "mainMenu", activeSubPage: "loginRegister", activePetId: null },
   userData: null,
+  authToken: null,
+  liveUpdates: false,
   navigateTo: (page, subPage = null, activePetId = null) =>
     set({ navigation: { activePage: page, activeSubPage: subPage, activePetId: activePetId } }),
   setUserData: (userData) => {
     if (VERBOSE_DEBUG) console.log("setUserData in Zustand", performance.now());
     set({ userData });
   },  
+  setAuthToken: (authToken) => {
+    if (!authToken) {
+      eventSource?.close();
+      eventSource = null;
+      set({ authToken, liveUpdates: false });
+      return;
+    }
+    set({ authToken });
+  },
+  connectEvents: () => {
+    const { userData, authToken } = get();
+    if (userData && authToken && typeof EventSource !== "undefined") openEventStream(userData.id, authToken);
+  },
   updateUserData: (changes) => {
     const { userData } = get();
     if (!userData) {
@@ -101,23 +357,76 @@ export const useAppStore = create<AppState>((set, get) => ({
       console.log("📤 SENDING TO SERVER:", JSON.stringify(updatedUserData, null, 2));
     }
 
-    fetch(apiUrl, {
-      method: "PUT",
-      headers: { "Content-Type": "application/json" },
-      body: JSON.stringify(updatedUserData),
-    })
-      .then((res) => res.json())
-      .then((serverData) => {
-        if (VERBOSE_DEBUG) {
-          console.log("📥 SERVER RESPONSE:", serverData);
-        }
-        set({ userData: serverData });
-        if (VERBOSE_DEBUG) console.log("✅ STATE UPDATED WITH SERVER DATA");
-      })
-      .catch((err) => {
-        console.error("Error updating userData:", err);
-        // Optionally revert the optimistic update here.
+    // The whole save goes up columnar, carrying the version it's based on. Queued behind pending
+    // patches so that version is current; a 409 means another tab or device wrote first.
+    const send = async (attempt: number): Promise<void> => {
+      const latest = get().userData;
+      if (!latest) return;
+      const body: Record<string, any> = { ...latest };
+      ROW_KEYS.forEach((key) => {
+        if (Array.isArray(body[key])) body[key] = toColumns(key, body[key]);
+      });
+      const res = await fetch(apiUrl, {
+        method: "PUT",
+        headers: { ...authHeaders(), "Content-Type": SAVE_MEDIA_TYPE },
+        body: JSON.stringify(body),
       });
+      if (res.status === 409 && attempt < PUT_RETRIES) {
+        // Take the server's save and re-apply this update on top of it
+        await reloadUserData();
+        const fresh = get().userData;
+        if (fresh) set({ userData: rebase(fresh, changes) });
+        return send(attempt + 1);
+      }
+      if (!res.ok) throw new Error(`PUT /userdata failed with ${res.status}`);
+      const serverData = await readSaveResponse(res);
+      if (VERBOSE_DEBUG) {
+        console.log("📥 SERVER RESPONSE:", serverData);
+      }
+      set({ userData: serverData });
+      if (VERBOSE_DEBUG) console.log("✅ STATE UPDATED WITH SERVER DATA");
+    };
+    patchChain = patchChain.then(() => send(0)).catch((err) => {
+      console.error("Error updating userData:", err);
+      // Resync rather than keep an update the server refused
+      return reloadUserData().catch(() => undefined);
+    });
+  },
+  patchUserData: (patch) => {
+    const { userData } = get();
+    if (!userData) {
+      console.error("❌ patchUserData called but userData is null!");
+      return;
+    }
+
+    // Optimistic update for rows that already exist; new rows appear once the server assigns ids
+    set({ userData: applyPatch(userData, patch) });
+
+    const currentHost = window.location.hostname;
+    const apiUrl = `http://${currentHost}:5000/userdata/${userData.id}`;
+
+    patchChain = patchChain.then(async () => {
+      const latest = get().userData;
+      if (!latest) return;
+      try {
+        const res = await fetch(apiUrl, {
+          method: "PATCH",
+          headers: authHeaders(),
+          body: JSON.stringify({ ...patch, base_version: latest.version }),
+        });
+        if (res.status === 409) {
+          // Someone else wrote the save first: resync from the full snapshot
+          await reloadUserData();
+          return;
+        }
+        const serverPatch = await readSaveResponse(res);
+        if (VERBOSE_DEBUG) console.log("📥 PATCH RESPONSE:", serverPatch);
+        const current = get().userData;
+        if (current) set({ userData: { ...applyPatch(current, serverPatch), version: serverPatch.version } });
+      } catch (err) {
+        console.error("Error patching userData:", err);
+      }
+    });
   },
   deleteHomeObject: (homeObjectId) => {
     const { userData } = get();
@@ -139,11 +448,13 @@ export const useAppStore = create<AppState>((set, get) => ({
     
     fetch(apiUrl, {
       method: "DELETE",
-      headers: { "Content-Type": "application/json" },
+      headers: authHeaders(),
     })
       .then((res) => res.json())
       .then((result) => {
         if (VERBOSE_DEBUG) console.log("✅ Home object deleted successfully:", result);
+        const current = get().userData;
+        if (current && result.version != null) set({ userData: { ...current, version: result.version } });
       })
       .catch((err) => {
         console.error("❌ Error deleting home object:", err);
@@ -151,6 +462,42 @@ export const useAppStore = create<AppState>((set, get) => ({
         set({ userData });
       });
   },
+  deleteHomeObjects: (selection) => {
+    const { userData } = get();
+    if (!userData) {
+      console.error("❌ deleteHomeObjects called but userData is null!");
+      return;
+    }
+
+    // One request for e.g. every poop ({ type: "temporary", object_id: [1, 2, 3] }), optionally in an area
+    const currentHost = window.location.hostname;
+    const apiUrl = `http://${currentHost}:5000/userdata/${userData.id}/homeobjects/delete`;
+
+    fetch(apiUrl, {
+      method: "POST",
+      headers: authHeaders(),
+      body: JSON.stringify(selection),
+    })
+      .then((res) => res.json())
+      .then((result) => {
+        if (VERBOSE_DEBUG) console.log(`✅ Deleted ${result.deleted?.length ?? 0} home objects:`, result);
+        const current = get().userData;
+        if (current && result.deleted) {
+          set({
+            userData: {
+              ...current,
+              home_objects: mergeRows(current.home_objects, [], result.deleted),
+              version: result.version,
+            },
+          });
+        }
+      })
+      .catch((err) => console.error("❌ Error deleting home objects:", err));
+  },
+  purchaseItem: (itemId, quantity = 1) => postItemOperation("purchase", { item_id: itemId, quantity }),
+  consumeItem: (itemId, petId, quantity = 1) =>
+    postItemOperation("use", { item_id: itemId, quantity, ...(petId !== undefined ? { pet_id: petId } : {}) }),
+  feedPet: (petId, itemId, quantity = 1) => postItemOperation("feed", { pet_id: petId, item_id: itemId, quantity }),
 }));
 
 const typedUseAppStore = useAppStore as <T>(selector: (state: AppState) => T, equalityFn?: (a: T, b: T) => boolean) => T;
@@ -165,9 +512,23 @@ export const useUserDataContext = () => {
   const userData = typedUseAppStore((state) => state.userData, shallow);
   const setUserData = typedUseAppStore((state) => state.setUserData, shallow);
   const updateUserData = typedUseAppStore((state) => state.updateUserData, shallow);
+  const patchUserData = typedUseAppStore((state) => state.patchUserData, shallow);
   const deleteHomeObject = typedUseAppStore((state) => state.deleteHomeObject, shallow);
+  const deleteHomeObjects = typedUseAppStore((state) => state.deleteHomeObjects, shallow);
+  const purchaseItem = typedUseAppStore((state) => state.purchaseItem, shallow);
+  const consumeItem = typedUseAppStore((state) => state.consumeItem, shallow);
+  const feedPet = typedUseAppStore((state) => state.feedPet, shallow);
+  const setAuthToken = typedUseAppStore((state) => state.setAuthToken, shallow);
+  const connectEvents = typedUseAppStore((state) => state.connectEvents, shallow);
+  const liveUpdates = typedUseAppStore((state) => state.liveUpdates, shallow);
   return React.useMemo(
-    () => ({ userData, setUserData, updateUserData, deleteHomeObject }),
-    [userData, setUserData, updateUserData, deleteHomeObject]
+    () => ({
+      userData, setUserData, updateUserData, patchUserData, deleteHomeObject, deleteHomeObjects,
+      purchaseItem, consumeItem, feedPet, setAuthToken, connectEvents, liveUpdates,
+    }),
+    [
+      userData, setUserData, updateUserData, patchUserData, deleteHomeObject, deleteHomeObjects,
+      purchaseItem, consumeItem, feedPet, setAuthToken, connectEvents, liveUpdates,
+    ]
   );
 };
@@ -9,7 +9,7 @@ import { useNavigationContext, useUserDataContext } from "../hooks/AppContext";
 export default function Pet({ petInfo, bounds = { x: [-8, 8], y: [-6, 6] } }) {
   const groupRef = useRef();
   const { navigateTo } = useNavigationContext();
-  const { userData, updateUserData } = useUserDataContext();
+  const { userData, patchUserData, liveUpdates } = useUserDataContext();
   const fixedZ = 0.2;
   const speed = 0.8;
   const egg_incubation_minutes = 0.1;
@@ -52,13 +52,10 @@ export default function Pet({ petInfo, bounds = { x: [-8, 8], y: [-6, 6] } }) {
   // Track last degradation time for real-time updates
   const lastDegradationTime = useRef(null);
   
-  // Helper function to update pet data using the new updateUserData pattern
+  // Helper function to update pet data; only the changed fields go over the wire
   const updatePet = (petId, changes) => {
     if (!userData) return;
-    const updatedPets = userData.pets.map(pet => 
-      pet.id === petId ? { ...pet, ...changes } : pet
-    );
-    updateUserData({ pets: updatedPets });
+    patchUserData({ pets: [{ id: petId, ...changes }] });
   };
   
   const handleClick = (event) => {
@@ -99,6 +96,12 @@ export default function Pet({ petInfo, bounds = { x: [-8, 8], y: [-6, 6] } }) {
       if (lastDegradationTime.current === null) {
         lastDegradationTime.current = petInfo.lastUpdate;
       }
+
+      // While the server simulates the pet and pushes its stats, follow its clock
+      if (liveUpdates) {
+        lastDegradationTime.current = petInfo.lastUpdate;
+        return;
+      }
       
       const timeSinceLastDegradation = currentTime - lastDegradationTime.current;
       
@@ -134,20 +137,19 @@ export default function Pet({ petInfo, bounds = { x: [-8, 8], y: [-6, 6] } }) {
     const currentTime = Date.now();
     const timeSinceLastPoop = currentTime - lastPoopTime.current;
     
-    if (timeSinceLastPoop > POOP_INTERVAL) {
+    // With an event stream open the server drops the poops
+    if (timeSinceLastPoop > POOP_INTERVAL && !liveUpdates) {
       // Drop a poop at current position by creating a HomeObject
       const currentPos = groupRef.current ? groupRef.current.position : { x: 0, y: 0 };
       
       // Create new HomeObject for the poop
-      const newHomeObjects = [...(userData.home_objects || []), {
+      patchUserData({ home_objects: [{
         user_data_id: userData.id,
         type: 'temporary',
         object_id: 1, // poo_s according to the home_object.py map
         x: currentPos.x,
         y: currentPos.y
-      }];
-      
-      updateUserData({ home_objects: newHomeObjects });
+      }] });
       lastPoopTime.current = currentTime;
       
       console.log(`💩 Pet ${petInfo.id} dropped a poop at position [${currentPos.x.toFixed(2)}, ${currentPos.y.toFixed(2)}]`);
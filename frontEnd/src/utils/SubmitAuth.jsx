@@ -1,11 +1,11 @@
-import { useUserDataContext, useNavigationContext } from "../hooks/AppContext";
+import { useUserDataContext, useNavigationContext, readSaveResponse, SAVE_MEDIA_TYPE } from "../hooks/AppContext";
 
 function sleep(ms) {
   return new Promise((resolve) => setTimeout(resolve, ms));
 }
 
 export function useSubmitAuth() {
-  const { setUserData } = useUserDataContext();
+  const { setUserData, setAuthToken, connectEvents } = useUserDataContext();
   const { navigateTo } = useNavigationContext();
   const submitAuth = async (
     userName,
@@ -22,12 +22,12 @@ export function useSubmitAuth() {
     setIsRequesting(true);
     fetch(apiUrl, {
       method: 'POST',
-      headers: { 'Content-Type': 'application/json' },
+      headers: { 'Content-Type': 'application/json', Accept: `${SAVE_MEDIA_TYPE}, application/json;q=0.5` },
       body: JSON.stringify({ username: userName, password }),
     })
       .then(async (res) => {
         const { status } = res;
-        return res.json().then(async (data) => {
+        return readSaveResponse(res).then(async (data) => {
           if (status === 200 || status === 201) {
             // Transform the nested structure from the API response into the consolidated one.
             const transformedData = {
@@ -35,13 +35,17 @@ export function useSubmitAuth() {
               username: data.username,
               completed_tutorial: data.data.completed_tutorial,
               money: data.data.money || 0,
+              version: data.data.version || 0,
               pets: data.data.pets || [],
               home_objects: data.data.home_objects || [],
               inventory: data.data.inventory || [],
             };
 
+            setAuthToken(data.token);
             setUserData(transformedData);
             console.log("setUserData called", performance.now());
+            // Pet stats and poops arrive from the server from here on
+            connectEvents();
             const targetSubpage = transformedData.completed_tutorial ? "default" : "tutorial";
             // WARNING: PLEASE DO NOT REMOVE THE FOLLOWING LINE
             // This sleep call allows state to catch up before navigation
@@ -54,6 +58,8 @@ export function useSubmitAuth() {
             setAuthFeedback('User does not exist');
           } else if (status === 400) {
             setAuthFeedback('Username taken');
+          } else if (status === 429) {
+            setAuthFeedback('Server busy, try again in a moment');
           } else {
             console.log('Error:', status, data.error || data);
           }
@@ -1,7 +1,28 @@
 #!/usr/bin/env python3
+"""
+Sprite utilities.
+
+    python spriteTool.py                 # interactive sheet splitter
+    python spriteTool.py pack [options]  # pack sprites into texture atlases + manifest
+    python spriteTool.py split [options] paths...  # split sheets into tiles, in parallel
+"""
+import argparse
+import hashlib
+import json
 import os
+from concurrent.futures import ProcessPoolExecutor
 from PIL import Image
 
+try:
+    import numpy as np
+except ImportError:  # optional: tiles are cropped one by one without it
+    np = None
+
+SPRITES_DIR = os.path.join("frontEnd", "src", "sprites")
+ATLAS_DIR = os.path.join("frontEnd", "src", "atlas")
+MANIFEST_NAME = "manifest.json"
+SPLIT_SUFFIX = "_split"
+
 def list_directory_contents():
     """
     Returns a tuple of (subdirectories, png_files) for the current directory.
@@ -54,7 +75,209 @@ def print_options(options):
         print(f"{idx}. {option['description']}")
     print()
 
-def main():
+def next_power_of_two(value):
+    size = 1
+    while size < value:
+        size *= 2
+    return size
+
+def file_hash(path):
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+def find_sprites(src_dir):
+    """
+    Returns {relative path: absolute path} for every PNG under src_dir.
+    Relative paths use forward slashes, matching the frontend's import paths.
+    """
+    sprites = {}
+    for root, dirs, files in os.walk(src_dir):
+        dirs.sort()
+        for name in sorted(files):
+            if name.lower().endswith(".png"):
+                path = os.path.join(root, name)
+                sprites[os.path.relpath(path, src_dir).replace(os.sep, "/")] = path
+    return sprites
+
+def shelf_pack(sizes, max_size, padding):
+    """
+    Packs (key, width, height) rectangles onto max_size x max_size pages, tallest first,
+    in rows ("shelves"). Returns (placements {key: (page, x, y)}, [(page width, page height)]).
+    Each page is shrunk to the smallest power-of-two size that still holds its sprites.
+    """
+    placements = {}
+    pages = []  # [used width, used height] per page
+    shelf_x = shelf_y = shelf_height = 0
+    for key, width, height in sorted(sizes, key=lambda s: (-s[2], -s[1], s[0])):
+        if width > max_size or height > max_size:
+            raise ValueError(f"Sprite '{key}' ({width}x{height}) is larger than the {max_size}px atlas")
+        if not pages or shelf_x + width > max_size:
+            # Start a new shelf below the current one, or a new page
+            shelf_y += shelf_height
+            shelf_x = shelf_height = 0
+            if not pages or shelf_y + height > max_size:
+                pages.append([0, 0])
+                shelf_y = 0
+        page = len(pages) - 1
+        placements[key] = (page, shelf_x, shelf_y)
+        pages[page][0] = max(pages[page][0], shelf_x + width)
+        pages[page][1] = max(pages[page][1], shelf_y + height)
+        shelf_x += width + padding
+        shelf_height = max(shelf_height, height + padding)
+    return placements, [(next_power_of_two(w), next_power_of_two(h)) for w, h in pages]
+
+def pack_atlases(src_dir, out_dir, max_size=2048, padding=1, force=False):
+    """
+    Packs every PNG under src_dir into as few power-of-two atlases as fit in
+    max_size, written to out_dir as atlas_0.png, atlas_1.png, ... together with
+    manifest.json mapping each sprite's path (relative to src_dir) to its atlas,
+    pixel rect and UV rect (three.js convention: origin at the bottom left).
+
+    The manifest records a content hash of every input; if neither the inputs
+    nor the settings changed since the last run nothing is rewritten.
+    """
+    sprites = find_sprites(src_dir)
+    hashes = {path: file_hash(full_path) for path, full_path in sprites.items()}
+    settings = {"max_size": max_size, "padding": padding}
+    manifest_path = os.path.join(out_dir, MANIFEST_NAME)
+
+    if not force and os.path.exists(manifest_path):
+        with open(manifest_path) as f:
+            previous = json.load(f)
+        atlases_present = all(
+            os.path.exists(os.path.join(out_dir, atlas["file"])) for atlas in previous.get("atlases", [])
+        )
+        if previous.get("inputs") == hashes and previous.get("settings") == settings and atlases_present:
+            print(f"Atlases in '{out_dir}' are up to date ({len(sprites)} sprites).")
+            return previous
+
+    images = {}
+    for path, full_path in sprites.items():
+        with Image.open(full_path) as img:
+            images[path] = img.convert("RGBA")
+    placements, page_sizes = shelf_pack(
+        [(path, img.width, img.height) for path, img in images.items()], max_size, padding
+    )
+
+    pages = [Image.new("RGBA", size, (0, 0, 0, 0)) for size in page_sizes]
+    frames = {}
+    for path, (page, x, y) in sorted(placements.items()):
+        img = images[path]
+        pages[page].paste(img, (x, y))
+        page_width, page_height = page_sizes[page]
+        frames[path] = {
+            "atlas": page,
+            "x": x, "y": y, "w": img.width, "h": img.height,
+            "uv": [x / page_width, 1 - (y + img.height) / page_height,
+                   (x + img.width) / page_width, 1 - y / page_height],
+        }
+
+    os.makedirs(out_dir, exist_ok=True)
+    atlases = []
+    for index, page in enumerate(pages):
+        file_name = f"atlas_{index}.png"
+        page.save(os.path.join(out_dir, file_name), optimize=True)
+        atlases.append({"file": file_name, "width": page.width, "height": page.height})
+    # Drop atlases left over from a run that needed more pages
+    index = len(pages)
+    while os.path.exists(os.path.join(out_dir, f"atlas_{index}.png")):
+        os.remove(os.path.join(out_dir, f"atlas_{index}.png"))
+        index += 1
+
+    manifest = {"settings": settings, "atlases": atlases, "frames": frames, "inputs": hashes}
+    with open(manifest_path, "w") as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    print(f"Packed {len(frames)} sprites into {len(atlases)} atlas(es) in '{out_dir}'.")
+    return manifest
+
+def find_sheets(paths, recursive):
+    """
+    Returns the PNG files named by paths; directories contribute their PNGs (and,
+    with recursive, those of their subdirectories). Split output directories are skipped.
+    """
+    sheets = []
+    for path in paths:
+        if os.path.isfile(path):
+            sheets.append(path)
+            continue
+        for root, dirs, files in os.walk(path):
+            dirs[:] = sorted(d for d in dirs if recursive and not d.endswith(SPLIT_SUFFIX))
+            sheets.extend(os.path.join(root, name) for name in sorted(files) if name.lower().endswith(".png"))
+    return sheets
+
+def split_output_dir(sheet_path):
+    stem = os.path.splitext(os.path.basename(sheet_path))[0]
+    return os.path.join(os.path.dirname(sheet_path), stem + SPLIT_SUFFIX)
+
+def is_up_to_date(sheet_path, out_dir):
+    """True if out_dir already holds tiles at least as new as the sheet."""
+    if not os.path.isdir(out_dir):
+        return False
+    tiles = [entry for entry in os.scandir(out_dir) if entry.name.lower().endswith(".png")]
+    source_mtime = os.stat(sheet_path).st_mtime
+    return bool(tiles) and all(entry.stat().st_mtime >= source_mtime for entry in tiles)
+
+def split_sheet(sheet_path, tile=32, keep_empty=False, force=False):
+    """
+    Splits one sheet into tile x tile PNGs in <sheet>_split/, named by their
+    position in the sheet (row-major: 0.png, 1.png, ...). Fully transparent
+    tiles are dropped unless keep_empty, so names can have gaps. The sheet is
+    decoded once and tiles are sliced out of its pixel array.
+    Returns (sheet_path, status, tiles written).
+    """
+    out_dir = split_output_dir(sheet_path)
+    if not force and is_up_to_date(sheet_path, out_dir):
+        return sheet_path, "up to date", 0
+    with Image.open(sheet_path) as img:
+        width, height = img.size
+        if width % tile or height % tile:
+            return sheet_path, f"skipped: {width}x{height} is not divisible by {tile}", 0
+        if width == tile and height == tile:
+            return sheet_path, "skipped: already a single tile", 0
+        rgba = img.convert("RGBA")
+
+    rows, cols = height // tile, width // tile
+    if np is not None:
+        pixels = np.asarray(rgba)
+        # (rows, tile, cols, tile, 4) -> (rows, cols, tile, tile, 4); views, no copies
+        grid = pixels.reshape(rows, tile, cols, tile, 4).swapaxes(1, 2)
+        opaque = grid[..., 3].max(axis=(2, 3)) > 0
+        tiles = (
+            (row * cols + col, Image.fromarray(np.ascontiguousarray(grid[row, col])))
+            for row in range(rows) for col in range(cols) if keep_empty or opaque[row, col]
+        )
+    else:
+        tiles = (
+            (row * cols + col, piece)
+            for row in range(rows) for col in range(cols)
+            for piece in [rgba.crop((col * tile, row * tile, (col + 1) * tile, (row + 1) * tile))]
+            if keep_empty or piece.getchannel("A").getbbox() is not None
+        )
+
+    os.makedirs(out_dir, exist_ok=True)
+    written = 0
+    for index, piece in tiles:
+        piece.save(os.path.join(out_dir, f"{index}.png"))
+        written += 1
+    return sheet_path, "split", written
+
+def split_batch(paths, recursive=False, tile=32, jobs=None, keep_empty=False, force=False):
+    """Splits every sheet found under paths across a pool of jobs processes."""
+    sheets = find_sheets(paths, recursive)
+    totals = {"split": 0, "up to date": 0, "skipped": 0, "tiles": 0}
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        futures = [pool.submit(split_sheet, sheet, tile, keep_empty, force) for sheet in sheets]
+        for future in futures:
+            sheet, status, written = future.result()
+            totals["skipped" if status.startswith("skipped") else status] += 1
+            totals["tiles"] += written
+            if status != "up to date":
+                print(f"{sheet}: {status}" + (f" ({written} tiles)" if written else ""))
+    print(f"{len(sheets)} sheets: {totals['split']} split into {totals['tiles']} tiles, "
+          f"{totals['up to date']} up to date, {totals['skipped']} skipped.")
+    return totals
+
+def interactive():
     # Navigate to frontEnd/src/sprites relative to the execution directory.
     target_dir = os.path.join(os.getcwd(), "frontEnd", "src", "sprites")
     if os.path.isdir(target_dir):
@@ -124,5 +347,30 @@ def main():
         except ValueError:
             print("Please enter a valid number.")
 
+def main():
+    parser = argparse.ArgumentParser(description="Sprite utilities. Run without a command for the interactive splitter.")
+    commands = parser.add_subparsers(dest="command")
+    pack = commands.add_parser("pack", help="Pack a sprite directory tree into texture atlases with a JSON manifest")
+    pack.add_argument("src", nargs="?", default=SPRITES_DIR, help=f"Sprite directory (default: {SPRITES_DIR})")
+    pack.add_argument("--out", default=ATLAS_DIR, help=f"Output directory (default: {ATLAS_DIR})")
+    pack.add_argument("--max-size", type=int, default=2048, help="Largest atlas side in pixels (default: 2048)")
+    pack.add_argument("--padding", type=int, default=1, help="Transparent pixels between sprites (default: 1)")
+    pack.add_argument("--force", action="store_true", help="Repack even if no input changed")
+    split = commands.add_parser("split", help="Split sprite sheets into tiles (written to <sheet>_split/)")
+    split.add_argument("paths", nargs="+", help="Sheets, or directories of sheets")
+    split.add_argument("--recursive", "-r", action="store_true", help="Include subdirectories")
+    split.add_argument("--tile", type=int, default=32, help="Tile size in pixels (default: 32)")
+    split.add_argument("--jobs", "-j", type=int, default=None, help="Worker processes (default: CPU count)")
+    split.add_argument("--keep-empty", action="store_true", help="Also write fully transparent tiles")
+    split.add_argument("--force", action="store_true", help="Split even if the tiles are newer than the sheet")
+    args = parser.parse_args()
+
+    if args.command == "pack":
+        pack_atlases(args.src, args.out, args.max_size, args.padding, args.force)
+    elif args.command == "split":
+        split_batch(args.paths, args.recursive, args.tile, args.jobs, args.keep_empty, args.force)
+    else:
+        interactive()
+
 if __name__ == "__main__":
     main()